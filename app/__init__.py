@@ -1,13 +1,19 @@
-from flask import Flask
+from flask import Flask, flash, redirect, request
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin
+from flask_login import LoginManager, UserMixin, login_url
 import os
-import logging
-from logging.handlers import RotatingFileHandler
+from datetime import datetime
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 
+def get_database_url():
+    """URL базы данных из окружения (с исправлением схемы postgres:// от Render)"""
+    db_url = os.getenv('DATABASE_URL', 'sqlite:///temp.db')
+    if db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+    return db_url
+
 def create_app():
     app = Flask(__name__,
         template_folder=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'templates')),
@@ -16,23 +22,13 @@ def create_app():
 
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 
-    db_url = os.getenv('DATABASE_URL', 'sqlite:///temp.db')
-    if db_url.startswith("postgres://"):
-        db_url = db_url.replace("postgres://", "postgresql://", 1)
-
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     if not app.debug and not app.testing:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        file_handler = RotatingFileHandler('logs/app.log', maxBytes=10240, backupCount=10)
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(logging.INFO)
+        # Запись логов в файл через очередь и фоновый поток
+        from .log_pipeline import init_logging
+        init_logging(app)
         app.logger.info('Приложение запущено')
 
     db.init_app(app)
@@ -40,8 +36,18 @@ def create_app():
     login_manager.login_view = 'main.login'
 
     # Инициализация rate limiting
-    from .rate_limiter import limiter, rate_limit_exceeded_handler
+    from .rate_limiter import (limiter, rate_limit_exceeded_handler, get_storage_uri, get_strategy, check_strategy,
+                               inject_rate_limit_headers)
+    app.config.setdefault('RATELIMIT_STORAGE_URI', get_storage_uri())
+    app.config.setdefault('RATELIMIT_STRATEGY', get_strategy())
+    app.config['RATELIMIT_STRATEGY'] = check_strategy(app.config['RATELIMIT_STRATEGY'],
+                                                      app.config['RATELIMIT_STORAGE_URI'])
+    # Сколько своих прокси стоит перед приложением (для разбора X-Forwarded-For);
+    # в образе из dockerfile - 1 (прокси Render), при запуске без прокси - 0
+    app.config.setdefault('RATELIMIT_TRUSTED_PROXIES', int(os.getenv('RATELIMIT_TRUSTED_PROXIES', 0)))
     limiter.init_app(app)
+    # X-RateLimit-* и Retry-After (вместо заголовков Flask-Limiter: им нужно по два чтения на лимит)
+    app.after_request(inject_rate_limit_headers)
     
     # Регистрируем обработчик превышения лимитов
     @app.errorhandler(429)
@@ -52,6 +58,30 @@ def create_app():
     from .error_handlers import init_error_handlers
     init_error_handlers(app)
 
+    # Структурированная запись действий и выборка частых действий
+    from .structured_log import init_action_log
+    init_action_log(app)
+
+    # Сжатие ответов и предварительно сжатая статика
+    from .compression import init_compression
+    init_compression(app)
+
+    # Кэш результатов запросов списка заметок
+    from .cache import init_notes_cache
+    init_notes_cache(app)
+
+    # Хеширование паролей в пуле процессов
+    from .hashing import init_password_hasher
+    init_password_hasher(app)
+
+    # Кэш пользователя для user_loader
+    from .user_cache import init_user_cache, load_cached_user
+    init_user_cache(app)
+
+    # Bearer-токены для /api/notes*
+    from .tokens import init_tokens, load_user_from_token, bearer_unauthorized_response
+    init_tokens(app)
+
     with app.app_context():
         class UserModel(db.Model, UserMixin):
             __tablename__ = 'users'
@@ -64,6 +94,16 @@ def create_app():
             role = db.Column(db.String(20), nullable=False)
             email = db.Column(db.String(120), unique=True, nullable=True)
             password_hash = db.Column(db.String(255), nullable=True)
+            # Увеличивается при каждом изменении заметок (app/notes_version.py)
+            notes_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+            # Последняя версия, надгробия до которой удалены (app/note_sync.py)
+            tombstones_pruned_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+            # Индексы совпадают с миграцией 3 (app/migrations.py)
+            __table_args__ = (
+                db.Index('ux_users_email_lower', db.func.lower(email), unique=True),
+            )
+
             def __repr__(self):
                 return f"<User {self.first_name} {self.last_name}>"
 
@@ -72,19 +112,100 @@ def create_app():
             id = db.Column(db.Integer, primary_key=True)
             title = db.Column(db.String(100), nullable=False)
             content = db.Column(db.Text, nullable=False)
-            created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-            updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+            # Время ставит приложение: в SQLite оно всегда пишется с микросекундами,
+            # и курсорная пагинация сравнивает даты как строки (app/pagination.py)
+            created_at = db.Column(db.DateTime, default=datetime.utcnow)
+            updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
             user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
             status = db.Column(db.String(20), default='active')
+            # Версия заметок пользователя на момент последнего изменения (app/note_sync.py)
+            sync_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+            # Индексы совпадают с миграциями 3 и 6 (app/migrations.py)
+            __table_args__ = (
+                db.Index('ix_notes_user_status_created', user_id, status, created_at),
+                db.Index('ix_notes_user_created', user_id, created_at),
+                db.Index('ix_notes_user_updated', user_id, updated_at),
+                db.Index('ix_notes_user_title', user_id, title),
+                db.Index('ix_notes_user_sync', user_id, sync_version),
+            )
+
             def __repr__(self):
                 return f"<Note {self.title}>"
 
+        class NoteTombstoneModel(db.Model):
+            """Запись об удаленной заметке для синхронизации клиентов"""
+            __tablename__ = 'note_tombstones'
+            id = db.Column(db.Integer, primary_key=True)
+            note_id = db.Column(db.Integer, nullable=False)
+            user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+            sync_version = db.Column(db.Integer, nullable=False)
+            deleted_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+            __table_args__ = (
+                db.Index('ix_note_tombstones_user_sync', user_id, sync_version),
+            )
+
+        class NoteStatsModel(db.Model):
+            """Счетчики заметок пользователя по статусам (app/note_stats.py)"""
+            __tablename__ = 'note_stats'
+            user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+            status = db.Column(db.String(20), primary_key=True)
+            note_count = db.Column(db.Integer, nullable=False, default=0)
+            content_size = db.Column(db.BigInteger, nullable=False, default=0)
+
+        class NoteImportModel(db.Model):
+            """Задание массового импорта заметок (app/importer.py)"""
+            __tablename__ = 'note_imports'
+            id = db.Column(db.Integer, primary_key=True)
+            source = db.Column(db.String(255), nullable=False)
+            user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'))
+            status = db.Column(db.String(20), nullable=False)
+            byte_offset = db.Column(db.BigInteger, nullable=False, default=0)
+            line_number = db.Column(db.Integer, nullable=False, default=0)
+            rows_imported = db.Column(db.Integer, nullable=False, default=0)
+            rows_rejected = db.Column(db.Integer, nullable=False, default=0)
+            error = db.Column(db.Text)
+            created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+            updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+        class RevokedTokenModel(db.Model):
+            """Отозванный bearer-токен (app/tokens.py)"""
+            __tablename__ = 'revoked_tokens'
+            id = db.Column(db.Integer, primary_key=True)
+            jti = db.Column(db.String(64), unique=True, nullable=False)
+            user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'))
+            expires_at = db.Column(db.DateTime, nullable=False)
+            revoked_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+            __table_args__ = (
+                db.Index('ix_revoked_tokens_expires', expires_at),
+            )
+
         app.User = UserModel
         app.Note = NoteModel
+        app.NoteTombstone = NoteTombstoneModel
+        app.NoteStats = NoteStatsModel
+        app.NoteImport = NoteImportModel
+        app.RevokedToken = RevokedTokenModel
 
         @login_manager.user_loader
         def load_user(user_id):
-            return UserModel.query.get(int(user_id))
+            return load_cached_user(int(user_id))
+
+        @login_manager.request_loader
+        def load_user_from_request(req):
+            return load_user_from_token(req)
+
+        @login_manager.unauthorized_handler
+        def unauthorized():
+            # Запросы с bearer-токеном получают 401, остальные - переход на страницу входа
+            response = bearer_unauthorized_response()
+            if response is not None:
+                return response
+            if login_manager.login_message:
+                flash(login_manager.login_message, login_manager.login_message_category)
+            return redirect(login_url(login_manager.login_view, next_url=request.url))
 
     from .routes import bp
     app.register_blueprint(bp)
@@ -0,0 +1,306 @@
+# Кэш результатов запросов списка заметок
+# Ключ - пользователь + версия заметок + нормализованные параметры запроса,
+# значение - готовое JSON-тело ответа. Запись заметок удаляет все записи
+# пользователя, а версия в ключе защищает от устаревших данных других процессов.
+#
+# Реализации:
+#   memory - LRU в памяти процесса (TTL и ограничение по количеству записей)
+#   sqlite - общий файл SQLite в режиме WAL для всех воркеров gunicorn (по
+#            умолчанию свой файл для каждой базы данных)
+#   none   - кэш отключен
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1000
+# Очень большие списки не кэшируются, чтобы не вытеснять остальные записи
+DEFAULT_MAX_ENTRY_BYTES = 1024 * 1024
+# Время доступа в SQLite-кэше обновляется не чаще, чем раз в эту долю TTL
+ACCESS_REFRESH_FRACTION = 0.25
+
+
+class CacheStats:
+    """Счетчики попаданий, промахов и вытеснений (в пределах процесса)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+class NotesCache:
+    """Базовый интерфейс кэша"""
+
+    name = 'base'
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.stats = CacheStats()
+
+    def get(self, user_id, key):
+        """Значение по ключу или None"""
+        raise NotImplementedError
+
+    def set(self, user_id, key, value):
+        """Сохранение значения (bytes)"""
+        raise NotImplementedError
+
+    def invalidate_user(self, user_id):
+        """Удаление всех записей пользователя"""
+        raise NotImplementedError
+
+    def size(self):
+        """Количество записей"""
+        raise NotImplementedError
+
+    def info(self):
+        """Счетчики и параметры кэша"""
+        data = self.stats.as_dict()
+        data.update({'backend': self.name, 'entries': self.size(), 'max_entries': self.max_entries,
+                     'ttl': self.ttl})
+        return data
+
+
+class NullNotesCache(NotesCache):
+    """Кэш отключен: всегда промах"""
+
+    name = 'none'
+
+    def get(self, user_id, key):
+        return None
+
+    def set(self, user_id, key, value):
+        pass
+
+    def invalidate_user(self, user_id):
+        pass
+
+    def size(self):
+        return 0
+
+
+class MemoryNotesCache(NotesCache):
+    """LRU в памяти процесса с TTL"""
+
+    name = 'memory'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, key) -> (expires_at, value)
+        self._user_keys = {}           # user_id -> set ключей пользователя
+
+    def _remove(self, entry_key):
+        self._entries.pop(entry_key, None)
+        keys = self._user_keys.get(entry_key[0])
+        if keys is not None:
+            keys.discard(entry_key)
+            if not keys:
+                del self._user_keys[entry_key[0]]
+
+    def get(self, user_id, key):
+        entry_key = (user_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(entry_key)
+                entry = None
+            if entry is None:
+                self.stats.incr('misses')
+                return None
+            self._entries.move_to_end(entry_key)
+        self.stats.incr('hits')
+        return entry[1]
+
+    def set(self, user_id, key, value):
+        if len(value) > self.max_entry_bytes:
+            return
+        entry_key = (user_id, key)
+        evicted = 0
+        with self._lock:
+            self._entries[entry_key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(entry_key)
+            self._user_keys.setdefault(user_id, set()).add(entry_key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted += 1
+        if evicted:
+            self.stats.incr('evictions', evicted)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = self._user_keys.pop(user_id, set())
+            for entry_key in keys:
+                self._entries.pop(entry_key, None)
+        if keys:
+            self.stats.incr('invalidations', len(keys))
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SqliteNotesCache(NotesCache):
+    """Общий кэш в файле SQLite (WAL): виден всем процессам на одной машине.
+
+    Вытесняются записи, дольше всех не использовавшиеся. Время доступа
+    обновляется при попадании, только если оно старше ACCESS_REFRESH_FRACTION
+    от TTL: иначе каждое чтение было бы записью в файл и ждало общую
+    блокировку записи SQLite.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS notes_cache (
+                    user_id INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_notes_cache_accessed ON notes_cache (accessed_at)")
+
+    def _connect(self):
+        """Соединение для текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, accessed_at FROM notes_cache WHERE user_id = ? AND key = ? AND expires_at > ?",
+            (user_id, key, now)
+        ).fetchone()
+        if row is None:
+            self.stats.incr('misses')
+            return None
+        value, accessed_at = row
+        if now - accessed_at > self.ttl * ACCESS_REFRESH_FRACTION:
+            conn.execute("UPDATE notes_cache SET accessed_at = ? WHERE user_id = ? AND key = ?", (now, user_id, key))
+        self.stats.incr('hits')
+        return value
+
+    def set(self, user_id, key, value):
+        if len(value) > self.max_entry_bytes:
+            return
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO notes_cache (user_id, key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, key, value, now + self.ttl, now)
+            )
+            # Сначала удаляются просроченные записи, затем самые старые сверх лимита
+            expired = conn.execute("DELETE FROM notes_cache WHERE expires_at <= ?", (now,)).rowcount
+            overflow = conn.execute("SELECT COUNT(*) FROM notes_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM notes_cache WHERE rowid IN "
+                    "(SELECT rowid FROM notes_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        evicted = expired + max(overflow, 0)
+        if evicted:
+            self.stats.incr('evictions', evicted)
+
+    def invalidate_user(self, user_id):
+        removed = self._connect().execute("DELETE FROM notes_cache WHERE user_id = ?", (user_id,)).rowcount
+        if removed:
+            self.stats.incr('invalidations', removed)
+
+    def size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM notes_cache").fetchone()[0]
+
+
+def default_cache_path(app, name):
+    """Файл кэша во временном каталоге, отдельный для каждой базы данных.
+
+    В ключах кэша только id пользователя и версия, поэтому приложения с разными
+    базами на одном хосте (staging и prod, локальный запуск) не должны делить файл.
+    """
+    database = hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'{name}-{database}.sqlite')
+
+
+def create_notes_cache(backend, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+    """Кэш по имени реализации (для sqlite нужен путь к файлу)"""
+    if backend == 'memory':
+        return MemoryNotesCache(ttl=ttl, max_entries=max_entries)
+    if backend == 'sqlite':
+        if not path:
+            raise ValueError("SQLite notes cache requires a path")
+        return SqliteNotesCache(path, ttl=ttl, max_entries=max_entries)
+    if backend == 'none':
+        return NullNotesCache(ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"Unknown notes cache backend: {backend}")
+
+
+def init_notes_cache(app):
+    """Кэш списка заметок из настроек окружения"""
+    app.config.setdefault('NOTES_CACHE_BACKEND', os.getenv('NOTES_CACHE_BACKEND', 'memory'))
+    app.config.setdefault('NOTES_CACHE_TTL', int(os.getenv('NOTES_CACHE_TTL', DEFAULT_TTL)))
+    app.config.setdefault('NOTES_CACHE_MAX_ENTRIES', int(os.getenv('NOTES_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)))
+    app.config.setdefault('NOTES_CACHE_PATH', os.getenv('NOTES_CACHE_PATH') or default_cache_path(app, 'notes_cache'))
+
+    app.extensions['notes_cache'] = create_notes_cache(
+        app.config['NOTES_CACHE_BACKEND'],
+        ttl=app.config['NOTES_CACHE_TTL'],
+        max_entries=app.config['NOTES_CACHE_MAX_ENTRIES'],
+        path=app.config['NOTES_CACHE_PATH']
+    )
+
+
+def get_notes_cache():
+    """Кэш списка заметок текущего приложения"""
+    return current_app.extensions['notes_cache']
+
+
+def invalidate_notes_cache(user_id):
+    """Сброс кэша пользователя после изменения его заметок"""
+    get_notes_cache().invalidate_user(user_id)
@@ -0,0 +1,146 @@
+# Сжатие ответов (gzip / brotli) и отдача предварительно сжатой статики
+import gzip
+import mimetypes
+import os
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+# brotli - необязательная зависимость: без нее используется только gzip
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+
+# Расширения предварительно сжатых файлов статики
+PRECOMPRESSED_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+
+def parse_accept_encoding(header):
+    """Кодировки из Accept-Encoding с их весами q"""
+    encodings = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name] = quality
+    return encodings
+
+
+def accepted_encodings(header, available=None):
+    """Поддерживаемые кодировки, которые принимает клиент, от лучшей к худшей
+    (brotli предпочтительнее gzip при равном весе)"""
+    if available is None:
+        available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    encodings = parse_accept_encoding(header)
+    weighted = [(encodings.get(name, encodings.get('*', 0.0)), position, name)
+                for position, name in enumerate(available)]
+    return [name for quality, _, name in sorted(weighted, key=lambda item: (-item[0], item[1])) if quality > 0]
+
+
+def choose_encoding(header, available=None):
+    """Лучшая поддерживаемая кодировка"""
+    encodings = accepted_encodings(header, available)
+    return encodings[0] if encodings else None
+
+
+def compress_bytes(data, encoding, gzip_level=6, brotli_quality=4):
+    """Сжатие тела ответа выбранной кодировкой"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    # mtime=0 - одинаковый результат для одинаковых данных
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def _add_vary(response):
+    """Ответ зависит от Accept-Encoding - сообщаем это кэшам"""
+    response.vary.add('Accept-Encoding')
+
+
+def init_compression(app):
+    """Подключение сжатия ответов к приложению"""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+
+    static_view = app.view_functions.get('static')
+
+    def precompressed_static(filename):
+        """Статика: готовый .br/.gz рядом с файлом отдается без сжатия на лету.
+
+        Кодировки перебираются в порядке предпочтения клиента: если .br нет или
+        он старше исходного файла, отдается .gz. Для готовых файлов пакет brotli
+        не нужен.
+        """
+        if app.config['COMPRESS_ENABLED']:
+            original = safe_join(app.static_folder, filename)
+            # Сжатая копия без исходного файла (удален или переименован) не отдается - 404
+            if original and os.path.isfile(original):
+                modified = os.path.getmtime(original)
+                for encoding in accepted_encodings(request.headers.get('Accept-Encoding'),
+                                                   list(PRECOMPRESSED_EXTENSIONS)):
+                    extension = PRECOMPRESSED_EXTENSIONS[encoding]
+                    compressed = safe_join(app.static_folder, filename + extension)
+                    if compressed and os.path.isfile(compressed) and os.path.getmtime(compressed) >= modified:
+                        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                        response = send_from_directory(app.static_folder, filename + extension, mimetype=mimetype)
+                        response.headers['Content-Encoding'] = encoding
+                        _add_vary(response)
+                        return response
+        response = static_view(filename=filename)
+        _add_vary(response)
+        return response
+
+    if static_view is not None:
+        app.view_functions['static'] = precompressed_static
+
+    @app.after_request
+    def compress_response(response):
+        """Сжатие динамических ответов, если клиент это поддерживает"""
+        if not app.config['COMPRESS_ENABLED']:
+            return response
+
+        # Потоковые ответы и файлы (send_file) отдаются как есть
+        if response.is_streamed or response.direct_passthrough:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        if 'no-transform' in response.headers.get('Cache-Control', ''):
+            return response
+
+        _add_vary(response)
+
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if not encoding:
+            return response
+
+        response.set_data(compress_bytes(
+            data, encoding,
+            gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESS_BROTLI_QUALITY']
+        ))
+        response.headers['Content-Encoding'] = encoding
+        # У сжатого представления свой ETag
+        if response.headers.get('ETag'):
+            response.headers['ETag'] = f"{response.headers['ETag']}-{encoding}"
+        return response
@@ -1,8 +1,9 @@
 # Система обработки ошибок
-from flask import render_template, request, jsonify, current_app
+from flask import render_template, request, jsonify, current_app, g
 from werkzeug.exceptions import HTTPException
 import traceback
 import logging
+import time
 from datetime import datetime
 
 def init_error_handlers(app):
@@ -111,22 +112,31 @@ def log_error(status_code, title, message, error=None):
         error_info['error_type'] = type(error).__name__
         error_info['error_message'] = str(error)
     
+    # Поля JSON-лога; текст сообщения собирается при записи, а не в потоке запроса
+    started = g.get('request_started')
+    fields = {
+        'action': 'HTTP_ERROR',
+        'user': getattr(g.get('_login_user'), 'id', None),  # без лишнего запроса к БД
+        'ip': error_info['ip'],
+        'endpoint': request.endpoint,
+        'status': status_code,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2) if started else None,
+        **error_info
+    }
+    del fields['status_code']
+    
     # Логируем в зависимости от типа ошибки
     if status_code >= 500:
-        current_app.logger.error(f"Server Error: {error_info}")
+        current_app.logger.error("Server Error: %s", error_info, extra={'fields': fields})
     elif status_code >= 400:
-        current_app.logger.warning(f"Client Error: {error_info}")
+        current_app.logger.warning("Client Error: %s", error_info, extra={'fields': fields})
     else:
-        current_app.logger.info(f"Info: {error_info}")
+        current_app.logger.info("Info: %s", error_info, extra={'fields': fields})
 
 def get_client_ip():
-    """Получение IP адреса клиента"""
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
-    elif request.headers.get('X-Real-IP'):
-        return request.headers.get('X-Real-IP')
-    else:
-        return request.remote_addr
+    """Получение IP адреса клиента (с учетом доверенных прокси, как в rate limiting)"""
+    from app.rate_limiter import get_client_ip as rate_limit_client_ip
+    return rate_limit_client_ip()
 
 def create_error_response(status_code, message, details=None):
     """Создание стандартизированного ответа с ошибкой"""
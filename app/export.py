@@ -0,0 +1,255 @@
+# Потоковый экспорт заметок в NDJSON и CSV
+# Строки читаются с серверного курсора пачками и сразу отдаются клиенту,
+# поэтому память не зависит от количества заметок. NDJSON-выгрузка
+# детерминирована для версии заметок, что позволяет докачку через Range.
+import bisect
+import csv
+import io
+import threading
+import zlib
+from collections import OrderedDict
+from flask import Response, current_app, request, stream_with_context
+from app import db
+from app.serialization import NOTE_FIELDS, dumps, serialize_note
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Строк в одной пачке чтения с курсора и в одном отправляемом куске
+EXPORT_BATCH_SIZE = 500
+# Строк в одной транзакции при выгрузке всех пользователей
+ADMIN_EXPORT_CHUNK_SIZE = 2000
+
+USER_EXPORT_FIELDS = NOTE_FIELDS
+ADMIN_EXPORT_FIELDS = NOTE_FIELDS + ['user_id']
+
+
+def _batched(rows, size):
+    """Разбиение потока строк на пачки"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ndjson_batches(rows, fields):
+    """Куски NDJSON вместе с id последней заметки в куске"""
+    for batch in _batched(rows, EXPORT_BATCH_SIZE):
+        yield b''.join(dumps(serialize_note(row, fields)) + b'\n' for row in batch), batch[-1].id
+
+
+def ndjson_chunks(rows, fields):
+    """NDJSON: одна заметка на строку"""
+    for chunk, _ in _ndjson_batches(rows, fields):
+        yield chunk
+
+
+def csv_chunks(rows, fields):
+    """CSV с заголовком; даты в ISO 8601"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in _batched(rows, EXPORT_BATCH_SIZE):
+        for row in batch:
+            writer.writerow([
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in (getattr(row, field) for field in fields)
+            ])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Пустая выгрузка - только заголовок
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Сжатие потока на лету (формат gzip)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def slice_chunks(chunks, start, stop):
+    """Байты потока в диапазоне [start, stop)"""
+    position = 0
+    for chunk in chunks:
+        end = position + len(chunk)
+        if end > start and position < stop:
+            yield chunk[max(start - position, 0):min(stop - position, len(chunk))]
+        position = end
+        if position >= stop:
+            break
+
+
+def count_bytes(chunks):
+    """Размер потока без хранения его в памяти"""
+    return sum(len(chunk) for chunk in chunks)
+
+
+# Раскладка NDJSON-выгрузок по ETag: размер и точки продолжения (смещение,
+# id последней заметки перед ним) после каждой пачки. Докачка считает поток
+# один раз и начинает чтение с ближайшей точки запросом after_id, не
+# сериализуя заново все, что клиент уже получил.
+_layouts = OrderedDict()
+_LAYOUTS_LIMIT = 64
+_layouts_lock = threading.Lock()
+
+
+def _remember_layout(etag, layout):
+    with _layouts_lock:
+        _layouts[etag] = layout
+        _layouts.move_to_end(etag)
+        while len(_layouts) > _LAYOUTS_LIMIT:
+            _layouts.popitem(last=False)
+
+
+def _with_layout(batches, remember):
+    """Куски NDJSON; раскладка передается в remember, когда поток прочитан до конца"""
+    offsets, ids = [0], [None]
+    for chunk, last_id in batches:
+        yield chunk
+        offsets.append(offsets[-1] + len(chunk))
+        ids.append(last_id)
+    remember((offsets.pop(), offsets, ids[:-1]))
+
+
+def _while_current(chunks, is_current):
+    """Поток, который обрывается, если данные изменились после расчета размера.
+
+    Каждый кусок отдается только после проверки версии: раз она не изменилась,
+    строки куска прочитаны из той же версии, что и посчитанный Content-Length.
+    Оборванный ответ короче Content-Length, и клиент запросит выгрузку заново.
+    """
+    for chunk in chunks:
+        if not is_current():
+            current_app.logger.warning("Export changed while streaming a range, response truncated")
+            return
+        yield chunk
+
+
+def user_notes_rows(user_id, fields, after_id=None):
+    """Заметки пользователя по возрастанию id с серверного курсора"""
+    Note = current_app.Note
+    query = Note.query.filter(Note.user_id == user_id)
+    if after_id:
+        query = query.filter(Note.id > after_id)
+    query = query.order_by(Note.id).with_entities(*[getattr(Note, field) for field in fields])
+    return query.yield_per(EXPORT_BATCH_SIZE)
+
+
+def all_notes_rows(fields, after_id=None, chunk_size=ADMIN_EXPORT_CHUNK_SIZE):
+    """Заметки всех пользователей короткими keyset-запросами.
+
+    Каждый кусок читается в отдельной транзакции, поэтому выгрузка не держит
+    снимок базы и блокировки на все время скачивания.
+    """
+    Note = current_app.Note
+    columns = [getattr(Note, field) for field in fields]
+    last_id = after_id or 0
+    while True:
+        rows = (
+            Note.query.filter(Note.id > last_id)
+            .order_by(Note.id)
+            .with_entities(*columns)
+            .limit(chunk_size)
+            .all()
+        )
+        db.session.rollback()  # завершаем транзакцию чтения до отправки куска
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1].id
+        if len(rows) < chunk_size:
+            return
+
+
+def export_chunks(fmt, rows_factory, fields):
+    """Поток байтов выгрузки в выбранном формате"""
+    rows = rows_factory()
+    if fmt == 'csv':
+        return csv_chunks(rows, fields)
+    return ndjson_chunks(rows, fields)
+
+
+def accepts_gzip():
+    """Клиент принимает gzip"""
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def export_response(fmt, rows_factory, fields, filename, etag=None, allow_range=False, is_current=None):
+    """Потоковый ответ с выгрузкой.
+
+    rows_factory создает новый поток строк; с аргументом - поток заметок после
+    указанного id (продолжение докачки). Диапазоны отдаются без сжатия и только
+    если If-Range совпадает с текущим ETag. is_current проверяет, что данные
+    все еще соответствуют ETag: если они изменились, пока считался размер,
+    ответ 412, а если во время отдачи - поток обрывается.
+    """
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'private, no-transform',
+        'Vary': 'Accept-Encoding',
+    }
+    if allow_range:
+        headers['Accept-Ranges'] = 'bytes'
+
+    byte_range = request.range if allow_range else None
+    if byte_range is not None and 'If-Range' in request.headers and request.if_range.etag != etag:
+        byte_range = None
+    if byte_range is not None and len(byte_range.ranges) != 1:
+        byte_range = None
+
+    if byte_range is not None:
+        with _layouts_lock:
+            layout = _layouts.get(etag) if etag else None
+        if layout is None:
+            measured = []
+            count_bytes(_with_layout(_ndjson_batches(rows_factory(), fields), measured.append))
+            layout = measured[0]
+            if is_current is not None and not is_current():
+                return Response(status=412, headers=headers)
+            if etag:
+                _remember_layout(etag, layout)
+        total, offsets, ids = layout
+        bounds = byte_range.range_for_length(total)
+        if bounds is None:
+            headers['Content-Range'] = f'bytes */{total}'
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{total}'
+        headers['Content-Length'] = str(stop - start)
+        if etag:
+            headers['ETag'] = f'"{etag}"'
+        # Чтение с последней точки продолжения не дальше начала диапазона
+        point = bisect.bisect_right(offsets, start) - 1
+        rows = rows_factory(ids[point]) if ids[point] is not None else rows_factory()
+        chunks = slice_chunks(ndjson_chunks(rows, fields), start - offsets[point], stop - offsets[point])
+        if is_current is not None:
+            chunks = _while_current(chunks, is_current)
+        return Response(stream_with_context(chunks), status=206, mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+    if fmt == 'ndjson' and allow_range and etag:
+        def remember(layout):
+            if is_current is None or is_current():
+                _remember_layout(etag, layout)
+        chunks = _with_layout(_ndjson_batches(rows_factory(), fields), remember)
+    else:
+        chunks = export_chunks(fmt, rows_factory, fields)
+    if accepts_gzip():
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        if etag:
+            headers['ETag'] = f'"{etag}-gzip"'
+    elif etag:
+        headers['ETag'] = f'"{etag}"'
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt], headers=headers)
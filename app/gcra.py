@@ -0,0 +1,180 @@
+# GCRA (Generic Cell Rate Algorithm) - стратегия rate limiting для Flask-Limiter
+# Лимит "N per период" превращается в интервал T = период / N: на ключ хранится
+# одно число - TAT (theoretical arrival time), момент, когда квота полностью
+# восстановится. Запрос стоимостью c проходит, если max(TAT, now) + c*T - now
+# не больше периода. Пачка до N запросов проходит сразу, дальше - по одному
+# каждые T секунд, поэтому на границе окон нельзя получить 2N запросов, как у
+# фиксированного окна.
+#
+# Включается RATELIMIT_STRATEGY=gcra (по умолчанию) и работает со всеми
+# декораторами из app/rate_limiter.py. TAT хранится в SQLite-хранилище
+# (app/rate_limit_storage.py); для остальных хранилищ - в памяти процесса,
+# не больше RATELIMIT_MAX_KEYS ключей.
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from limits.limits import GRANULARITIES
+from limits.storage import MemoryStorage
+from limits.strategies import STRATEGIES, RateLimiter
+from limits.util import WindowStats
+from app.rate_limit_storage import MAX_RATE_LIMIT_KEYS
+
+GCRA_STRATEGY = 'gcra'
+# Запас на погрешность вычислений с плавающей точкой
+EPSILON = 1e-6
+
+
+def _limit_from_key(key):
+    """Лимит из ключа вида LIMITER/.../<amount>/<multiples>/<granularity> или None"""
+    parts = key.rsplit('/', 3)
+    if len(parts) != 4 or parts[3] not in GRANULARITIES:
+        return None
+    try:
+        return GRANULARITIES[parts[3]](int(parts[1]), int(parts[2]))
+    except ValueError:
+        return None
+
+
+class LocalGCRAState:
+    """TAT ключей в памяти процесса (для хранилищ без поддержки GCRA).
+
+    Таблица ограничена max_keys: ключи лежат в порядке последнего обращения,
+    с начала удаляются ключи с уже восстановленной квотой, а при переполнении -
+    самые давние (LRU).
+    """
+
+    def __init__(self, max_keys=MAX_RATE_LIMIT_KEYS):
+        self.max_keys = max_keys
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._tat = OrderedDict()
+
+    def _trim(self, now):
+        while self._tat:
+            key, tat = next(iter(self._tat.items()))
+            if tat > now:
+                break
+            self._tat.popitem(last=False)
+            self.expired += 1
+        while self.max_keys and len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+            self.evicted += 1
+
+    def gcra_hit(self, key, increment, period):
+        now = time.time()
+        with self._lock:
+            current = self._tat.get(key)
+            tat = max(current or now, now) + increment
+            allowed = tat - now <= period + EPSILON
+            if allowed:
+                self._tat[key] = tat
+            if key in self._tat:
+                # Отклоненные запросы тоже продлевают жизнь ключа: иначе поток
+                # новых ключей вытеснил бы состояние клиента, упершегося в лимит
+                self._tat.move_to_end(key)
+            self._trim(now)
+        return allowed
+
+    def gcra_tats(self, keys):
+        with self._lock:
+            return {key: self._tat[key] for key in keys if key in self._tat}
+
+    def gcra_top(self, count):
+        now = time.time()
+        with self._lock:
+            return heapq.nlargest(count, ((k, v) for k, v in self._tat.items() if v > now), key=lambda kv: kv[1])
+
+    def gcra_clear(self, key):
+        with self._lock:
+            self._tat.pop(key, None)
+
+    def info(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'keys': len(self._tat),
+                'max_keys': self.max_keys,
+                'expired': self.expired,
+                'evicted': self.evicted,
+            }
+
+
+class GCRARateLimiter(RateLimiter):
+    """GCRA: одна отметка времени на ключ вместо счетчиков окон"""
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        if hasattr(storage, 'gcra_hit'):
+            self.state = storage
+            return
+        if not isinstance(storage, MemoryStorage):
+            logging.getLogger(__name__).warning(
+                "Storage %s does not support GCRA, limits are kept per process", type(storage).__name__)
+        self.state = LocalGCRAState()
+
+    @staticmethod
+    def _interval(item):
+        """Интервал между запросами и длина периода лимита в секундах"""
+        period = item.get_expiry()
+        return period / item.amount, period
+
+    def hit(self, item, *identifiers, cost=1):
+        interval, period = self._interval(item)
+        if cost * interval > period + EPSILON:
+            return False
+        return self.state.gcra_hit(item.key_for(*identifiers), cost * interval, period)
+
+    def test(self, item, *identifiers, cost=1):
+        interval, period = self._interval(item)
+        key = item.key_for(*identifiers)
+        now = time.time()
+        tat = self.state.gcra_tats([key]).get(key, now)
+        return max(tat, now) + cost * interval - now <= period + EPSILON
+
+    @classmethod
+    def window_stats(cls, item, tat, now):
+        """(время сброса, остаток) по TAT ключа.
+
+        Пока остаток есть, сброс - момент полного восстановления квоты; когда
+        квота исчерпана - момент, когда пройдет следующий запрос.
+        """
+        interval, period = cls._interval(item)
+        base = max(tat or now, now)
+        remaining = max(0, min(item.amount, int(math.floor((period - (base - now)) / interval + EPSILON))))
+        reset = base if remaining else base - period + interval
+        return WindowStats(reset, remaining)
+
+    def get_window_stats(self, item, *identifiers):
+        key = item.key_for(*identifiers)
+        return self.window_stats(item, self.state.gcra_tats([key]).get(key), time.time())
+
+    def get_windows_stats(self, limits):
+        """Статистика для пар (лимит, ключ) одним обращением к хранилищу"""
+        tats = self.state.gcra_tats(dict.fromkeys(key for _, key in limits))
+        now = time.time()
+        return [self.window_stats(item, tats.get(key), now) for item, key in limits]
+
+    def top_windows(self, count):
+        """Ключи с самым поздним восстановлением квоты: [(key, израсходовано, время сброса)]"""
+        now = time.time()
+        windows = []
+        for key, tat in self.state.gcra_top(count):
+            item = _limit_from_key(key)
+            used = int(math.ceil((tat - now) / self._interval(item)[0] - EPSILON)) if item else None
+            windows.append((key, used, tat))
+        return windows
+
+    def clear(self, item, *identifiers):
+        self.state.gcra_clear(item.key_for(*identifiers))
+
+    def info(self):
+        """Размер таблицы ключей и счетчики вытеснения"""
+        return self.state.info()
+
+
+# Регистрация стратегии: Flask-Limiter выбирает ее по RATELIMIT_STRATEGY
+STRATEGIES[GCRA_STRATEGY] = GCRARateLimiter
@@ -0,0 +1,208 @@
+# Хеширование паролей в отдельных процессах
+# PBKDF2 занимает сотни миллисекунд процессора на попытку. В пуле процессов
+# одновременно считается не больше HASHING_WORKERS хешей, а очередь ограничена
+# HASHING_MAX_PENDING задачами: при переполнении запрос сразу получает 503,
+# а не занимает воркер gunicorn в ожидании.
+#
+# HASHING_WORKERS=0 - хеширование в потоке запроса (отладка, тесты)
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_HASHING_TIMEOUT = 5.0
+# Приоритет процессов пула ниже воркеров: хеширование уступает процессор запросам
+DEFAULT_HASHING_NICE = 5
+# Сколько последних вызовов учитывать в перцентилях
+LATENCY_WINDOW = 1000
+
+
+class HashingUnavailable(Exception):
+    """Пул хеширования перегружен или не ответил вовремя"""
+
+
+def _init_worker(nice):
+    """Понижение приоритета процесса пула"""
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+
+def _timed_generate(password):
+    """Хеш пароля и время вычисления (выполняется в процессе пула)"""
+    started = time.perf_counter()
+    result = generate_password_hash(password)
+    return result, time.perf_counter() - started
+
+
+def _timed_check(password_hash, password):
+    """Проверка пароля и время вычисления (выполняется в процессе пула)"""
+    started = time.perf_counter()
+    result = check_password_hash(password_hash, password)
+    return result, time.perf_counter() - started
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class HashingStats:
+    """Задержки вызовов: ожидание в очереди и вычисление (в пределах процесса)"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.calls = {'generate': 0, 'check': 0}
+        self.rejected = 0
+        self.timeouts = 0
+        self._total = deque(maxlen=window)
+        self._wait = deque(maxlen=window)
+        self._compute = deque(maxlen=window)
+
+    def record(self, operation, total, compute):
+        with self._lock:
+            self.calls[operation] += 1
+            self._total.append(total)
+            self._wait.append(max(total - compute, 0.0))
+            self._compute.append(compute)
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            latency = {}
+            for name, values in (('total', self._total), ('queue_wait', self._wait), ('compute', self._compute)):
+                ordered = sorted(values)
+                latency[name] = {
+                    'p50_ms': round(_percentile(ordered, 0.5) * 1000, 2),
+                    'p95_ms': round(_percentile(ordered, 0.95) * 1000, 2),
+                    'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+                }
+            return {
+                'calls': dict(self.calls),
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'latency': latency,
+            }
+
+
+class PasswordHasher:
+    """Хеширование паролей в ограниченном пуле процессов.
+
+    Пул создается при первом вызове в каждом процессе: после fork воркеров
+    gunicorn пул мастера непригоден.
+    """
+
+    def __init__(self, workers, max_pending, timeout=DEFAULT_HASHING_TIMEOUT, nice=DEFAULT_HASHING_NICE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.nice = nice
+        self.stats = HashingStats()
+        self._slots = threading.BoundedSemaphore(max_pending) if workers else None
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # spawn: процессы пула не наследуют потоки и соединения с БД
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker, initargs=(self.nice,))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _reset_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _call(self, operation, func, *args):
+        started = time.perf_counter()
+        if not self.workers:
+            result, compute = func(*args)
+            self.stats.record(operation, time.perf_counter() - started, compute)
+            return result
+
+        # Очередь заполнена - отказ без ожидания
+        if not self._slots.acquire(blocking=False):
+            self.stats.incr('rejected')
+            raise HashingUnavailable("Password hashing queue is full")
+        try:
+            future = self._get_pool().submit(func, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset_pool()
+            raise HashingUnavailable("Password hashing pool crashed")
+        # Место в очереди освобождается, когда задача действительно завершена,
+        # даже если запрос перестал ее ждать
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result, compute = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.stats.incr('timeouts')
+            raise HashingUnavailable("Password hashing timed out")
+        except BrokenProcessPool:
+            self._reset_pool()
+            raise HashingUnavailable("Password hashing pool crashed")
+
+        self.stats.record(operation, time.perf_counter() - started, compute)
+        return result
+
+    def generate(self, password):
+        """Хеш нового пароля"""
+        return self._call('generate', _timed_generate, password)
+
+    def check(self, password_hash, password):
+        """Проверка пароля по хешу"""
+        return self._call('check', _timed_check, password_hash, password)
+
+    def info(self):
+        """Параметры пула и задержки"""
+        data = self.stats.as_dict()
+        data.update({'workers': self.workers, 'max_pending': self.max_pending, 'timeout': self.timeout,
+                     'nice': self.nice})
+        return data
+
+
+def init_password_hasher(app):
+    """Пул хеширования из настроек окружения"""
+    default_workers = 0 if app.debug or app.testing else max(1, (os.cpu_count() or 2) // 2)
+    app.config.setdefault('HASHING_WORKERS', int(os.getenv('HASHING_WORKERS', default_workers)))
+    workers = app.config['HASHING_WORKERS']
+    app.config.setdefault('HASHING_MAX_PENDING', int(os.getenv('HASHING_MAX_PENDING', max(workers, 1) * 4)))
+    app.config.setdefault('HASHING_TIMEOUT', float(os.getenv('HASHING_TIMEOUT', DEFAULT_HASHING_TIMEOUT)))
+    app.config.setdefault('HASHING_NICE', int(os.getenv('HASHING_NICE', DEFAULT_HASHING_NICE)))
+
+    app.extensions['password_hasher'] = PasswordHasher(
+        workers,
+        app.config['HASHING_MAX_PENDING'],
+        timeout=app.config['HASHING_TIMEOUT'],
+        nice=app.config['HASHING_NICE']
+    )
+
+
+def get_password_hasher():
+    """Пул хеширования текущего приложения"""
+    return current_app.extensions['password_hasher']
+
+
+def hash_password(password):
+    """Хеш пароля через пул (HashingUnavailable при перегрузке)"""
+    return get_password_hasher().generate(password)
+
+
+def verify_password(password_hash, password):
+    """Проверка пароля через пул (HashingUnavailable при перегрузке)"""
+    return get_password_hasher().check(password_hash, password)
@@ -0,0 +1,276 @@
+# Массовый импорт заметок из NDJSON
+# Вход читается построчно и обрабатывается пачками: проверка и санитизация
+# всей пачки, затем одна транзакция на пачку (COPY в PostgreSQL, executemany
+# в остальных СУБД). В той же транзакции обновляются версии заметок, счетчики
+# и прогресс задания, поэтому после сбоя импорт продолжается ровно с первой
+# незафиксированной строки.
+import csv
+import io
+import json
+import time
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import insert
+from app import db
+from app.notes_version import bump_notes_version
+from app.note_stats import NoteStatsDelta, apply_note_stats
+
+DEFAULT_IMPORT_BATCH_SIZE = 5000
+# Сколько отклоненных строк перечислять в отчете
+MAX_REPORTED_ERRORS = 100
+
+IMPORT_COLUMNS = ['title', 'content', 'user_id', 'status', 'created_at', 'updated_at', 'sync_version']
+
+
+class NoteImportError(Exception):
+    """Импорт нельзя продолжить (задание не найдено, вход оборван и т.п.)"""
+
+
+def create_import_job(source, user_id=None):
+    """Новое задание импорта"""
+    NoteImport = current_app.NoteImport
+    job = NoteImport(source=source[:255], user_id=user_id, status='pending')
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def get_import_job(import_id):
+    """Задание импорта по id"""
+    return db.session.get(current_app.NoteImport, import_id)
+
+
+def import_job_to_dict(job):
+    """Состояние задания для отчетов"""
+    return {
+        'import_id': job.id,
+        'source': job.source,
+        'user_id': job.user_id,
+        'status': job.status,
+        'byte_offset': job.byte_offset,
+        'line_number': job.line_number,
+        'rows_imported': job.rows_imported,
+        'rows_rejected': job.rows_rejected,
+        'error': job.error,
+    }
+
+
+def skip_bytes(stream, count, chunk_size=1024 * 1024):
+    """Пропуск уже импортированной части потока, который нельзя перемотать"""
+    while count > 0:
+        chunk = stream.read(min(chunk_size, count))
+        if not chunk:
+            raise NoteImportError("Input is shorter than the saved import offset")
+        count -= len(chunk)
+
+
+def read_batches(stream, batch_size, line_number=0):
+    """Пачки строк NDJSON: (строки с номерами, прочитано байт, номер последней строки).
+
+    Последняя строка без перевода строки, которая не разбирается как JSON,
+    считается оборванной: она не потребляется, и импорт останавливается.
+    """
+    batch = []
+    consumed = 0
+    for line in stream:
+        if not line.endswith(b'\n'):
+            try:
+                json.loads(line)
+            except ValueError:
+                if batch or consumed:
+                    yield batch, consumed, line_number
+                raise NoteImportError(f"Input ends with an incomplete line after line {line_number}")
+        consumed += len(line)
+        line_number += 1
+        if line.strip():
+            batch.append((line_number, line))
+        if len(batch) >= batch_size:
+            yield batch, consumed, line_number
+            batch = []
+            consumed = 0
+    if batch or consumed:
+        yield batch, consumed, line_number
+
+
+def _parse_timestamp(value, default):
+    """Дата из ISO 8601 (как в выгрузке /api/notes/export)"""
+    if value in (None, ''):
+        return default
+    if not isinstance(value, str):
+        raise ValueError("Timestamp must be a string")
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def validate_import_batch(lines, user_id=None, sanitize=True):
+    """Проверка пачки: (строки для вставки, [(номер строки, причина)])"""
+    from app.routes import sanitize_input, NOTE_STATUSES, MAX_TITLE_LENGTH, MAX_CONTENT_LENGTH
+
+    now = datetime.utcnow()
+    rows = []
+    rejected = []
+    for line_number, line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            rejected.append((line_number, "Invalid JSON"))
+            continue
+        if not isinstance(record, dict):
+            rejected.append((line_number, "Line is not a JSON object"))
+            continue
+
+        owner = user_id if user_id is not None else record.get('user_id')
+        if not isinstance(owner, int) or isinstance(owner, bool):
+            rejected.append((line_number, "Missing user_id"))
+            continue
+
+        title = record.get('title')
+        content = record.get('content')
+        if not isinstance(title, str) or not isinstance(content, str):
+            rejected.append((line_number, "Missing title or content"))
+            continue
+        # PostgreSQL не хранит NUL в текстовых колонках
+        title = title.replace('\x00', '')
+        content = content.replace('\x00', '')
+        if sanitize:
+            title = sanitize_input(title)
+            content = sanitize_input(content)
+        if not title or not content:
+            rejected.append((line_number, "Missing title or content"))
+            continue
+        if len(title) > MAX_TITLE_LENGTH:
+            rejected.append((line_number, "Title too long"))
+            continue
+        if len(content) > MAX_CONTENT_LENGTH:
+            rejected.append((line_number, "Content too long"))
+            continue
+
+        status = record.get('status')
+        if status not in NOTE_STATUSES:
+            status = 'active'
+
+        try:
+            created_at = _parse_timestamp(record.get('created_at'), now)
+            updated_at = _parse_timestamp(record.get('updated_at'), created_at)
+        except ValueError:
+            rejected.append((line_number, "Invalid timestamp"))
+            continue
+
+        rows.append({'title': title, 'content': content, 'user_id': owner, 'status': status,
+                     'created_at': created_at, 'updated_at': updated_at, '_line': line_number})
+
+    # Владельцы проверяются одним запросом на пачку
+    owners = {row['user_id'] for row in rows}
+    if owners:
+        User = current_app.User
+        existing = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(owners))}
+        if existing != owners:
+            valid_rows = []
+            for row in rows:
+                if row['user_id'] in existing:
+                    valid_rows.append(row)
+                else:
+                    rejected.append((row['_line'], "Unknown user_id"))
+            rows = valid_rows
+
+    for row in rows:
+        del row['_line']
+    rejected.sort()
+    return rows, rejected
+
+
+def _copy_rows(rows):
+    """Загрузка пачки через COPY (PostgreSQL) в текущей транзакции"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in IMPORT_COLUMNS])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY notes ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def write_import_batch(rows):
+    """Вставка пачки с версиями заметок и счетчиками (без commit)"""
+    user_ids = sorted({row['user_id'] for row in rows})
+    # Строки пользователей блокируются в одном порядке - без взаимных блокировок
+    versions = {user_id: bump_notes_version(user_id) for user_id in user_ids}
+    stats = {user_id: NoteStatsDelta() for user_id in user_ids}
+    for row in rows:
+        row['sync_version'] = versions[row['user_id']]
+        stats[row['user_id']].add(row['status'], row['content'])
+
+    if db.engine.dialect.name == 'postgresql':
+        _copy_rows(rows)
+    else:
+        db.session.execute(insert(current_app.Note.__table__), rows)
+
+    for user_id, delta in stats.items():
+        apply_note_stats(user_id, delta)
+    return user_ids
+
+
+def run_import(job, stream, batch_size=DEFAULT_IMPORT_BATCH_SIZE, sanitize=True, progress=None):
+    """Импорт потока NDJSON в задание job.
+
+    Поток должен начинаться с job.byte_offset (для нового задания - с начала).
+    progress(job, rows_per_second) вызывается после каждой пачки.
+    """
+    if job.status == 'completed':
+        raise NoteImportError(f"Import {job.id} is already completed")
+
+    job.status = 'running'
+    job.error = None
+    db.session.commit()
+
+    started = time.perf_counter()
+    imported = rejected_count = 0
+    errors = []
+    user_ids = set()
+
+    try:
+        for lines, consumed, line_number in read_batches(stream, batch_size, job.line_number):
+            rows, rejected = validate_import_batch(lines, job.user_id, sanitize)
+            if rows:
+                user_ids.update(write_import_batch(rows))
+
+            # Прогресс фиксируется вместе с пачкой
+            job.byte_offset += consumed
+            job.line_number = line_number
+            job.rows_imported += len(rows)
+            job.rows_rejected += len(rejected)
+            db.session.commit()
+
+            imported += len(rows)
+            rejected_count += len(rejected)
+            for line, reason in rejected[:MAX_REPORTED_ERRORS - len(errors)]:
+                errors.append({'line': line, 'error': reason})
+
+            if progress:
+                progress(job, imported / max(time.perf_counter() - started, 1e-9))
+
+        job.status = 'completed'
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(e)[:1000]
+        db.session.commit()
+        raise
+
+    elapsed = time.perf_counter() - started
+    summary = import_job_to_dict(job)
+    summary.update({
+        'imported_now': imported,
+        'rejected_now': rejected_count,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(imported / elapsed) if elapsed else 0,
+        'errors': errors,
+        'user_ids': sorted(user_ids),
+    })
+    return summary
@@ -0,0 +1,224 @@
+# Неблокирующая запись логов приложения
+# Запрос только кладет запись в ограниченную очередь (QueueHandler), а фоновый
+# поток забирает все, что накопилось, и пишет пачкой: одна запись в файл и один
+# flush на пачку вместо flush на каждую строку в потоке запроса.
+#
+# При переполнении очереди (LOG_QUEUE_SIZE) действует LOG_OVERFLOW:
+#   drop  - запись отбрасывается и учитывается в счетчике dropped (по умолчанию)
+#   block - запрос ждет место в очереди не дольше LOG_BLOCK_TIMEOUT секунд
+# При завершении процесса очередь дописывается в файл (atexit).
+#
+# LOG_QUEUE_ENABLED=0 - прежняя синхронная запись в потоке запроса.
+# LOG_FORMAT=json (по умолчанию) - JSON-строки (app/structured_log.py), text - прежний текст.
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, RotatingFileHandler
+from app.structured_log import JsonFormatter
+
+LOG_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+DEFAULT_LOG_FILE = os.path.join('logs', 'app.log')
+DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_LOG_BACKUP_COUNT = 10
+DEFAULT_LOG_QUEUE_SIZE = 10000
+DEFAULT_LOG_BATCH_SIZE = 500
+OVERFLOW_POLICIES = ('drop', 'block')
+LOG_FORMATS = ('json', 'text')
+# Сколько ждать, пока фоновый поток допишет очередь при завершении
+STOP_TIMEOUT = 5.0
+
+_STOP = object()
+
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler, который пишет пачку записей с одним flush.
+
+    Размер файла считается по записанным байтам, а не через seek/tell на
+    каждую строку (tell сбрасывает буфер).
+    """
+
+    def _open(self):
+        stream = super()._open()
+        self._size = stream.seek(0, os.SEEK_END)
+        return stream
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            for line in lines:
+                size = len(line.encode(self.encoding or 'utf-8', 'replace'))
+                if self.maxBytes > 0 and self._size and self._size + size >= self.maxBytes:
+                    self.doRollover()
+                self.stream.write(line)
+                self._size += size
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class LogPipeline:
+    """Ограниченная очередь записей и фоновый поток, который пишет их пачками"""
+
+    def __init__(self, handler, max_size=DEFAULT_LOG_QUEUE_SIZE, overflow='drop', block_timeout=1.0,
+                 batch_size=DEFAULT_LOG_BATCH_SIZE):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"LOG_OVERFLOW must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self.handler = handler
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.queue = queue.Queue(max_size)
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.max_batch = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Поток не переживает fork: после него запускается заново
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(self.queue.maxsize)
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def put(self, record):
+        """Запись в очередь (из потока запроса)"""
+        self._ensure_started()
+        try:
+            if self.overflow == 'block':
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            batch = []
+            stop = record is _STOP
+            if not stop:
+                batch.append(record)
+            # Все, что накопилось, пока писалась предыдущая пачка
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                else:
+                    batch.append(record)
+            if batch:
+                self.handler.emit_batch(batch)
+                self.written += len(batch)
+                self.batches += 1
+                self.max_batch = max(self.max_batch, len(batch))
+            if stop:
+                return
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Дописать очередь в файл и остановить поток"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self.handler.flush()
+
+    def info(self):
+        """Состояние очереди для мониторинга"""
+        return {
+            'queued': self.queue.qsize(),
+            'max_size': self.queue.maxsize,
+            'overflow': self.overflow,
+            'dropped': self.dropped,
+            'written': self.written,
+            'batches': self.batches,
+            'avg_batch': round(self.written / self.batches, 1) if self.batches else 0,
+            'max_batch': self.max_batch,
+        }
+
+
+class PipelineQueueHandler(QueueHandler):
+    """QueueHandler, который отдает записи в LogPipeline"""
+
+    def __init__(self, pipeline):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        # Очередь в том же процессе: сообщение форматируется в фоновом потоке, а не в потоке запроса
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.put(record)
+
+
+def init_logging(app):
+    """Запись логов приложения в файл с ротацией (через очередь, если LOG_QUEUE_ENABLED)"""
+    app.config.setdefault('LOG_FILE', os.getenv('LOG_FILE', DEFAULT_LOG_FILE))
+    app.config.setdefault('LOG_FORMAT', os.getenv('LOG_FORMAT', 'json'))
+    app.config.setdefault('LOG_MAX_BYTES', int(os.getenv('LOG_MAX_BYTES', DEFAULT_LOG_MAX_BYTES)))
+    app.config.setdefault('LOG_BACKUP_COUNT', int(os.getenv('LOG_BACKUP_COUNT', DEFAULT_LOG_BACKUP_COUNT)))
+    app.config.setdefault('LOG_QUEUE_ENABLED', os.getenv('LOG_QUEUE_ENABLED', '1') not in ('0', 'false', 'False'))
+    app.config.setdefault('LOG_QUEUE_SIZE', int(os.getenv('LOG_QUEUE_SIZE', DEFAULT_LOG_QUEUE_SIZE)))
+    app.config.setdefault('LOG_OVERFLOW', os.getenv('LOG_OVERFLOW', 'drop'))
+    app.config.setdefault('LOG_BLOCK_TIMEOUT', float(os.getenv('LOG_BLOCK_TIMEOUT', 1.0)))
+    app.config.setdefault('LOG_BATCH_SIZE', int(os.getenv('LOG_BATCH_SIZE', DEFAULT_LOG_BATCH_SIZE)))
+
+    if app.config['LOG_FORMAT'] not in LOG_FORMATS:
+        raise ValueError(f"LOG_FORMAT must be one of {', '.join(LOG_FORMATS)}")
+
+    log_dir = os.path.dirname(app.config['LOG_FILE'])
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    file_handler = BatchRotatingFileHandler(app.config['LOG_FILE'], maxBytes=app.config['LOG_MAX_BYTES'],
+                                            backupCount=app.config['LOG_BACKUP_COUNT'], encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter() if app.config['LOG_FORMAT'] == 'json' else logging.Formatter(LOG_FORMAT))
+    file_handler.setLevel(logging.INFO)
+
+    if app.config['LOG_QUEUE_ENABLED']:
+        pipeline = LogPipeline(file_handler, max_size=app.config['LOG_QUEUE_SIZE'],
+                               overflow=app.config['LOG_OVERFLOW'], block_timeout=app.config['LOG_BLOCK_TIMEOUT'],
+                               batch_size=app.config['LOG_BATCH_SIZE'])
+        handler = PipelineQueueHandler(pipeline)
+        handler.setLevel(logging.INFO)
+        atexit.register(pipeline.stop)
+        app.extensions['log_pipeline'] = pipeline
+    else:
+        handler = file_handler
+
+    app.logger.addHandler(handler)
+    app.logger.setLevel(logging.INFO)
+
+
+def log_pipeline_info(app):
+    """Состояние очереди логов или None, если логи пишутся синхронно"""
+    pipeline = app.extensions.get('log_pipeline')
+    return pipeline.info() if pipeline else None
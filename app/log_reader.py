@@ -0,0 +1,379 @@
+# Потоковая выгрузка логов приложения: app.log и все его ротированные копии
+# Файлы читаются от старых к новым (app.log.10 ... app.log.1, app.log) и
+# отдаются одним потоком строк с фильтром по времени, уровню и действию.
+# Понимает оба формата записи: JSON-строки и прежний текст.
+#
+# Чтобы не просматривать все файлы ради последнего часа, для каждого файла
+# строится разреженный индекс смещений: время первой записи после каждых
+# LOG_INDEX_STEP байт. Индекс хранится в памяти процесса по inode файла, поэтому
+# переживает ротацию (файл переименовывается, inode тот же) и для app.log
+# только дополняется.
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import Response, request, stream_with_context
+from app.export import count_bytes, gzip_chunks, slice_chunks
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+# Байт между точками индекса смещений
+LOG_INDEX_STEP = 64 * 1024
+# Записи пишутся разными потоками и могут немного нарушать порядок по времени
+TIME_SLACK = timedelta(seconds=2)
+# Байт в одном отправляемом куске
+CHUNK_SIZE = 64 * 1024
+READ_SIZE = 256 * 1024
+# Сколько читать с конца файла, чтобы найти последнюю запись
+TAIL_SIZE = 16 * 1024
+
+# {"time": "2026-01-31T12:00:00.123", "level": "INFO", "action": "...", ...}
+_JSON_LINE = re.compile(rb'\{"time": "(\d{4}-\d\d-\d\d)T(\d\d:\d\d:\d\d)\.(\d{3})", "level": "(\w+)"'
+                        rb'(?:, "action": "((?:[^"\\]|\\.)*)")?')
+# 2026-01-31 12:00:00,123 INFO: ACTION: ... | USER: ... | IP: ... | ...
+_TEXT_LINE = re.compile(rb'(\d{4}-\d\d-\d\d) (\d\d:\d\d:\d\d),(\d{3}) (\w+): (?:ACTION: (\S+))?')
+
+
+class InvalidLogFilter(ValueError):
+    """Некорректные параметры выгрузки логов"""
+
+
+def parse_log_line(line):
+    """Время, уровень и действие записи из строки лога (None для строк-продолжений)"""
+    match = _JSON_LINE.match(line) or _TEXT_LINE.match(line)
+    if match is None:
+        return None
+    day, clock, millis, level, action = match.groups()
+    return day + b' ' + clock + b'.' + millis, level, action
+
+
+def time_key(moment):
+    """Время в том же виде, что и ключ из parse_log_line"""
+    return moment.strftime('%Y-%m-%d %H:%M:%S.').encode() + b'%03d' % (moment.microsecond // 1000)
+
+
+def log_files(log_file):
+    """Текущий файл лога и его ротированные копии от старых к новым"""
+    directory = os.path.dirname(log_file) or '.'
+    base = os.path.basename(log_file)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    backups = []
+    for name in names:
+        suffix = name[len(base) + 1:]
+        if name.startswith(base + '.') and suffix.isdigit():
+            backups.append((int(suffix), os.path.join(directory, name)))
+    files = [path for _, path in sorted(backups, reverse=True)]
+    if base in names:
+        files.append(log_file)
+    return files
+
+
+def _record_at(stream, position, limit):
+    """Первая запись, которая начинается не раньше position: (время, смещение)"""
+    stream.seek(position)
+    if position:
+        stream.readline()  # конец строки, в которую попала точка
+    while True:
+        offset = stream.tell()
+        line = stream.readline()
+        if not line.endswith(b'\n') or offset + len(line) > limit:
+            return None
+        parsed = parse_log_line(line)
+        if parsed:
+            return parsed[0], offset
+
+
+class LogOffsetIndex:
+    """Разреженный индекс одного файла лога"""
+
+    def __init__(self):
+        self.size = 0  # проиндексировано байт (только целые строки)
+        self.file_size = 0
+        self.times = []
+        self.offsets = []
+        self.last_time = None
+        self._next_point = 0
+
+    def update(self, stream, size):
+        """Дополнение индекса до текущего размера файла"""
+        if size == self.file_size:
+            return  # ротированные файлы не меняются
+        if size < self.file_size:
+            self.__init__()  # файл перезаписан с начала
+        # Конец последней целой строки
+        tail_start = max(self.size, size - TAIL_SIZE)
+        stream.seek(tail_start)
+        tail = stream.read(size - tail_start)
+        end = tail.rfind(b'\n')
+        if end < 0:
+            return
+        self.file_size = size
+        size = tail_start + end + 1
+
+        while self._next_point < size:
+            found = _record_at(stream, self._next_point, size)
+            if found is None:
+                break
+            moment, offset = found
+            if not self.times or moment >= self.times[-1]:
+                self.times.append(moment)
+                self.offsets.append(offset)
+            self._next_point = offset + LOG_INDEX_STEP
+
+        for line in reversed(tail[:end + 1].splitlines()):
+            parsed = parse_log_line(line)
+            if parsed:
+                self.last_time = parsed[0]
+                break
+        self.size = size
+
+    @property
+    def first_time(self):
+        return self.times[0] if self.times else None
+
+    def seek_offset(self, since):
+        """Смещение, с которого начинаются записи не раньше since"""
+        position = bisect.bisect_left(self.times, since) - 1
+        return self.offsets[position] if position >= 0 else 0
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_log_files(files):
+    """Индексы смещений файлов: список (путь, inode, индекс)"""
+    result = []
+    with _indexes_lock:
+        for path in files:
+            try:
+                with open(path, 'rb') as stream:
+                    stat = os.fstat(stream.fileno())
+                    key = (stat.st_dev, stat.st_ino)
+                    index = _indexes.get(key)
+                    if index is None:
+                        index = _indexes[key] = LogOffsetIndex()
+                    index.update(stream, stat.st_size)
+            except FileNotFoundError:
+                continue  # удален ротацией между listdir и open
+            result.append((path, key, index))
+        # Индексы удаленных файлов больше не нужны
+        alive = {key for _, key, _ in result}
+        for key in [key for key in _indexes if key not in alive]:
+            del _indexes[key]
+    return result
+
+
+def parse_log_time(raw_time):
+    """Время из параметра запроса (ISO 8601) в местном времени логов"""
+    try:
+        moment = datetime.fromisoformat(raw_time) if raw_time else None
+    except ValueError:
+        raise InvalidLogFilter(f"Invalid time: {raw_time}")
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)  # в логе местное время
+    return moment
+
+
+class LogQuery:
+    """Фильтр выгрузки: интервал времени, минимальный уровень, действия"""
+
+    def __init__(self, since=None, until=None, level=None, actions=None):
+        if since and until and since > until:
+            raise InvalidLogFilter("since is after until")
+        if level and level not in LOG_LEVELS:
+            raise InvalidLogFilter(f"level must be one of {', '.join(LOG_LEVELS)}")
+        self.since = since
+        self.until = until
+        self.level = level
+        self.actions = actions
+        self.since_key = time_key(since) if since else None
+        self.until_key = time_key(until) if until else None
+        # Откуда читать и где остановиться с учетом нарушений порядка записей
+        self.seek_key = time_key(since - TIME_SLACK) if since else None
+        self.stop_key = time_key(until + TIME_SLACK) if until else None
+        self.levels = {name.encode() for name in LOG_LEVELS[LOG_LEVELS.index(level):]} if level else None
+        self.action_names = {action.encode() for action in actions} if actions else None
+
+    @classmethod
+    def from_args(cls, args):
+        """Фильтр из параметров запроса since, until, level, action"""
+        actions = [action.strip() for action in args.get('action', '').split(',') if action.strip()]
+        return cls(parse_log_time(args.get('since')), parse_log_time(args.get('until')),
+                   args.get('level', '').upper() or None, actions or None)
+
+    def matches(self, parsed):
+        moment, level, action = parsed
+        if self.since_key and moment < self.since_key:
+            return False
+        if self.until_key and moment > self.until_key:
+            return False
+        if self.levels and level not in self.levels:
+            return False
+        if self.action_names and action not in self.action_names:
+            return False
+        return True
+
+    @property
+    def pinned(self):
+        """Интервал закончился: его записи в логе больше не меняются"""
+        return self.stop_key is not None and self.stop_key < time_key(datetime.now())
+
+    def describe(self):
+        return {
+            'since': self.since.isoformat() if self.since else None,
+            'until': self.until.isoformat() if self.until else None,
+            'level': self.level,
+            'actions': self.actions,
+        }
+
+
+def plan_log_read(files, query):
+    """Какие части каких файлов читать: список (путь, inode, начало, конец)"""
+    plan = []
+    for path, key, index in index_log_files(files):
+        if index.first_time is None:
+            continue
+        if query.stop_key and index.first_time > query.stop_key:
+            break  # этот и более новые файлы целиком позже интервала
+        if query.seek_key and index.last_time and index.last_time < query.seek_key:
+            continue
+        start = index.seek_offset(query.seek_key) if query.seek_key else 0
+        plan.append((path, key, start, index.size))
+    return plan
+
+
+def _read_lines(stream, start, stop):
+    """Целые строки файла между смещениями start и stop"""
+    stream.seek(start)
+    remaining = stop - start
+    pending = b''
+    while remaining > 0:
+        block = stream.read(min(READ_SIZE, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+
+
+def log_chunks(plan, query):
+    """Отфильтрованные строки логов кусками по CHUNK_SIZE байт"""
+    buffer = []
+    buffered = 0
+    for path, _, start, stop in plan:
+        try:
+            stream = open(path, 'rb')
+        except FileNotFoundError:
+            continue
+        with stream:
+            # Строки без времени (трассировки исключений) идут за своей записью
+            keep = False
+            for line in _read_lines(stream, start, stop):
+                parsed = parse_log_line(line)
+                if parsed is not None:
+                    if query.stop_key and parsed[0] > query.stop_key:
+                        break
+                    keep = query.matches(parsed)
+                if keep:
+                    buffer.append(line)
+                    buffered += len(line)
+                    if buffered >= CHUNK_SIZE:
+                        yield b''.join(buffer)
+                        buffer = []
+                        buffered = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def log_etag(plan, query, compressed):
+    """ETag выгрузки для If-Range.
+
+    Для закончившегося интервала содержимое зависит только от файлов, в
+    которые он попал; иначе - еще и от их текущего размера (лог дописывается).
+    """
+    parts = [query.describe(), compressed]
+    for _, key, _, stop in plan:
+        parts.append([key[0], key[1], None if query.pinned else stop])
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+# Размеры уже посчитанных выгрузок по ETag: докачка не считает поток заново
+_sizes = OrderedDict()
+_SIZES_LIMIT = 64
+
+
+def _remember_size(etag, size):
+    with _indexes_lock:
+        _sizes[etag] = size
+        _sizes.move_to_end(etag)
+        while len(_sizes) > _SIZES_LIMIT:
+            _sizes.popitem(last=False)
+
+
+def _counted(chunks, etag):
+    """Поток, который запоминает свой размер, если отдан до конца"""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        yield chunk
+    _remember_size(etag, size)
+
+
+def log_download_response(log_file, query, compressed=True):
+    """Потоковый ответ с логами (None, если логов нет).
+
+    Сжатая выгрузка отдается файлом .gz, поэтому Range относится к байтам
+    архива и докачка работает и со сжатием. Диапазон отдается, только если
+    If-Range совпадает с текущим ETag.
+    """
+    files = log_files(log_file)
+    if not files:
+        return None
+    plan = plan_log_read(files, query)
+    etag = log_etag(plan, query, compressed)
+
+    def chunks():
+        data = log_chunks(plan, query)
+        return gzip_chunks(data) if compressed else data
+
+    filename = f"app-logs-{datetime.now():%Y%m%d-%H%M%S}.log" + ('.gz' if compressed else '')
+    mimetype = 'application/gzip' if compressed else 'text/plain'
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'private, no-transform',
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+    }
+
+    byte_range = request.range
+    if byte_range is not None and 'If-Range' in request.headers and request.if_range.etag != etag:
+        byte_range = None
+    if byte_range is not None and len(byte_range.ranges) != 1:
+        byte_range = None
+
+    if byte_range is None:
+        return Response(stream_with_context(_counted(chunks(), etag)), mimetype=mimetype, headers=headers)
+
+    with _indexes_lock:
+        total = _sizes.get(etag)
+    if total is None:
+        total = count_bytes(chunks())
+        _remember_size(etag, total)
+    bounds = byte_range.range_for_length(total)
+    if bounds is None:
+        headers['Content-Range'] = f'bytes */{total}'
+        return Response(status=416, headers=headers)
+    start, stop = bounds
+    headers['Content-Range'] = f'bytes {start}-{stop - 1}/{total}'
+    headers['Content-Length'] = str(stop - start)
+    return Response(stream_with_context(slice_chunks(chunks(), start, stop)), status=206, mimetype=mimetype,
+                    headers=headers)
@@ -0,0 +1,406 @@
+# Поиск по логам действий для админов
+# Записи действий (ACTION: ... | USER: ... | IP: ... и JSON-строки с полем
+# action) индексируются в отдельном файле SQLite: время, действие, пользователь,
+# IP и место строки в файле лога (inode, смещение, длина). Сами строки в
+# индекс не копируются - найденные записи читаются из файлов лога.
+#
+# Индекс дополняется перед каждым поиском: читаются только байты, дописанные
+# с прошлого раза, причем не больше LOG_INDEX_SYNC_BYTES за запрос (сначала
+# app.log, затем старые копии), чтобы первый поиск по большим логам не ждал
+# полной индексации. Записи файлов, удаленных ротацией, удаляются из индекса.
+import base64
+import binascii
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app.log_pipeline import DEFAULT_LOG_FILE
+from app.log_reader import InvalidLogFilter, log_files, parse_log_line, parse_log_time
+
+DEFAULT_SEARCH_LIMIT = 100
+MAX_SEARCH_LIMIT = 1000
+# Сколько байт логов индексировать за один поиск
+DEFAULT_SYNC_BYTES = 16 * 1024 * 1024
+# Байт лога, которые читаются и индексируются в одной транзакции
+SYNC_CHUNK_SIZE = 4 * 1024 * 1024
+# Кэш страниц SQLite на соединение, КБ
+INDEX_CACHE_KB = 32 * 1024
+
+_JSON_USER = re.compile(rb'"user": (?:(-?\d+)|null|"[^"]*")')
+_JSON_IP = re.compile(rb'"ip": "([^"]*)"')
+_TEXT_USER_IP = re.compile(rb' \| USER: (\S+) \| IP: (\S+)')
+_TEXT_ACTION = re.compile(r'(\S+) (\S+) (\w+): ACTION: (\S+) \| USER: (\S+) \| IP: (\S+) \| ?(.*)', re.S)
+_TEXT_SOURCE = re.compile(r' \[in [^\]]*:\d+\]$')
+_DURATION = re.compile(r'(\d+)([smhd])')
+_DURATION_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS log_files (
+        file_id INTEGER PRIMARY KEY,
+        dev INTEGER NOT NULL,
+        ino INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (dev, ino)
+    );
+    CREATE TABLE IF NOT EXISTS log_entries (
+        file_id INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        time INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        user_id INTEGER,
+        ip TEXT,
+        PRIMARY KEY (file_id, offset)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS ix_log_entries_time ON log_entries (time);
+    CREATE INDEX IF NOT EXISTS ix_log_entries_user ON log_entries (user_id, time);
+    CREATE INDEX IF NOT EXISTS ix_log_entries_action ON log_entries (action, time);
+    CREATE INDEX IF NOT EXISTS ix_log_entries_ip ON log_entries (ip, time);
+"""
+
+
+class InvalidLogSearch(ValueError):
+    """Некорректные параметры поиска по логам"""
+
+
+def _time_value(key):
+    """Время записи как число YYYYMMDDHHMMSSmmm"""
+    return int(key[0:4] + key[5:7] + key[8:10] + key[11:13] + key[14:16] + key[17:19] + key[20:23])
+
+
+def _moment_value(moment):
+    return int(moment.strftime('%Y%m%d%H%M%S')) * 1000 + moment.microsecond // 1000
+
+
+def parse_action_line(line):
+    """(время, действие, пользователь, IP) записи действия или None"""
+    parsed = parse_log_line(line)
+    if parsed is None or not parsed[2]:
+        return None
+    moment, _, action = parsed
+    if line.startswith(b'{'):
+        user = _JSON_USER.search(line)
+        ip = _JSON_IP.search(line)
+        user_id = user.group(1) if user else None
+        ip = ip.group(1) if ip else None
+    else:
+        match = _TEXT_USER_IP.search(line)
+        user_id, ip = match.groups() if match else (None, None)
+    try:
+        user_id = int(user_id) if user_id is not None else None
+    except ValueError:
+        user_id = None  # USER: None
+    ip = ip.decode('utf-8', 'replace') if ip else None
+    return _time_value(moment), action.decode('utf-8', 'replace'), user_id, ip
+
+
+def entry_from_line(line):
+    """Запись лога для ответа API (JSON-строка целиком или поля текстовой строки)"""
+    text = line.decode('utf-8', 'replace').rstrip('\n')
+    if text.startswith('{'):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return {'raw': text}
+    match = _TEXT_ACTION.match(text)
+    if match is None:
+        return {'raw': text}
+    day, clock, level, action, user, ip, details = match.groups()
+    details = _TEXT_SOURCE.sub('', details)
+    return {
+        'time': f"{day}T{clock.replace(',', '.')}",
+        'level': level,
+        'action': action,
+        'user': int(user) if user.lstrip('-').isdigit() else None,
+        'ip': ip,
+        'details': details,
+    }
+
+
+def _encode_cursor(time_value, file_id, offset):
+    payload = json.dumps([time_value, file_id, offset], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidLogSearch('Malformed cursor')
+    if not isinstance(position, list) or len(position) != 3 or not all(isinstance(v, int) for v in position):
+        raise InvalidLogSearch('Malformed cursor')
+    return position
+
+
+def _parse_duration(raw_duration):
+    """Длительность вида 30m, 1h, 7d"""
+    match = _DURATION.fullmatch(raw_duration.strip().lower())
+    if match is None:
+        raise InvalidLogSearch(f"Invalid duration: {raw_duration}")
+    return timedelta(**{_DURATION_UNITS[match.group(2)]: int(match.group(1))})
+
+
+class LogSearchQuery:
+    """Условия поиска: пользователь, действия, IP, интервал времени"""
+
+    def __init__(self, user_id=None, actions=None, ip=None, since=None, until=None, limit=DEFAULT_SEARCH_LIMIT,
+                 cursor=None):
+        self.user_id = user_id
+        self.actions = actions
+        self.ip = ip
+        self.since = since
+        self.until = until
+        self.limit = limit
+        self.cursor = cursor
+
+    @classmethod
+    def from_args(cls, args):
+        """Параметры запроса: user, action (через запятую), ip, since/until (ISO 8601) или last, limit, cursor"""
+        user_id = args.get('user')
+        if user_id:
+            try:
+                user_id = int(user_id)
+            except ValueError:
+                raise InvalidLogSearch(f"Invalid user: {user_id}")
+        actions = [action.strip().upper() for action in args.get('action', '').split(',') if action.strip()]
+        try:
+            since = parse_log_time(args.get('since'))
+            until = parse_log_time(args.get('until'))
+        except InvalidLogFilter as e:
+            raise InvalidLogSearch(str(e))
+        if args.get('last'):
+            since = datetime.now() - _parse_duration(args['last'])
+        try:
+            limit = max(1, min(int(args.get('limit', DEFAULT_SEARCH_LIMIT)), MAX_SEARCH_LIMIT))
+        except ValueError:
+            limit = DEFAULT_SEARCH_LIMIT
+        cursor = _decode_cursor(args['cursor']) if args.get('cursor') else None
+        return cls(user_id or None, actions or None, args.get('ip') or None, since, until, limit, cursor)
+
+    def sql(self):
+        """WHERE-часть и параметры запроса к индексу"""
+        conditions = []
+        params = []
+        if self.user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(self.user_id)
+        if self.actions:
+            conditions.append(f"action IN ({', '.join('?' * len(self.actions))})")
+            params.extend(self.actions)
+        if self.ip:
+            conditions.append("ip = ?")
+            params.append(self.ip)
+        if self.since:
+            conditions.append("time >= ?")
+            params.append(_moment_value(self.since))
+        if self.until:
+            conditions.append("time <= ?")
+            params.append(_moment_value(self.until))
+        if self.cursor:
+            conditions.append("(time, file_id, offset) < (?, ?, ?)")
+            params.extend(self.cursor)
+        return ' AND '.join(conditions) or '1', params
+
+
+class LogIndex:
+    """Индекс записей действий в файле SQLite рядом с логами"""
+
+    def __init__(self, log_file, path, sync_bytes=DEFAULT_SYNC_BYTES):
+        self.log_file = log_file
+        self.path = path
+        self.sync_bytes = sync_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        """Соединение текущего потока (после fork открывается заново)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Индекс всегда можно перестроить из логов
+            conn.execute("PRAGMA synchronous=OFF")
+            # Вставки во вторичные индексы идут вразброс - им нужен кэш страниц побольше
+            conn.execute(f"PRAGMA cache_size=-{INDEX_CACHE_KB}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _file_id(self, conn, path, stat):
+        """id файла лога в индексе и проиндексированный размер"""
+        row = conn.execute("SELECT file_id, size FROM log_files WHERE dev = ? AND ino = ?",
+                           (stat.st_dev, stat.st_ino)).fetchone()
+        if row is None:
+            conn.execute("INSERT OR IGNORE INTO log_files (dev, ino, path) VALUES (?, ?, ?)",
+                         (stat.st_dev, stat.st_ino, path))
+            row = conn.execute("SELECT file_id, size FROM log_files WHERE dev = ? AND ino = ?",
+                               (stat.st_dev, stat.st_ino)).fetchone()
+        file_id, size = row
+        if stat.st_size < size:
+            # Файл перезаписан с начала (тот же inode)
+            self._drop_file(conn, file_id, keep_file=True)
+            size = 0
+        conn.execute("UPDATE log_files SET path = ? WHERE file_id = ?", (path, file_id))
+        return file_id, size
+
+    def _drop_file(self, conn, file_id, keep_file=False):
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM log_entries WHERE file_id = ?", (file_id,))
+        if keep_file:
+            conn.execute("UPDATE log_files SET size = 0 WHERE file_id = ?", (file_id,))
+        else:
+            conn.execute("DELETE FROM log_files WHERE file_id = ?", (file_id,))
+        conn.execute("COMMIT")
+
+    def _index_chunk(self, conn, stream, file_id, start, stop):
+        """Индексация целых строк между start и stop; возвращает новый размер"""
+        stream.seek(start)
+        data = stream.read(stop - start)
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return start
+        rows = []
+        offset = start
+        for line in data[:end].splitlines(keepends=True):
+            parsed = parse_action_line(line)
+            if parsed:
+                rows.append((file_id, offset, len(line)) + parsed)
+            offset += len(line)
+        conn.execute("BEGIN IMMEDIATE")
+        # Другой воркер мог проиндексировать эти строки раньше - повтор игнорируется
+        conn.executemany("INSERT OR IGNORE INTO log_entries VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("UPDATE log_files SET size = max(size, ?) WHERE file_id = ?", (start + end, file_id))
+        conn.execute("COMMIT")
+        return start + end
+
+    def sync(self):
+        """Дополнение индекса новыми строками логов; возвращает состояние индексации"""
+        conn = self._connect()
+        budget = self.sync_bytes
+        indexed = 0
+        pending = 0
+        alive = set()
+        for path in reversed(log_files(self.log_file)):
+            try:
+                stream = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with stream:
+                stat = os.fstat(stream.fileno())
+                alive.add((stat.st_dev, stat.st_ino))
+                file_id, size = self._file_id(conn, path, stat)
+                while size < stat.st_size and budget > 0:
+                    stop = min(stat.st_size, size + min(SYNC_CHUNK_SIZE, budget))
+                    new_size = self._index_chunk(conn, stream, file_id, size, stop)
+                    if new_size == size:
+                        break  # строка еще дописывается
+                    budget -= new_size - size
+                    indexed += new_size - size
+                    size = new_size
+                pending += stat.st_size - size
+
+        # Файлы, удаленные ротацией (ротация могла переименовать файлы во время прохода)
+        for path in log_files(self.log_file):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            alive.add((stat.st_dev, stat.st_ino))
+        for file_id, dev, ino in conn.execute("SELECT file_id, dev, ino FROM log_files").fetchall():
+            if (dev, ino) not in alive:
+                self._drop_file(conn, file_id)
+        return {'indexed_bytes': indexed, 'pending_bytes': pending}
+
+    def _open_indexed(self, path, key):
+        """Файл лога с этим inode: по сохраненному пути, а после ротации - среди текущих файлов"""
+        for candidate in [path] + [other for other in reversed(log_files(self.log_file)) if other != path]:
+            try:
+                stream = open(candidate, 'rb')
+            except FileNotFoundError:
+                continue
+            stat = os.fstat(stream.fileno())
+            if (stat.st_dev, stat.st_ino) == key:
+                return stream
+            stream.close()
+        return None
+
+    def search(self, query):
+        """Записи действий по условиям query, от новых к старым"""
+        conn = self._connect()
+        where, params = query.sql()
+        rows = conn.execute(
+            f"SELECT file_id, offset, length, time FROM log_entries WHERE {where} "
+            f"ORDER BY time DESC, file_id DESC, offset DESC LIMIT ?",
+            params + [query.limit + 1]
+        ).fetchall()
+        has_more = len(rows) > query.limit
+        rows = rows[:query.limit]
+
+        files = {file_id: (path, (dev, ino)) for file_id, dev, ino, path
+                 in conn.execute("SELECT file_id, dev, ino, path FROM log_files").fetchall()}
+        streams = {}
+        entries = []
+        try:
+            for file_id, offset, length, _ in rows:
+                if file_id not in streams:
+                    streams[file_id] = self._open_indexed(*files[file_id]) if file_id in files else None
+                stream = streams[file_id]
+                if stream is None:
+                    continue  # файл удален ротацией после индексации
+                stream.seek(offset)
+                entries.append(entry_from_line(stream.read(length)))
+        finally:
+            for stream in streams.values():
+                if stream:
+                    stream.close()
+
+        next_cursor = _encode_cursor(rows[-1][3], rows[-1][0], rows[-1][1]) if has_more else None
+        return entries, next_cursor
+
+    def info(self):
+        """Размер индекса для мониторинга"""
+        conn = self._connect()
+        return {
+            'files': conn.execute("SELECT count(*) FROM log_files").fetchone()[0],
+            'entries': conn.execute("SELECT count(*) FROM log_entries").fetchone()[0],
+            'file_bytes': os.path.getsize(self.path),
+        }
+
+
+def default_log_index_path(log_file):
+    """Файл индекса рядом с логами"""
+    return os.path.join(os.path.dirname(log_file), 'log_index.sqlite')
+
+
+def get_log_index():
+    """Индекс логов текущего приложения (создается при первом поиске)"""
+    index = current_app.extensions.get('log_index')
+    if index is None:
+        log_file = current_app.config.get('LOG_FILE', DEFAULT_LOG_FILE)
+        current_app.config.setdefault('LOG_INDEX_PATH', os.getenv('LOG_INDEX_PATH', default_log_index_path(log_file)))
+        current_app.config.setdefault('LOG_INDEX_SYNC_BYTES',
+                                      int(os.getenv('LOG_INDEX_SYNC_BYTES', DEFAULT_SYNC_BYTES)))
+        index = LogIndex(log_file, current_app.config['LOG_INDEX_PATH'], current_app.config['LOG_INDEX_SYNC_BYTES'])
+        current_app.extensions['log_index'] = index
+    return index
+
+
+def search_logs(query):
+    """Дополнение индекса и поиск: (записи, курсор следующей страницы, состояние индекса)"""
+    index = get_log_index()
+    started = time.perf_counter()
+    sync_state = index.sync()
+    sync_state['sync_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    started = time.perf_counter()
+    entries, next_cursor = index.search(query)
+    sync_state['search_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return entries, next_cursor, sync_state
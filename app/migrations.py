@@ -0,0 +1,324 @@
+# Версионированные миграции схемы базы данных (PostgreSQL и SQLite)
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+# Зарегистрированные миграции: список (версия, имя, функция)
+MIGRATIONS = []
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+
+def migration(version, name):
+    """Декоратор регистрации миграции"""
+    def decorator(func):
+        if any(existing[0] == version for existing in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version: {version}")
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+def _column_names(conn, table):
+    """Список колонок таблицы"""
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+
+@migration(1, 'create_users_and_notes')
+def create_users_and_notes(conn, dialect):
+    """Базовые таблицы users и notes"""
+    if dialect == 'postgresql':
+        id_column = 'id SERIAL PRIMARY KEY'
+    else:
+        id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS users (
+            {id_column},
+            first_name VARCHAR(50) NOT NULL,
+            last_name VARCHAR(50) NOT NULL,
+            age INTEGER NOT NULL,
+            avatar_url TEXT NOT NULL,
+            about VARCHAR(300),
+            role VARCHAR(20) NOT NULL
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS notes (
+            {id_column},
+            title VARCHAR(100) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            status VARCHAR(20) DEFAULT 'active'
+        )
+    """))
+
+
+@migration(2, 'add_auth_fields')
+def add_auth_fields(conn, dialect):
+    """Поля email и password_hash в таблице users"""
+    columns = _column_names(conn, 'users')
+    if 'email' not in columns:
+        # SQLite не умеет добавлять UNIQUE-колонку через ALTER TABLE
+        conn.execute(text("ALTER TABLE users ADD COLUMN email VARCHAR(120)"))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_users_email ON users (email)"))
+    if 'password_hash' not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN password_hash VARCHAR(255)"))
+
+
+@migration(3, 'notes_query_indexes')
+def notes_query_indexes(conn, dialect):
+    """Составные индексы под запросы /api/notes и регистронезависимый email"""
+    # Фильтр по статусу + сортировка по дате создания
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notes_user_status_created ON notes (user_id, status, created_at)"
+    ))
+    # Сортировки без фильтра по статусу
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notes_user_created ON notes (user_id, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notes_user_updated ON notes (user_id, updated_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notes_user_title ON notes (user_id, title)"
+    ))
+    # Вход и регистрация ищут пользователя по lower(email)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_email_lower ON users (lower(email))"
+    ))
+
+
+@migration(4, 'notes_full_text_search')
+def notes_full_text_search(conn, dialect):
+    """Полнотекстовый индекс заметок (используется app/search.py)"""
+    if dialect == 'postgresql':
+        # Генерируемая колонка пересчитывается самой СУБД при INSERT/UPDATE
+        conn.execute(text("""
+            ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('russian', coalesce(content, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(content, '')), 'B')
+            ) STORED
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING GIN (search_vector)"
+        ))
+    elif dialect == 'sqlite':
+        # External content FTS5: текст хранится только в notes, индекс - в notes_fts
+        conn.execute(text("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                title, content,
+                content='notes', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """))
+        # Триггеры держат индекс в синхронизации с notes
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+                INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+                INSERT INTO notes_fts (notes_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+            END
+        """))
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+                INSERT INTO notes_fts (notes_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+                INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+            END
+        """))
+        # Индексация уже существующих заметок
+        conn.execute(text("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')"))
+
+
+@migration(5, 'users_notes_version')
+def users_notes_version(conn, dialect):
+    """Счетчик версии заметок пользователя для ETag (app/notes_version.py)"""
+    if 'notes_version' not in _column_names(conn, 'users'):
+        conn.execute(text("ALTER TABLE users ADD COLUMN notes_version INTEGER NOT NULL DEFAULT 0"))
+
+
+@migration(6, 'notes_sync')
+def notes_sync(conn, dialect):
+    """Версия изменения заметки и надгробия удаленных заметок для /api/notes/changes"""
+    if 'sync_version' not in _column_names(conn, 'notes'):
+        conn.execute(text("ALTER TABLE notes ADD COLUMN sync_version INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_notes_user_sync ON notes (user_id, sync_version)"
+    ))
+
+    if dialect == 'postgresql':
+        id_column = 'id SERIAL PRIMARY KEY'
+    else:
+        id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS note_tombstones (
+            {id_column},
+            note_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            sync_version INTEGER NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_note_tombstones_user_sync ON note_tombstones (user_id, sync_version)"
+    ))
+
+
+@migration(7, 'note_stats_counters')
+def note_stats_counters(conn, dialect):
+    """Счетчики заметок по статусам (app/note_stats.py) с начальным заполнением"""
+    from app.note_stats import rebuild_note_stats
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS note_stats (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            status VARCHAR(20) NOT NULL,
+            note_count INTEGER NOT NULL DEFAULT 0,
+            content_size BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, status)
+        )
+    """))
+    rebuild_note_stats(conn)
+
+
+@migration(8, 'note_imports')
+def note_imports(conn, dialect):
+    """Задания массового импорта заметок с прогрессом для продолжения (app/importer.py)"""
+    if dialect == 'postgresql':
+        id_column = 'id SERIAL PRIMARY KEY'
+    else:
+        id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS note_imports (
+            {id_column},
+            source VARCHAR(255) NOT NULL,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            status VARCHAR(20) NOT NULL,
+            byte_offset BIGINT NOT NULL DEFAULT 0,
+            line_number INTEGER NOT NULL DEFAULT 0,
+            rows_imported INTEGER NOT NULL DEFAULT 0,
+            rows_rejected INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+@migration(9, 'revoked_tokens')
+def revoked_tokens(conn, dialect):
+    """Отозванные bearer-токены (app/tokens.py)"""
+    if dialect == 'postgresql':
+        id_column = 'id SERIAL PRIMARY KEY'
+    else:
+        id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            {id_column},
+            jti VARCHAR(64) NOT NULL UNIQUE,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            expires_at TIMESTAMP NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires ON revoked_tokens (expires_at)"))
+
+
+@migration(10, 'notes_timestamp_format')
+def notes_timestamp_format(conn, dialect):
+    """Даты заметок в SQLite в одном формате 'YYYY-MM-DD HH:MM:SS.ffffff'.
+
+    CURRENT_TIMESTAMP пишет дату без долей секунды, SQLAlchemy - с
+    микросекундами. Курсорная пагинация сравнивает даты как строки по
+    индексам (user_id, created_at) и (user_id, updated_at), поэтому старые
+    строки дополняются, а триггеры приводят к полному формату даты, записанные
+    мимо приложения (DEFAULT CURRENT_TIMESTAMP).
+    """
+    if dialect != 'sqlite':
+        return
+    for column in ('created_at', 'updated_at'):
+        conn.execute(text(
+            f"UPDATE notes SET {column} = {column} || '.000000' WHERE length({column}) = 19"
+        ))
+    for event in ('INSERT', 'UPDATE OF created_at, updated_at'):
+        name = 'notes_timestamp_' + event.split()[0].lower()
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON notes
+            WHEN length(new.created_at) = 19 OR length(new.updated_at) = 19
+            BEGIN
+                UPDATE notes SET
+                    created_at = CASE WHEN length(created_at) = 19 THEN created_at || '.000000' ELSE created_at END,
+                    updated_at = CASE WHEN length(updated_at) = 19 THEN updated_at || '.000000' ELSE updated_at END
+                WHERE id = new.id;
+            END
+        """))
+
+
+@migration(11, 'note_tombstones_retention')
+def note_tombstones_retention(conn, dialect):
+    """Версия, до которой удалены устаревшие надгробия (app/note_sync.py)"""
+    if 'tombstones_pruned_version' not in _column_names(conn, 'users'):
+        conn.execute(text("ALTER TABLE users ADD COLUMN tombstones_pruned_version INTEGER NOT NULL DEFAULT 0"))
+
+
+def _ensure_migrations_table(conn):
+    """Создание таблицы учета примененных миграций"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """))
+
+
+def get_applied_versions(engine):
+    """Версии уже примененных миграций"""
+    with engine.begin() as conn:
+        _ensure_migrations_table(conn)
+        rows = conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))
+        return {row[0] for row in rows}
+
+
+def get_migration_status(engine):
+    """Статус всех миграций: список (версия, имя, применена ли)"""
+    applied = get_applied_versions(engine)
+    return [(version, name, version in applied) for version, name, _ in MIGRATIONS]
+
+
+def run_migrations(engine, target=None, log=print):
+    """Применение всех непримененных миграций до target включительно.
+
+    Каждая миграция выполняется в отдельной транзакции вместе с записью
+    в schema_migrations, поэтому прерванный запуск можно просто повторить.
+    """
+    dialect = engine.dialect.name
+    applied = get_applied_versions(engine)
+    newly_applied = []
+
+    for version, name, func in MIGRATIONS:
+        if version in applied:
+            continue
+        if target is not None and version > target:
+            break
+
+        log(f"➕ Миграция {version}: {name}")
+        with engine.begin() as conn:
+            func(conn, dialect)
+            conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {'version': version, 'name': name, 'applied_at': datetime.utcnow()}
+            )
+        newly_applied.append(version)
+
+    return newly_applied
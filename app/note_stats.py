@@ -0,0 +1,109 @@
+# Счетчики заметок пользователя по статусам (/api/notes/stats)
+# Счетчики меняются в той же транзакции, что и заметки, поэтому статистика
+# читается одним запросом по первичному ключу вместо GROUP BY по notes.
+# reconcile_note_stats.py пересчитывает их с нуля.
+from collections import defaultdict
+from sqlalchemy import text
+from app import db
+
+NOTE_STATS_TABLE = 'note_stats'
+
+# UPSERT поддерживают и PostgreSQL, и SQLite (3.24+)
+_ADJUST_SQL = text(f"""
+    INSERT INTO {NOTE_STATS_TABLE} (user_id, status, note_count, content_size)
+    VALUES (:user_id, :status, :note_count, :content_size)
+    ON CONFLICT (user_id, status) DO UPDATE SET
+        note_count = {NOTE_STATS_TABLE}.note_count + excluded.note_count,
+        content_size = {NOTE_STATS_TABLE}.content_size + excluded.content_size
+""")
+
+
+class NoteStatsDelta:
+    """Накопленные изменения счетчиков для одной транзакции"""
+
+    def __init__(self):
+        self.counts = defaultdict(lambda: [0, 0])  # статус -> [заметок, символов]
+
+    def add(self, status, content):
+        """Заметка появилась (или перешла в статус)"""
+        status = status or 'active'
+        self.counts[status][0] += 1
+        self.counts[status][1] += len(content)
+
+    def remove(self, status, content):
+        """Заметка удалена (или ушла из статуса)"""
+        status = status or 'active'
+        self.counts[status][0] -= 1
+        self.counts[status][1] -= len(content)
+
+    def change(self, old_status, old_content, new_status, new_content):
+        """Заметка изменена"""
+        self.remove(old_status, old_content)
+        self.add(new_status, new_content)
+
+    def rows(self, user_id):
+        """Ненулевые изменения в виде параметров UPSERT"""
+        return [
+            {'user_id': user_id, 'status': status, 'note_count': count, 'content_size': size}
+            for status, (count, size) in sorted(self.counts.items())
+            if count or size
+        ]
+
+
+def apply_note_stats(user_id, delta):
+    """Применение изменений в текущей транзакции.
+
+    Вызывается после bump_notes_version: строка пользователя уже
+    заблокирована, поэтому параллельные записи не теряют обновления.
+    """
+    rows = delta.rows(user_id)
+    if rows:
+        db.session.execute(_ADJUST_SQL, rows)
+
+
+def get_note_stats(user_id):
+    """Счетчики пользователя: {статус: (заметок, символов)}"""
+    rows = db.session.execute(
+        text(f"SELECT status, note_count, content_size FROM {NOTE_STATS_TABLE} WHERE user_id = :user_id"),
+        {'user_id': user_id}
+    )
+    return {status: (count, size) for status, count, size in rows}
+
+
+def rebuild_note_stats(conn, user_id=None):
+    """Пересчет счетчиков по таблице notes (всех пользователей или одного)"""
+    condition = "WHERE user_id = :user_id" if user_id is not None else ""
+    params = {'user_id': user_id} if user_id is not None else {}
+    conn.execute(text(f"DELETE FROM {NOTE_STATS_TABLE} {condition}"), params)
+    conn.execute(text(f"""
+        INSERT INTO {NOTE_STATS_TABLE} (user_id, status, note_count, content_size)
+        SELECT user_id, COALESCE(status, 'active'), COUNT(*), COALESCE(SUM(LENGTH(content)), 0)
+        FROM notes {condition}
+        GROUP BY user_id, COALESCE(status, 'active')
+    """), params)
+
+
+def find_note_stats_drift(conn, user_id=None):
+    """Расхождения счетчиков с таблицей notes: список (user_id, статус, счетчик, факт)"""
+    condition = "WHERE user_id = :user_id" if user_id is not None else ""
+    params = {'user_id': user_id} if user_id is not None else {}
+    actual = {
+        (row[0], row[1]): (row[2], row[3]) for row in conn.execute(text(f"""
+            SELECT user_id, COALESCE(status, 'active'), COUNT(*), COALESCE(SUM(LENGTH(content)), 0)
+            FROM notes {condition}
+            GROUP BY user_id, COALESCE(status, 'active')
+        """), params)
+    }
+    stored = {
+        (row[0], row[1]): (row[2], row[3]) for row in conn.execute(text(
+            f"SELECT user_id, status, note_count, content_size FROM {NOTE_STATS_TABLE} {condition}"
+        ), params)
+    }
+
+    drift = []
+    for key in sorted(set(actual) | set(stored)):
+        expected = actual.get(key, (0, 0))
+        counted = stored.get(key, (0, 0))
+        if expected != counted:
+            drift.append((key[0], key[1], counted, expected))
+    return drift
@@ -0,0 +1,116 @@
+# Синхронизация заметок по изменениям (/api/notes/changes)
+# Токен синхронизации - версия заметок пользователя (users.notes_version).
+# Каждая запись увеличивает версию и помечает ею измененные заметки
+# (notes.sync_version) или надгробия удаленных (note_tombstones), поэтому
+# изменения после токена выбираются по индексу (user_id, sync_version)
+#
+# Надгробия хранятся TOMBSTONE_RETENTION: старые удаляются при следующем
+# удалении заметок пользователя, а users.tombstones_pruned_version запоминает
+# последнюю удаленную версию. Клиенту с токеном старше нее нужен полный
+# список заново (reset).
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+
+# Больше изменений клиенту выгоднее перезагрузить список целиком
+MAX_SYNC_CHANGES = 1000
+# Сколько хранятся надгробия удаленных заметок
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+class InvalidSyncToken(ValueError):
+    """Токен синхронизации не разобран или не относится к этой базе"""
+
+
+def parse_sync_token(token, current_version):
+    """Разбор токена: неотрицательная версия, не больше текущей"""
+    try:
+        since = int(token)
+    except (TypeError, ValueError):
+        raise InvalidSyncToken("Sync token must be an integer")
+    if since < 0 or since > current_version:
+        raise InvalidSyncToken("Sync token is out of range")
+    return since
+
+
+def prune_note_tombstones(user_id, now):
+    """Удаление надгробий пользователя старше TOMBSTONE_RETENTION (в текущей транзакции).
+
+    Вызывается после bump_notes_version: строка пользователя уже заблокирована.
+    """
+    NoteTombstone = current_app.NoteTombstone
+    User = current_app.User
+    cutoff = now - TOMBSTONE_RETENTION
+
+    # Самое старое надгробие - первое по индексу (user_id, sync_version)
+    oldest = (
+        db.session.query(NoteTombstone.deleted_at)
+        .filter(NoteTombstone.user_id == user_id)
+        .order_by(NoteTombstone.sync_version)
+        .limit(1)
+        .scalar()
+    )
+    if oldest is None or oldest >= cutoff:
+        return
+    pruned_version = (
+        db.session.query(db.func.max(NoteTombstone.sync_version))
+        .filter(NoteTombstone.user_id == user_id, NoteTombstone.deleted_at < cutoff)
+        .scalar()
+    )
+    db.session.query(NoteTombstone).filter(
+        NoteTombstone.user_id == user_id, NoteTombstone.sync_version <= pruned_version
+    ).delete(synchronize_session=False)
+    db.session.query(User).filter(User.id == user_id).update(
+        {User.tombstones_pruned_version: pruned_version}, synchronize_session=False
+    )
+
+
+def record_deleted_notes(user_id, note_ids, version):
+    """Надгробия удаленных заметок и очистка устаревших (в текущей транзакции)"""
+    if not note_ids:
+        return
+    NoteTombstone = current_app.NoteTombstone
+    now = datetime.utcnow()
+    prune_note_tombstones(user_id, now)
+    db.session.bulk_insert_mappings(NoteTombstone, [
+        {'note_id': note_id, 'user_id': user_id, 'sync_version': version, 'deleted_at': now}
+        for note_id in note_ids
+    ])
+
+
+def get_note_changes(user_id, since, columns):
+    """Заметки, измененные после версии since, и id удаленных.
+
+    Возвращает None, если изменений больше MAX_SYNC_CHANGES или надгробия
+    после since уже удалены - клиенту нужно загрузить список заново.
+    """
+    Note = current_app.Note
+    NoteTombstone = current_app.NoteTombstone
+    User = current_app.User
+
+    pruned_version = db.session.query(User.tombstones_pruned_version).filter(User.id == user_id).scalar()
+    if since < (pruned_version or 0):
+        return None
+
+    rows = (
+        Note.query
+        .filter(Note.user_id == user_id, Note.sync_version > since)
+        .order_by(Note.sync_version, Note.id)
+        .with_entities(*columns)
+        .limit(MAX_SYNC_CHANGES + 1)
+        .all()
+    )
+    if len(rows) > MAX_SYNC_CHANGES:
+        return None
+
+    deleted_ids = [
+        note_id for (note_id,) in db.session.query(NoteTombstone.note_id)
+        .filter(NoteTombstone.user_id == user_id, NoteTombstone.sync_version > since)
+        .order_by(NoteTombstone.sync_version)
+        .limit(MAX_SYNC_CHANGES + 1)
+    ]
+    if len(rows) + len(deleted_ids) > MAX_SYNC_CHANGES:
+        return None
+
+    # Один id может быть удален несколько раз (SQLite переиспользует id)
+    return rows, list(dict.fromkeys(deleted_ids))
@@ -0,0 +1,35 @@
+# Версия списка заметок пользователя
+# Счетчик увеличивается при каждом изменении заметок, поэтому ETag списка можно
+# построить из версии и параметров запроса, не читая и не сериализуя сами заметки
+import hashlib
+from flask import current_app
+from sqlalchemy import update
+from app import db
+
+
+def get_notes_version(user_id):
+    """Текущая версия заметок пользователя (один запрос по первичному ключу)"""
+    User = current_app.User
+    version = db.session.query(User.notes_version).filter(User.id == user_id).scalar()
+    return version or 0
+
+
+def bump_notes_version(user_id):
+    """Увеличение версии в текущей транзакции (фиксируется вместе с изменением заметок).
+
+    Возвращает новую версию: ею помечаются измененные заметки и надгробия.
+    """
+    User = current_app.User
+    return db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(notes_version=User.notes_version + 1)
+        .returning(User.notes_version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def build_notes_etag(user_id, version, params):
+    """ETag списка заметок: пользователь + версия + нормализованные параметры запроса"""
+    normalized = '&'.join(f"{key}={params[key]}" for key in sorted(params))
+    return hashlib.md5(f"{user_id}:{version}:{normalized}".encode()).hexdigest()
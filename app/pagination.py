@@ -0,0 +1,95 @@
+# Курсорная (keyset) пагинация для списков заметок
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+# Размер страницы по умолчанию и максимальный размер
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Поля сортировки, значения которых хранятся в курсоре как даты
+DATETIME_SORT_FIELDS = {'created_at', 'updated_at'}
+
+# Поля сортировки с числовым значением (релевантность поиска)
+NUMERIC_SORT_FIELDS = {'relevance'}
+
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или не соответствует параметрам сортировки"""
+
+
+def parse_page_limit(raw_limit):
+    """Разбор параметра limit (None - пагинация не запрошена)"""
+    if raw_limit is None or raw_limit == '':
+        return None
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_by, order, value, note_id):
+    """Кодирование позиции (значение ключа сортировки + id) в непрозрачную строку"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, order, value, note_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by, order):
+    """Декодирование курсора; возвращает (значение ключа сортировки, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, note_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+
+    # Курсор от другой сортировки указывает на позицию в другом порядке
+    if cursor_sort != sort_by or cursor_order != order:
+        raise InvalidCursor('Cursor does not match sort parameters')
+    if not isinstance(note_id, int):
+        raise InvalidCursor('Malformed cursor')
+
+    if sort_by in DATETIME_SORT_FIELDS:
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor('Malformed cursor')
+    elif sort_by in NUMERIC_SORT_FIELDS:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise InvalidCursor('Malformed cursor')
+    elif not isinstance(value, str):
+        raise InvalidCursor('Malformed cursor')
+
+    return value, note_id
+
+
+def order_by_keyset(query, sort_column, id_column, order):
+    """Сортировка по ключу с id в качестве уникального тай-брейка.
+
+    Ключ - сама колонка, а не выражение над ней, чтобы сортировку и
+    сравнение с курсором обслуживали индексы (user_id, created_at) и
+    (user_id, updated_at). В SQLite даты заметок для этого всегда хранятся
+    в одном формате, с микросекундами (миграция 10).
+    """
+    if order == 'desc':
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column.asc(), id_column.asc())
+
+
+def apply_keyset(query, sort_column, id_column, order, cursor_value, cursor_id):
+    """Фильтр "строго после курсора" для пары (ключ сортировки, id)"""
+    if order == 'desc':
+        condition = or_(
+            sort_column < cursor_value,
+            and_(sort_column == cursor_value, id_column < cursor_id)
+        )
+    else:
+        condition = or_(
+            sort_column > cursor_value,
+            and_(sort_column == cursor_value, id_column > cursor_id)
+        )
+    return query.filter(condition)
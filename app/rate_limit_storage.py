@@ -0,0 +1,201 @@
+# Общее хранилище счетчиков rate limiting для всех воркеров на машине
+# Счетчики фиксированных окон лежат в файле SQLite в режиме WAL: каждый
+# воркер gunicorn видит одни и те же значения, поэтому лимит действует на
+# сервис целиком, а не на каждый процесс отдельно. Проверка - один UPSERT с
+# RETURNING без fsync (synchronous=OFF): счетчики живут минуты, и их потеря
+# при сбое машины допустима.
+#
+# Для стратегии GCRA (app/gcra.py) на ключ хранится одна отметка TAT в
+# таблице rate_limit_tat; проверка - тоже один UPSERT.
+#
+# Число ключей ограничено RATELIMIT_MAX_KEYS: при очистке сначала удаляются
+# истекшие окна, затем окна с самым ранним сроком сброса - поток запросов с
+# разных адресов не раздувает файл без предела.
+#
+# Регистрируется в библиотеке limits под схемой sqlite://:
+#   RATELIMIT_STORAGE_URI=sqlite:///var/run/app/ratelimit.sqlite
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from limits.storage import Storage
+
+DEFAULT_RATE_LIMIT_DB = os.path.join(tempfile.gettempdir(), 'ratelimit.sqlite')
+# Раз в сколько увеличений счетчиков удалять истекшие окна
+CLEANUP_EVERY = 1000
+# Максимум ключей в каждой таблице лимитов (0 - без ограничения)
+MAX_RATE_LIMIT_KEYS = int(os.getenv('RATELIMIT_MAX_KEYS', 100000))
+
+_INCR_SQL = """
+    INSERT INTO rate_limits (key, value, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,
+        expires_at = CASE WHEN expires_at <= ? OR ? THEN excluded.expires_at ELSE expires_at END
+    RETURNING value
+"""
+
+# Новый TAT записывается, только если запрос укладывается в лимит;
+# иначе RETURNING не вернет строку
+_GCRA_SQL = """
+    INSERT INTO rate_limit_tat (key, tat) VALUES (?1, ?2 + ?3)
+    ON CONFLICT (key) DO UPDATE SET tat = max(tat, ?2) + ?3
+    WHERE max(tat, ?2) + ?3 - ?2 <= ?4
+    RETURNING tat
+"""
+
+
+class SQLiteStorage(Storage):
+    """Счетчики фиксированных окон в общем файле SQLite (WAL)"""
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri=None, wrap_exceptions=False, max_keys=MAX_RATE_LIMIT_KEYS, **options):
+        path = (uri or '')[len('sqlite://'):] or DEFAULT_RATE_LIMIT_DB
+        self.path = path
+        self.max_keys = max_keys
+        # Счетчики очистки в этом процессе
+        self.expired = 0
+        self.evicted = 0
+        self._local = threading.local()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit_tat (
+                key TEXT PRIMARY KEY,
+                tat REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connect(self):
+        """Соединение текущего потока (после fork открывается заново)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.writes = 0
+        return conn
+
+    def _cleanup(self, conn, now):
+        self._local.writes += 1
+        if self._local.writes % CLEANUP_EVERY != 0:
+            return
+        for table, column in (('rate_limits', 'expires_at'), ('rate_limit_tat', 'tat')):
+            self.expired += conn.execute(f"DELETE FROM {table} WHERE {column} <= ?", (now,)).rowcount
+            if not self.max_keys:
+                continue
+            excess = conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] - self.max_keys
+            if excess > 0:
+                self.evicted += conn.execute(
+                    f"DELETE FROM {table} WHERE key IN (SELECT key FROM {table} ORDER BY {column} LIMIT ?)",
+                    (excess,)
+                ).rowcount
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        """Увеличение счетчика окна; истекшее окно начинается заново"""
+        conn = self._connect()
+        now = time.time()
+        value = conn.execute(_INCR_SQL, (key, amount, now + expiry, now, now, bool(elastic_expiry))).fetchone()[0]
+        self._cleanup(conn, now)
+        return value
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._connect().execute(
+            "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def get_windows(self, keys):
+        """Счетчики и сроки сброса нескольких окон одним запросом: {key: (value, expires_at)}.
+
+        Окон, которых нет или которые истекли, в ответе нет.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        rows = self._connect().execute(
+            f"SELECT key, value, expires_at FROM rate_limits WHERE key IN ({','.join('?' * len(keys))}) "
+            "AND expires_at > ?", (*keys, time.time())
+        ).fetchall()
+        return {key: (value, expires_at) for key, value, expires_at in rows}
+
+    def top_windows(self, limit=20):
+        """Самые загруженные действующие окна: [(key, value, expires_at)]"""
+        return self._connect().execute(
+            "SELECT key, value, expires_at FROM rate_limits WHERE expires_at > ? ORDER BY value DESC LIMIT ?",
+            (time.time(), limit)
+        ).fetchall()
+
+    def gcra_hit(self, key, increment, period):
+        """Проверка GCRA: сдвиг TAT на increment, если запрос укладывается в period"""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(_GCRA_SQL, (key, now, increment, period + 1e-6)).fetchone()
+        self._cleanup(conn, now)
+        return row is not None
+
+    def gcra_tats(self, keys):
+        """TAT нескольких ключей одним запросом: {key: tat}"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        rows = self._connect().execute(
+            f"SELECT key, tat FROM rate_limit_tat WHERE key IN ({','.join('?' * len(keys))})", keys
+        ).fetchall()
+        return dict(rows)
+
+    def gcra_top(self, count):
+        return self._connect().execute(
+            "SELECT key, tat FROM rate_limit_tat WHERE tat > ? ORDER BY tat DESC LIMIT ?", (time.time(), count)
+        ).fetchall()
+
+    def gcra_clear(self, key):
+        self._connect().execute("DELETE FROM rate_limit_tat WHERE key = ?", (key,))
+
+    def info(self):
+        """Размер таблиц лимитов и счетчики очистки для мониторинга"""
+        conn = self._connect()
+        return {
+            'backend': 'sqlite',
+            'keys': sum(conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                        for table in ('rate_limits', 'rate_limit_tat')),
+            'max_keys': self.max_keys,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'file_bytes': os.path.getsize(self.path),
+        }
+
+    def check(self):
+        try:
+            self._connect().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        conn = self._connect()
+        return conn.execute("DELETE FROM rate_limits").rowcount + conn.execute("DELETE FROM rate_limit_tat").rowcount
+
+    def clear(self, key):
+        conn = self._connect()
+        conn.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+        conn.execute("DELETE FROM rate_limit_tat WHERE key = ?", (key,))
@@ -1,25 +1,84 @@
 # Система ограничения запросов
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-from flask import request, jsonify
+from limits.storage import SCHEMES, MovingWindowSupport, SlidingWindowCounterSupport
+from limits.strategies import STRATEGIES, FixedWindowRateLimiter
+from flask import request, jsonify, current_app, g
+import importlib.util
+import logging
+import math
+import os
 import time
+from app.rate_limit_storage import DEFAULT_RATE_LIMIT_DB
+from app.gcra import GCRA_STRATEGY
 
-# Создаем экземпляр лимитера
+def get_client_ip():
+    """Получение IP адреса клиента.
+    
+    Заголовкам прокси можно верить, только если их выставил свой прокси:
+    RATELIMIT_TRUSTED_PROXIES - сколько прокси стоит перед приложением. Адрес
+    клиента - N-й справа в X-Forwarded-For (левее него клиент может вписать
+    что угодно). При 0 заголовки игнорируются.
+    """
+    trusted_proxies = current_app.config.get('RATELIMIT_TRUSTED_PROXIES', 0)
+    if trusted_proxies > 0:
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if len(forwarded) >= trusted_proxies:
+            return forwarded[-trusted_proxies]
+        if not forwarded and request.headers.get('X-Real-IP'):
+            return request.headers.get('X-Real-IP')
+    return request.remote_addr
+
+# Создаем экземпляр лимитера (хранилище счетчиков - из RATELIMIT_STORAGE_URI)
 limiter = Limiter(
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    key_func=get_client_ip,
+    default_limits=["200 per day", "50 per hour"]
 )
 
-def get_client_ip():
-    """Получение IP адреса клиента"""
-    # Проверяем заголовки прокси
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
-    elif request.headers.get('X-Real-IP'):
-        return request.headers.get('X-Real-IP')
-    else:
-        return request.remote_addr
+REDIS_SCHEMES = ('redis://', 'rediss://', 'redis+unix://', 'redis+sentinel://', 'redis+cluster://')
+
+def get_storage_uri():
+    """Хранилище счетчиков лимитов.
+    
+    По умолчанию - общий файл SQLite для всех воркеров на машине (app/rate_limit_storage.py).
+    Redis (RATELIMIT_STORAGE_URI=redis://...) нужен, только если воркеры на разных машинах;
+    без пакета redis используется локальный SQLite. memory:// - отдельные счетчики на процесс.
+    """
+    uri = os.getenv('RATELIMIT_STORAGE_URI') or f"sqlite://{DEFAULT_RATE_LIMIT_DB}"
+    if uri.startswith(REDIS_SCHEMES) and importlib.util.find_spec('redis') is None:
+        logging.getLogger(__name__).warning("Package redis is not installed, rate limits use local SQLite storage")
+        uri = f"sqlite://{DEFAULT_RATE_LIMIT_DB}"
+    return uri
+
+def get_strategy():
+    """Стратегия лимитов: GCRA (app/gcra.py) или стратегия Flask-Limiter из RATELIMIT_STRATEGY.
+
+    С хранилищем SQLite по умолчанию работают gcra и fixed-window;
+    moving-window и sliding-window-counter - только с memory:// и Redis.
+    """
+    return os.getenv('RATELIMIT_STRATEGY') or GCRA_STRATEGY
+
+# Стратегии, которым нужна поддержка со стороны хранилища
+STRATEGY_STORAGE_SUPPORT = {
+    'moving-window': MovingWindowSupport,
+    'sliding-window-counter': SlidingWindowCounterSupport,
+}
+
+def check_strategy(strategy, storage_uri):
+    """Стратегия, которую поддерживает хранилище; иначе GCRA с предупреждением.
+
+    Flask-Limiter проверяет это только при создании лимитера, и приложение
+    с неподходящей парой не запускается.
+    """
+    if strategy not in STRATEGIES:
+        logging.getLogger(__name__).warning("Unknown rate limit strategy %s, using %s", strategy, GCRA_STRATEGY)
+        return GCRA_STRATEGY
+    support = STRATEGY_STORAGE_SUPPORT.get(strategy)
+    storage_class = SCHEMES.get(storage_uri.split('://', 1)[0])
+    if support is not None and storage_class is not None and not issubclass(storage_class, support):
+        logging.getLogger(__name__).warning("Rate limit strategy %s is not supported by %s, using %s",
+                                            strategy, storage_class.__name__, GCRA_STRATEGY)
+        return GCRA_STRATEGY
+    return strategy
 
 def get_user_identifier():
     """Получение идентификатора пользователя для rate limiting"""
@@ -36,7 +95,10 @@ RATE_LIMITS = {
     'auth': {
         'login': "5 per minute",      # 5 попыток входа в минуту
         'register': "3 per hour",     # 3 регистрации в час
-        'logout': "10 per minute"     # 10 выходов в минуту
+        'logout': "10 per minute",    # 10 выходов в минуту
+        'token': "5 per minute",      # 5 выдач токенов по паролю в минуту
+        'refresh': "30 per minute",   # 30 обновлений токенов в минуту
+        'revoke': "30 per minute"     # 30 отзывов токенов в минуту
     },
     
     # API заметок
@@ -44,7 +106,11 @@ RATE_LIMITS = {
         'get_notes': "30 per minute",     # 30 запросов списка в минуту
         'create_note': "10 per minute",   # 10 созданий в минуту
         'update_note': "20 per minute",   # 20 обновлений в минуту
-        'delete_note': "5 per minute"     # 5 удалений в минуту
+        'delete_note': "5 per minute",    # 5 удалений в минуту
+        'batch_notes': "500 per minute",  # 500 операций пакетного API в минуту
+        'note_changes': "60 per minute",  # 60 синхронизаций в минуту
+        'note_stats': "60 per minute",    # 60 запросов статистики в минуту
+        'export_notes': "5 per minute"    # 5 выгрузок в минуту
     },
     
     # Профиль
@@ -56,7 +122,10 @@ RATE_LIMITS = {
     
     # Административные функции
     'admin': {
-        'logs': "2 per hour"          # 2 скачивания логов в час
+        'logs': "2 per hour",         # 2 скачивания логов в час
+        'log_search': "60 per minute",  # 60 запросов поиска по логам в минуту (постраничный просмотр)
+        'export': "10 per hour",      # 10 выгрузок всех заметок в час
+        'import': "10 per hour"       # 10 импортов заметок в час
     },
     
     # Общие
@@ -67,6 +136,17 @@ RATE_LIMITS = {
     }
 }
 
+# Максимальное количество операций в одном запросе /api/notes/batch
+MAX_BATCH_OPERATIONS = 500
+
+def batch_operations_cost():
+    """Стоимость пакетного запроса для лимитера - количество операций в нем"""
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list):
+        return 1
+    return max(1, min(len(operations), MAX_BATCH_OPERATIONS))
+
 def get_rate_limit(endpoint_type, endpoint_name):
     """Получение лимита для конкретного эндпоинта"""
     return RATE_LIMITS.get(endpoint_type, {}).get(endpoint_name, "50 per hour")
@@ -79,27 +159,128 @@ def rate_limit_exceeded_handler(e):
         'retry_after': e.retry_after if hasattr(e, 'retry_after') else 60
     }), 429
 
+def get_window_stats(limits):
+    """(время сброса, остаток) для пар (лимит, ключ окна).
+    
+    GCRA и фиксированное окно в хранилище SQLite читают все ключи одним
+    запросом; остальные стратегии и хранилища - по одному окну.
+    """
+    strategy = limiter.limiter
+    if hasattr(strategy, 'get_windows_stats'):
+        return strategy.get_windows_stats(limits)
+    storage = limiter.storage
+    if not isinstance(strategy, FixedWindowRateLimiter) or not hasattr(storage, 'get_windows'):
+        return [strategy.get_window_stats(item, *key.split('/')[1:-3]) for item, key in limits]
+    windows = storage.get_windows([key for _, key in limits])
+    now = time.time()
+    stats = []
+    for item, key in limits:
+        # Окна еще нет: весь лимит доступен, отсчет начнется с первого запроса
+        used, reset_at = windows.get(key, (0, now + item.get_expiry()))
+        stats.append((reset_at, max(0, item.amount - used)))
+    return stats
+
+def limit_states(limits):
+    """Лимит, остаток и время сброса для пар (лимит, ключ окна)"""
+    return [
+        {
+            'key': key,
+            'window': str(item),
+            'limit': item.amount,
+            'remaining': remaining,
+            'reset_time': int(math.ceil(reset_at)),
+        }
+        for (item, key), (reset_at, remaining) in zip(limits, get_window_stats(limits))
+    ]
+
 def get_remaining_requests():
-    """Получение информации о оставшихся запросах"""
-    from flask import current_app
+    """Остаток запросов по самому исчерпанному лимиту текущего запроса.
     
+    Состояние всех лимитов запроса читается из хранилища один раз и
+    запоминается в g до конца запроса.
+    """
+    if 'rate_limit_state' in g:
+        return g.rate_limit_state
+    
+    state = {
+        'remaining': 'unknown',
+        'limit': 'unknown',
+        'reset_time': 'unknown'
+    }
     try:
-        # Получаем информацию о лимитах для текущего запроса
-        endpoint = request.endpoint
-        identifier = get_user_identifier()
-        
-        # Это упрощенная версия - в реальности нужно получить данные из лимитера
-        return {
-            'remaining': 'unknown',
-            'limit': 'unknown',
-            'reset_time': 'unknown'
-        }
-    except Exception:
-        return {
-            'remaining': 'unknown',
-            'limit': 'unknown',
-            'reset_time': 'unknown'
-        }
+        request_limits = limiter.current_limits if limiter.enabled else []
+        if request_limits:
+            states = limit_states([(rl.limit, rl.key) for rl in request_limits])
+            # Сначала нарушенный лимит, затем лимит с наименьшим остатком
+            state = min(zip(request_limits, states),
+                        key=lambda pair: (not pair[0].breached, pair[1]['remaining'], pair[1]['reset_time']))[1]
+            if state['remaining'] == 0 or any(rl.breached for rl in request_limits):
+                state['retry_after'] = max(1, int(math.ceil(state['reset_time'] - time.time())))
+    except Exception as e:
+        current_app.logger.warning(f"Failed to read rate limit state: {e}")
+    g.rate_limit_state = state
+    return state
+
+def inject_rate_limit_headers(response):
+    """Заголовки X-RateLimit-* и Retry-After на ответах лимитированных эндпоинтов"""
+    if not limiter.enabled or not limiter.current_limits:
+        return response
+    state = get_remaining_requests()
+    if state['limit'] == 'unknown':
+        return response
+    response.headers['X-RateLimit-Limit'] = str(state['limit'])
+    response.headers['X-RateLimit-Remaining'] = str(state['remaining'])
+    response.headers['X-RateLimit-Reset'] = str(state['reset_time'])
+    if 'retry_after' in state:
+        response.headers['Retry-After'] = str(state['retry_after'])
+    return response
+
+def endpoint_rate_limits():
+    """Лимиты всех эндпоинтов и их состояние для текущего клиента"""
+    app = current_app._get_current_object()
+    key_prefix = app.config.get('RATELIMIT_KEY_PREFIX', '')
+    endpoints = []
+    limits = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint == 'static':
+            continue
+        blueprint = rule.endpoint.rpartition('.')[0]
+        defaults, decorated = limiter.limit_manager.resolve_limits(app, rule.endpoint, blueprint)
+        for lim in defaults + decorated:
+            if lim.is_exempt:
+                continue
+            args = [lim.key_func(), lim.scope_for(rule.endpoint, 'GET')]
+            if key_prefix:
+                args = [key_prefix, *args]
+            endpoints.append(rule)
+            limits.append((lim.limit, lim.limit.key_for(*args)))
+    
+    states = limit_states(limits)
+    for rule, state in zip(endpoints, states):
+        state['endpoint'] = rule.endpoint
+        state['rule'] = rule.rule
+    return states
+
+def top_rate_limit_windows(count=20):
+    """Самые загруженные окна по всем клиентам (если хранилище умеет их перечислять)"""
+    strategy = limiter.limiter
+    storage = limiter.storage
+    if hasattr(strategy, 'top_windows'):
+        windows = strategy.top_windows(count)
+    elif isinstance(strategy, FixedWindowRateLimiter) and hasattr(storage, 'top_windows'):
+        windows = storage.top_windows(count)
+    else:
+        return []
+    return [
+        {'key': key, 'used': value, 'reset_time': int(math.ceil(expires_at))}
+        for key, value, expires_at in windows
+    ]
+
+def rate_limit_key_info():
+    """Размер таблицы ключей лимитов и счетчики вытеснения (если хранилище их ведет)"""
+    strategy = limiter.limiter
+    source = strategy if hasattr(strategy, 'info') else limiter.storage
+    return source.info() if hasattr(source, 'info') else None
 
 def log_rate_limit_event(identifier, endpoint, action="request"):
     """Логирование событий rate limiting"""
@@ -114,10 +295,10 @@ def auth_limit(endpoint_name):
     limit = get_rate_limit('auth', endpoint_name)
     return limiter.limit(limit)
 
-def api_limit(endpoint_name):
-    """Декоратор для лимитов API"""
+def api_limit(endpoint_name, cost=1):
+    """Декоратор для лимитов API (cost - стоимость запроса, число или функция)"""
     limit = get_rate_limit('api', endpoint_name)
-    return limiter.limit(limit)
+    return limiter.limit(limit, cost=cost)
 
 def profile_limit(endpoint_name):
     """Декоратор для лимитов профиля"""
@@ -1,17 +1,37 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, make_response
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response,
+                   stream_with_context)
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import delete
 from app import db
 from app.i18n import get_text, get_locale, set_locale, get_available_locales
-from app.rate_limiter import auth_limit, api_limit, profile_limit, admin_limit, general_limit, log_rate_limit_event
+from app.rate_limiter import (auth_limit, api_limit, profile_limit, admin_limit, general_limit, log_rate_limit_event,
+                              batch_operations_cost, MAX_BATCH_OPERATIONS, endpoint_rate_limits,
+                              top_rate_limit_windows, rate_limit_key_info)
+from app.pagination import (DEFAULT_PAGE_SIZE, parse_page_limit, encode_cursor, decode_cursor, InvalidCursor,
+                            order_by_keyset, apply_keyset)
+from app.search import get_note_search
+from app.notes_version import get_notes_version, bump_notes_version, build_notes_etag
+from app.serialization import NOTE_FIELDS, serialize_note, dumps, json_response, json_body_response
+from app.cache import get_notes_cache, invalidate_notes_cache
+from app.hashing import HashingUnavailable, hash_password, verify_password, get_password_hasher
+from app.user_cache import get_user_cache, refresh_user, invalidate_user_cache
+from app.tokens import InvalidToken, issue_tokens, verify_token, revoke_token, token_info
+from app.note_stats import NoteStatsDelta, apply_note_stats, get_note_stats
+from app.importer import (DEFAULT_IMPORT_BATCH_SIZE, NoteImportError, create_import_job, get_import_job,
+                          import_job_to_dict, run_import)
+from app.export import (EXPORT_FORMATS, USER_EXPORT_FIELDS, ADMIN_EXPORT_FIELDS, user_notes_rows, all_notes_rows,
+                        export_response)
+from app.log_pipeline import DEFAULT_LOG_FILE, log_pipeline_info
+from app.log_reader import InvalidLogFilter, LogQuery, log_download_response
+from app.log_search import InvalidLogSearch, LogSearchQuery, search_logs
+from app.structured_log import record_action, action_log_info
+from app.note_sync import InvalidSyncToken, parse_sync_token, record_deleted_notes, get_note_changes
 from datetime import datetime
 import os
 import re
 import html
 import logging
-import hashlib
-import json
 
 bp = Blueprint('main', __name__)
 
@@ -41,20 +61,108 @@ def validate_password(password):
         return False, get_text('password_too_short')
     return True, ""
 
+def hashing_unavailable_response(action, email):
+    """Быстрый отказ, когда пул хеширования паролей перегружен"""
+    log_action(action, details=f"Password hashing busy for email: {email}")
+    response = jsonify({'error': 'Service busy', 'message': 'Сервис перегружен. Попробуйте позже.', 'retry_after': 1})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def find_user_by_email(email):
+    """Поиск пользователя по email без учета регистра (индекс ux_users_email_lower)"""
+    User = current_app.User
+    return User.query.filter(db.func.lower(User.email) == email.lower()).first()
+
 def log_action(action, user_id=None, details=""):
-    """Логирование действий пользователей"""
+    """Логирование действий пользователей (запись в конце запроса, частые действия - выборочно)"""
     if user_id is None and current_user.is_authenticated:
         user_id = current_user.id
-    message = f"ACTION: {action} | USER: {user_id} | IP: {request.remote_addr} | {details}"
-    current_app.logger.info(message)
+    record_action(action, user_id, details)
 
-def generate_etag(data):
-    """Генерация ETag для данных"""
-    if isinstance(data, (dict, list)):
-        data_str = json.dumps(data, sort_keys=True)
+# Ограничения полей заметки
+NOTE_STATUSES = ['active', 'completed', 'archived']
+MAX_TITLE_LENGTH = 100
+MAX_CONTENT_LENGTH = 10000
+
+def validate_note_data(data, partial=False):
+    """Санитизация и валидация полей заметки.
+    
+    Возвращает (поля, текст ошибки, причина для лога). При partial=True
+    (обновление) проверяются только переданные поля.
+    """
+    fields = {}
+    
+    if partial:
+        if 'title' in data:
+            fields['title'] = sanitize_input(data['title'])
+            if not fields['title']:
+                return None, get_text('title_required'), "Empty title"
+        if 'content' in data:
+            fields['content'] = sanitize_input(data['content'])
+            if not fields['content']:
+                return None, get_text('content_required'), "Empty content"
     else:
-        data_str = str(data)
-    return hashlib.md5(data_str.encode()).hexdigest()
+        fields['title'] = sanitize_input(data.get('title', ''))
+        fields['content'] = sanitize_input(data.get('content', ''))
+        if not fields['title'] or not fields['content']:
+            return None, get_text('title_required') + ' и ' + get_text('content_required'), "Missing title or content"
+    
+    if len(fields.get('title', '')) > MAX_TITLE_LENGTH:
+        return None, get_text('note_title') + f' не должно превышать {MAX_TITLE_LENGTH} символов', "Title too long"
+    
+    if len(fields.get('content', '')) > MAX_CONTENT_LENGTH:
+        return None, get_text('note_content') + f' не должно превышать {MAX_CONTENT_LENGTH} символов', "Content too long"
+    
+    # Валидация статуса: при создании неизвестный статус заменяется на active,
+    # при обновлении - игнорируется
+    if partial:
+        if 'status' in data:
+            status = sanitize_input(data['status'])
+            if status in NOTE_STATUSES:
+                fields['status'] = status
+    else:
+        status = sanitize_input(data.get('status', 'active'))
+        fields['status'] = status if status in NOTE_STATUSES else 'active'
+    
+    return fields, None, None
+
+def describe_note_changes(note, fields):
+    """Список изменений заметки для аудита"""
+    changes = []
+    if 'title' in fields and note.title != fields['title']:
+        changes.append(f"title: {note.title} -> {fields['title']}")
+    if 'content' in fields and note.content != fields['content']:
+        changes.append(f"content: {len(note.content)} -> {len(fields['content'])} chars")
+    if 'status' in fields and note.status != fields['status']:
+        changes.append(f"status: {note.status} -> {fields['status']}")
+    return changes
+
+def parse_note_fields(raw_fields):
+    """Разбор параметра fields: известные поля в каноническом порядке, id всегда включен"""
+    if not raw_fields:
+        return list(NOTE_FIELDS)
+    requested = {field.strip() for field in raw_fields.split(',')}
+    fields = [field for field in NOTE_FIELDS if field in requested or field == 'id']
+    return fields if len(fields) > 1 else list(NOTE_FIELDS)
+
+def parse_summary_length(raw_summary):
+    """Разбор параметра summary (0 - содержимое без сокращения)"""
+    try:
+        summary = int(raw_summary or 0)
+    except ValueError:
+        return 0
+    return max(0, min(summary, MAX_CONTENT_LENGTH))
+
+def note_columns(Note, fields, summary):
+    """Колонки SELECT для проекции; при summary содержимое обрезается в SQL"""
+    columns = []
+    for field in fields:
+        if field == 'content' and summary:
+            columns.append(db.func.substr(Note.content, 1, summary).label('content'))
+        else:
+            columns.append(getattr(Note, field))
+    return columns
 
 def check_etag(etag):
     """Проверка ETag в заголовках запроса"""
@@ -108,11 +216,19 @@ def register():
             log_action("REGISTER_FAILED", details=f"Password mismatch for email: {email}")
             return jsonify({'error': get_text('passwords_dont_match')}), 400
         
+        # Email хранится в нижнем регистре (уникальный индекс по lower(email))
+        email = email.lower()
+        
         User = current_app.User
-        if User.query.filter_by(email=email).first():
+        if find_user_by_email(email):
             log_action("REGISTER_FAILED", details=f"Email already exists: {email}")
             return jsonify({'error': get_text('email_exists')}), 400
         
+        try:
+            password_hash = hash_password(password)
+        except HashingUnavailable:
+            return hashing_unavailable_response("REGISTER_BUSY", email)
+        
         # Создание пользователя с базовыми данными
         user = User(
             email=email,
@@ -121,7 +237,7 @@ def register():
             age=0,
             avatar_url='',
             role='user',
-            password_hash=generate_password_hash(password)
+            password_hash=password_hash
         )
         
         db.session.add(user)
@@ -145,10 +261,14 @@ def login():
             log_action("LOGIN_FAILED", details=f"Missing credentials for email: {email}")
             return jsonify({'error': get_text('email') + ' и ' + get_text('password') + ' обязательны'}), 400
         
-        User = current_app.User
-        user = User.query.filter_by(email=email).first()
+        user = find_user_by_email(email)
         
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            password_ok = user is not None and verify_password(user.password_hash, password)
+        except HashingUnavailable:
+            return hashing_unavailable_response("LOGIN_BUSY", email)
+        
+        if password_ok:
             login_user(user)
             log_action("LOGIN_SUCCESS", user.id, f"User logged in: {email}")
             return jsonify({'message': get_text('login_success'), 'redirect': '/profile'}), 200
@@ -165,14 +285,82 @@ def logout():
     user_id = current_user.id
     email = current_user.email
     logout_user()
+    invalidate_user_cache(user_id)
     log_action("LOGOUT", user_id, f"User logged out: {email}")
     return redirect(url_for('main.home'))
 
+@bp.route('/api/auth/token', methods=['POST'])
+@auth_limit('token')
+def issue_api_token():
+    """Access- и refresh-токены по email и паролю (для заголовка Authorization: Bearer)"""
+    data = request.get_json(silent=True) or {}
+    email = sanitize_input(data.get('email', ''))
+    password = data.get('password', '')
+    
+    if not email or not password:
+        return jsonify({'error': get_text('email') + ' и ' + get_text('password') + ' обязательны'}), 400
+    
+    user = find_user_by_email(email)
+    try:
+        password_ok = user is not None and verify_password(user.password_hash, password)
+    except HashingUnavailable:
+        return hashing_unavailable_response("TOKEN_BUSY", email)
+    
+    if not password_ok:
+        log_action("TOKEN_FAILED", details=f"Invalid credentials for email: {email}")
+        return jsonify({'error': get_text('invalid_credentials')}), 400
+    
+    log_action("TOKEN_ISSUED", user.id, f"API token issued for: {email}")
+    return jsonify(issue_tokens(user)), 200
+
+@bp.route('/api/auth/refresh', methods=['POST'])
+@auth_limit('refresh')
+def refresh_api_token():
+    """Новая пара токенов по refresh-токену; использованный refresh-токен отзывается"""
+    data = request.get_json(silent=True) or {}
+    try:
+        claims = verify_token(data.get('refresh_token'), 'refresh')
+    except InvalidToken as e:
+        return jsonify({'error': 'Invalid refresh token', 'message': str(e)}), 401
+    
+    # Повторное использование refresh-токена - признак утечки
+    if not revoke_token(claims):
+        log_action("TOKEN_REFRESH_REUSED", claims['user_id'], f"Refresh token reused: {claims['jti']}")
+        return jsonify({'error': 'Invalid refresh token', 'message': 'Token revoked'}), 401
+    
+    user = db.session.get(current_app.User, claims['user_id'])
+    if user is None:
+        return jsonify({'error': 'Invalid refresh token', 'message': 'User not found'}), 401
+    
+    log_action("TOKEN_REFRESHED", user.id, "API token refreshed")
+    return jsonify(issue_tokens(user)), 200
+
+@bp.route('/api/auth/revoke', methods=['POST'])
+@auth_limit('revoke')
+def revoke_api_token():
+    """Отзыв access- или refresh-токена"""
+    data = request.get_json(silent=True) or {}
+    token = data.get('token')
+    claims = None
+    for token_type in ('access', 'refresh'):
+        try:
+            claims = verify_token(token, token_type)
+            break
+        except InvalidToken:
+            continue
+    
+    # Недействительный токен уже не дает доступа - отвечаем так же, как при отзыве
+    if claims is not None:
+        revoke_token(claims)
+        log_action("TOKEN_REVOKED", claims['user_id'], f"API {claims['typ']} token revoked")
+    return jsonify({'message': 'Token revoked'}), 200
+
 @bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 @profile_limit('view')
 def profile():
     if request.method == 'POST':
+        refresh_user(current_user._get_current_object())
         # Обновляем данные профиля с санитизацией
         old_data = {
             'first_name': current_user.first_name,
@@ -195,44 +383,43 @@ def profile():
         
         current_user.about = sanitize_input(request.form.get("about", ""))
 
-# Обработка аватарки
-    avatar_uploaded = False
-    if "avatar" in request.files:
-        avatar = request.files["avatar"]
-        if avatar.filename != "":
-            # Проверяем расширение файла
-            allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
-            if '.' in avatar.filename and \
-               avatar.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
-                filename = secure_filename(avatar.filename)
-                avatar_path = os.path.join(UPLOAD_FOLDER, filename)
-                avatar.save(avatar_path)
-                current_user.avatar_url = f"/{avatar_path}"
-                avatar_uploaded = True
-            else:
-                flash('Разрешены только изображения (png, jpg, jpeg, gif)', 'error')
-                log_action("AVATAR_UPLOAD_FAILED", current_user.id,
-                           f"Invalid file type: {avatar.filename}")
+        # Обработка аватарки
+        avatar_uploaded = False
+        if "avatar" in request.files:
+            avatar = request.files["avatar"]
+            if avatar.filename != "":
+                # Проверяем расширение файла
+                allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
+                if '.' in avatar.filename and \
+                   avatar.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
+                    filename = secure_filename(avatar.filename)
+                    avatar_path = os.path.join(UPLOAD_FOLDER, filename)
+                    avatar.save(avatar_path)
+                    current_user.avatar_url = f"/{avatar_path}"
+                    avatar_uploaded = True
+                else:
+                    flash('Разрешены только изображения (png, jpg, jpeg, gif)', 'error')
+                    log_action("AVATAR_UPLOAD_FAILED", current_user.id,
+                               f"Invalid file type: {avatar.filename}")
 
-    db.session.commit()
+        db.session.commit()
+        invalidate_user_cache(current_user.id)
 
-db.session.commit()
-        
         # Логируем изменения
-    changes = []
-    for field, old_value in old_data.items():
-        new_value = getattr(current_user, field)
-        if old_value != new_value:
-            changes.append(f"{field}: {old_value} -> {new_value}")
+        changes = []
+        for field, old_value in old_data.items():
+            new_value = getattr(current_user, field)
+            if old_value != new_value:
+                changes.append(f"{field}: {old_value} -> {new_value}")
 
-    if changes:
-        log_action("PROFILE_UPDATED", current_user.id, f"Changes: {', '.join(changes)}")
+        if changes:
+            log_action("PROFILE_UPDATED", current_user.id, f"Changes: {', '.join(changes)}")
 
-    if avatar_uploaded:
-        log_action("AVATAR_UPLOADED", current_user.id, f"New avatar: {filename}")
+        if avatar_uploaded:
+            log_action("AVATAR_UPLOADED", current_user.id, f"New avatar: {filename}")
 
-    flash(get_text('profile_updated'), 'success')
-    return redirect(url_for("main.profile"))
+        flash(get_text('profile_updated'), 'success')
+        return redirect(url_for("main.profile"))
 
     return render_template("profile.html", user=current_user)
 
@@ -240,6 +427,7 @@ db.session.commit()
 @login_required
 @profile_limit('avatar')
 def delete_avatar():
+    refresh_user(current_user._get_current_object())
     if current_user.avatar_url:
         file_path = current_user.avatar_url.lstrip("/")
         if os.path.exists(file_path):
@@ -247,6 +435,7 @@ def delete_avatar():
             log_action("AVATAR_DELETED", current_user.id, f"Deleted avatar: {file_path}")
         current_user.avatar_url = ""
         db.session.commit()
+        invalidate_user_cache(current_user.id)
         flash(get_text('delete_avatar') + ' удален!', 'success')
     return redirect(url_for("main.profile"))
 
@@ -272,10 +461,16 @@ def get_notes():
     search = sanitize_input(request.args.get('search', ''))
     
     # Валидация параметров сортировки
-    allowed_sort_fields = ['created_at', 'updated_at', 'title']
+    allowed_sort_fields = ['created_at', 'updated_at', 'title', 'relevance']
     if sort_by not in allowed_sort_fields:
         sort_by = 'created_at'
     
+    # Полнотекстовый поиск и релевантность (сортировка по ней возможна только при поиске)
+    note_search = get_note_search()
+    rank = note_search.rank(Note, search) if search else None
+    if sort_by == 'relevance' and rank is None:
+        sort_by = 'created_at'
+    
     if order not in ['asc', 'desc']:
         order = 'desc'
     
@@ -284,6 +479,50 @@ def get_notes():
     if status not in allowed_statuses:
         status = 'all'
     
+    # Параметры пагинации (без limit и cursor возвращается весь список)
+    limit = parse_page_limit(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    paginate = limit is not None or bool(cursor)
+    if paginate and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    
+    # Потоковая выдача всего списка (страницы и так ограничены по размеру)
+    stream = request.args.get('stream') in ('1', 'true') and not paginate
+    
+    # Проекция полей и сокращенное содержимое
+    fields = parse_note_fields(request.args.get('fields', ''))
+    summary = parse_summary_length(request.args.get('summary')) if 'content' in fields else 0
+    
+    # ETag строится из версии заметок и параметров запроса: если клиент уже
+    # видел эту версию, отвечаем 304 без выборки и сериализации заметок
+    notes_version = get_notes_version(current_user.id)
+    etag = build_notes_etag(current_user.id, notes_version, {
+        'sort': sort_by,
+        'order': order,
+        'status': status,
+        'search': search,
+        'limit': limit if paginate else '',
+        'cursor': cursor or '',
+        'stream': int(stream),
+        'fields': ','.join(fields),
+        'summary': summary,
+    })
+    
+    if check_etag(etag):
+        log_action("NOTES_CACHED", current_user.id, f"Returned cached data for notes version {notes_version}")
+        response = Response(status=304)  # Not Modified
+        response.headers['ETag'] = etag
+        response.headers['X-Sync-Token'] = str(notes_version)
+        return response
+    
+    # Тот же запрос на той же версии заметок уже выполнялся - отдаем готовое тело
+    notes_cache = get_notes_cache()
+    if not stream:
+        body = notes_cache.get(current_user.id, etag)
+        if body is not None:
+            log_action("NOTES_CACHE_HIT", current_user.id, f"Served notes version {notes_version} from cache")
+            return notes_list_response(body, etag, notes_version)
+    
     # Базовый запрос
     query = Note.query.filter_by(user_id=current_user.id)
     
@@ -293,51 +532,194 @@ def get_notes():
     
     # Поиск по названию и содержимому
     if search:
-        query = query.filter(
-            db.or_(
-                Note.title.ilike(f'%{search}%'),
-                Note.content.ilike(f'%{search}%')
-            )
-        )
+        query = note_search.apply(query, Note, search)
     
-    # Сортировка
-    if hasattr(Note, sort_by):
-        sort_column = getattr(Note, sort_by)
-        if order == 'desc':
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
+    # Выбираем только нужные колонки (и ключ сортировки для курсора)
+    columns = note_columns(Note, fields, summary)
+    if sort_by == 'relevance':
+        columns.append(rank.label('relevance'))
+    elif sort_by not in fields:
+        columns.append(getattr(Note, sort_by))
+    query = query.with_entities(*columns)
     
-    notes = query.all()
+    # Сортировка (id как тай-брейк для стабильного порядка страниц)
+    sort_column = rank if sort_by == 'relevance' else getattr(Note, sort_by)
+    query = order_by_keyset(query, sort_column, Note.id, order)
+    
+    if paginate:
+        if cursor:
+            try:
+                cursor_value, cursor_id = decode_cursor(cursor, sort_by, order)
+            except InvalidCursor:
+                log_action("NOTES_VIEW_FAILED", current_user.id, "Invalid cursor")
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = apply_keyset(query, sort_column, Note.id, order, cursor_value, cursor_id)
+        
+        # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    elif stream:
+        response = stream_notes_response(query, fields, etag)
+        response.headers['X-Sync-Token'] = str(notes_version)
+        return response
+    else:
+        rows = query.all()
     
     # Подготавливаем данные для ответа
-    notes_data = [{
-        'id': note.id,
-        'title': note.title,
-        'content': note.content,
-        'status': note.status,
-        'created_at': note.created_at.isoformat(),
-        'updated_at': note.updated_at.isoformat()
-    } for note in notes]
-    
-    # Генерируем ETag для кэширования
-    etag = generate_etag(notes_data)
-    
-    # Проверяем, изменились ли данные
-    if check_etag(etag):
-        log_action("NOTES_CACHED", current_user.id, f"Returned cached data for {len(notes)} notes")
-        return '', 304  # Not Modified
+    notes_data = [serialize_note(row, fields) for row in rows]
     
-    log_action("NOTES_VIEWED", current_user.id, f"Viewed {len(notes)} notes")
+    if paginate:
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_cursor(sort_by, order, getattr(last, sort_by), last.id)
+        notes_data = {'notes': notes_data, 'next_cursor': next_cursor}
     
-    # Создаем ответ с заголовками кэширования
-    response = make_response(jsonify(notes_data))
-    response.headers['ETag'] = etag
+    log_action("NOTES_VIEWED", current_user.id, f"Viewed {len(rows)} notes")
+    
+    body = dumps(notes_data)
+    notes_cache.set(current_user.id, etag, body)
+    
+    return notes_list_response(body, etag, notes_version)
+
+def notes_list_response(body, etag, notes_version):
+    """Ответ со списком заметок и заголовками кэширования"""
+    response = json_body_response(body, etag=etag)
     response.headers['Cache-Control'] = 'private, max-age=60'  # Кэш на 1 минуту
     response.headers['Last-Modified'] = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+    # Версия, с которой клиент может запрашивать /api/notes/changes
+    response.headers['X-Sync-Token'] = str(notes_version)
+    return response
+
+@bp.route('/api/notes/changes', methods=['GET'])
+@login_required
+@api_limit('note_changes')
+def get_note_changes_feed():
+    """Заметки, созданные или измененные после токена синхронизации, и id удаленных"""
+    Note = current_app.Note
+    
+    notes_version = get_notes_version(current_user.id)
+    try:
+        since = parse_sync_token(request.args.get('since'), notes_version)
+    except InvalidSyncToken as e:
+        log_action("NOTES_SYNC_FAILED", current_user.id, str(e))
+        return jsonify({'error': 'Invalid sync token'}), 400
+    
+    fields = parse_note_fields(request.args.get('fields', ''))
+    sync_token = str(notes_version)
+    
+    if since == notes_version:
+        return json_response({'changes': [], 'deleted': [], 'sync_token': sync_token, 'reset': False})
+    
+    changes = get_note_changes(current_user.id, since, note_columns(Note, fields, 0))
+    if changes is None:
+        # Изменений слишком много или надгробия уже удалены - клиенту нужно загрузить список заново
+        log_action("NOTES_SYNC_RESET", current_user.id, f"Too many or expired changes since version {since}")
+        return json_response({'changes': [], 'deleted': [], 'sync_token': sync_token, 'reset': True})
+    
+    rows, deleted_ids = changes
+    log_action("NOTES_SYNCED", current_user.id,
+               f"Since version {since}: {len(rows)} changed, {len(deleted_ids)} deleted")
+    
+    return json_response({
+        'changes': [serialize_note(row, fields) for row in rows],
+        'deleted': deleted_ids,
+        'sync_token': sync_token,
+        'reset': False
+    })
+
+# Размер пачки строк, читаемых с серверного курсора при потоковой выдаче
+STREAM_BATCH_SIZE = 500
+
+def stream_notes_response(query, fields, etag):
+    """Потоковый JSON-массив заметок: строки читаются пачками с серверного курсора,
+    поэтому память не зависит от количества заметок"""
+    user_id = current_user.id
+    
+    def generate():
+        count = 0
+        chunks = [b'[']
+        for row in query.yield_per(STREAM_BATCH_SIZE):
+            if count:
+                chunks.append(b',')
+            chunks.append(dumps(serialize_note(row, fields)))
+            count += 1
+            # Отдаем клиенту по одной пачке строк за раз
+            if count % STREAM_BATCH_SIZE == 0:
+                yield b''.join(chunks)
+                chunks = []
+        chunks.append(b']')
+        yield b''.join(chunks)
+        log_action("NOTES_VIEWED", user_id, f"Streamed {count} notes")
+    
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    response.headers['Last-Modified'] = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+    return response
+
+@bp.route('/api/notes/stats', methods=['GET'])
+@login_required
+@api_limit('note_stats')
+def get_notes_stats():
+    """Количество заметок по статусам и общий объем содержимого"""
+    notes_version = get_notes_version(current_user.id)
+    etag = build_notes_etag(current_user.id, notes_version, {'stats': 1})
+    if check_etag(etag):
+        return Response(status=304)
+    
+    counters = get_note_stats(current_user.id)
+    counts = {status: counters.get(status, (0, 0))[0] for status in NOTE_STATUSES}
     
+    response = json_response({
+        'counts': counts,
+        'total': sum(count for count, _ in counters.values()),
+        'content_size': sum(size for _, size in counters.values())
+    }, etag=etag)
+    response.headers['Cache-Control'] = 'private, max-age=60'
     return response
 
+def parse_after_id(raw_after_id):
+    """Разбор параметра after_id (продолжение выгрузки после заметки с этим id)"""
+    if not raw_after_id:
+        return 0
+    try:
+        after_id = int(raw_after_id)
+    except ValueError:
+        return None
+    return after_id if after_id >= 0 else None
+
+@bp.route('/api/notes/export', methods=['GET'])
+@login_required
+@api_limit('export_notes')
+def export_notes():
+    """Потоковая выгрузка всех заметок пользователя в NDJSON или CSV"""
+    fmt = request.args.get('format', 'ndjson')
+    after_id = parse_after_id(request.args.get('after_id'))
+    if fmt not in EXPORT_FORMATS or after_id is None:
+        log_action("NOTES_EXPORT_FAILED", current_user.id, f"Invalid parameters: {fmt}")
+        return jsonify({'error': 'Invalid export parameters'}), 400
+    
+    user_id = current_user.id
+    # Содержимое выгрузки однозначно определяется версией заметок - по ней
+    # проверяется If-Range при докачке
+    notes_version = get_notes_version(user_id)
+    etag = build_notes_etag(user_id, notes_version, {'export': fmt, 'after_id': after_id})
+    
+    log_action("NOTES_EXPORTED", user_id, f"Format: {fmt}, after id: {after_id}, version: {notes_version}")
+    
+    filename = f"notes-{user_id}-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return export_response(
+        fmt,
+        lambda resume_id=None: user_notes_rows(user_id, USER_EXPORT_FIELDS, resume_id or after_id),
+        USER_EXPORT_FIELDS,
+        filename,
+        etag=etag,
+        allow_range=(fmt == 'ndjson'),
+        is_current=lambda: get_notes_version(user_id) == notes_version
+    )
+
 @bp.route('/api/notes', methods=['POST'])
 @login_required
 @api_limit('create_note')
@@ -345,48 +727,26 @@ def create_note():
     """Создание новой заметки"""
     data = request.get_json()
     
-    title = sanitize_input(data.get('title', ''))
-    content = sanitize_input(data.get('content', ''))
-    status = sanitize_input(data.get('status', 'active'))
-    
-    if not title or not content:
-        log_action("NOTE_CREATE_FAILED", current_user.id, "Missing title or content")
-        return jsonify({'error': get_text('title_required') + ' и ' + get_text('content_required')}), 400
-    
-    if len(title) > 100:
-        log_action("NOTE_CREATE_FAILED", current_user.id, "Title too long")
-        return jsonify({'error': get_text('note_title') + ' не должно превышать 100 символов'}), 400
-    
-    if len(content) > 10000:
-        log_action("NOTE_CREATE_FAILED", current_user.id, "Content too long")
-        return jsonify({'error': get_text('note_content') + ' не должно превышать 10000 символов'}), 400
-    
-    # Валидация статуса
-    allowed_statuses = ['active', 'completed', 'archived']
-    if status not in allowed_statuses:
-        status = 'active'
+    fields, error, reason = validate_note_data(data)
+    if error:
+        log_action("NOTE_CREATE_FAILED", current_user.id, reason)
+        return jsonify({'error': error}), 400
     
     Note = current_app.Note
-    note = Note(
-        title=title,
-        content=content,
-        user_id=current_user.id,
-        status=status
-    )
+    note = Note(user_id=current_user.id, **fields)
+    note.sync_version = bump_notes_version(current_user.id)
+    
+    stats = NoteStatsDelta()
+    stats.add(fields['status'], fields['content'])
+    apply_note_stats(current_user.id, stats)
     
     db.session.add(note)
     db.session.commit()
+    invalidate_notes_cache(current_user.id)
     
-    log_action("NOTE_CREATED", current_user.id, f"Created note: {title}")
+    log_action("NOTE_CREATED", current_user.id, f"Created note: {fields['title']}")
     
-    return jsonify({
-        'id': note.id,
-        'title': note.title,
-        'content': note.content,
-        'status': note.status,
-        'created_at': note.created_at.isoformat(),
-        'updated_at': note.updated_at.isoformat()
-    }), 201
+    return json_response(serialize_note(note), status=201)
 
 @bp.route('/api/notes/<int:note_id>', methods=['PUT'])
 @login_required
@@ -394,61 +754,191 @@ def create_note():
 def update_note(note_id):
     """Обновление заметки"""
     Note = current_app.Note
-    note = Note.query.filter_by(id=note_id, user_id=current_user.id).first()
+    data = request.get_json()
+    
+    fields, error, reason = validate_note_data(data, partial=True)
+    if error:
+        log_action("NOTE_UPDATE_FAILED", current_user.id, reason)
+        return jsonify({'error': error}), 400
+    
+    # Новая версия блокирует строку пользователя до конца транзакции: заметка
+    # читается после этого, и параллельное изменение не даст устаревшего
+    # статуса для пересчета счетчиков
+    version = bump_notes_version(current_user.id)
+    note = Note.query.filter_by(id=note_id, user_id=current_user.id).populate_existing().first()
     
     if not note:
+        db.session.rollback()
         log_action("NOTE_UPDATE_FAILED", current_user.id, f"Note not found: {note_id}")
         return jsonify({'error': get_text('note_not_found')}), 404
     
-    data = request.get_json()
-    changes = []
-    
-    if 'title' in data:
-        title = sanitize_input(data['title'])
-        if not title:
-            log_action("NOTE_UPDATE_FAILED", current_user.id, "Empty title")
-            return jsonify({'error': get_text('title_required')}), 400
-        if len(title) > 100:
-            log_action("NOTE_UPDATE_FAILED", current_user.id, "Title too long")
-            return jsonify({'error': get_text('note_title') + ' не должно превышать 100 символов'}), 400
-        if note.title != title:
-            changes.append(f"title: {note.title} -> {title}")
-        note.title = title
-    
-    if 'content' in data:
-        content = sanitize_input(data['content'])
-        if not content:
-            log_action("NOTE_UPDATE_FAILED", current_user.id, "Empty content")
-            return jsonify({'error': get_text('content_required')}), 400
-        if len(content) > 10000:
-            log_action("NOTE_UPDATE_FAILED", current_user.id, "Content too long")
-            return jsonify({'error': get_text('note_content') + ' не должно превышать 10000 символов'}), 400
-        if note.content != content:
-            changes.append(f"content: {len(note.content)} -> {len(content)} chars")
-        note.content = content
-    
-    if 'status' in data:
-        status = sanitize_input(data['status'])
-        allowed_statuses = ['active', 'completed', 'archived']
-        if status in allowed_statuses:
-            if note.status != status:
-                changes.append(f"status: {note.status} -> {status}")
-            note.status = status
+    changes = describe_note_changes(note, fields)
+    old_status, old_content = note.status, note.content
+    for field, value in fields.items():
+        setattr(note, field, value)
     
     note.updated_at = datetime.utcnow()
+    note.sync_version = version
+    
+    stats = NoteStatsDelta()
+    stats.change(old_status, old_content, note.status, note.content)
+    apply_note_stats(current_user.id, stats)
     db.session.commit()
+    invalidate_notes_cache(current_user.id)
     
     if changes:
         log_action("NOTE_UPDATED", current_user.id, f"Note {note_id} changes: {', '.join(changes)}")
     
-    return jsonify({
-        'id': note.id,
-        'title': note.title,
-        'content': note.content,
-        'status': note.status,
-        'created_at': note.created_at.isoformat(),
-        'updated_at': note.updated_at.isoformat()
-    })
+    return json_response(serialize_note(note))
+
+@bp.route('/api/notes/batch', methods=['POST'])
+@login_required
+@api_limit('batch_notes', cost=batch_operations_cost)
+def batch_notes():
+    """Пакетное создание/обновление/удаление заметок в одной транзакции
+    
+    Тело запроса: {"operations": [{"op": "create", "title": ..., "content": ..., "status": ...},
+                                  {"op": "update", "id": 1, ...}, {"op": "delete", "id": 2}],
+                   "atomic": false}
+    Некорректные операции возвращаются с ошибкой, остальные применяются;
+    при "atomic": true любая ошибка отменяет весь пакет.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    atomic = bool(data.get('atomic', False))
+    
+    if not isinstance(operations, list) or not operations:
+        log_action("NOTES_BATCH_FAILED", current_user.id, "Missing operations")
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        log_action("NOTES_BATCH_FAILED", current_user.id, f"Too many operations: {len(operations)}")
+        return jsonify({'error': f'No more than {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+    
+    Note = current_app.Note
+    user_id = current_user.id
+    now = datetime.utcnow()
+    
+    # Все изменения пакета помечаются одной новой версией. Она берется до чтения
+    # заметок: строка пользователя заблокирована до конца транзакции, поэтому
+    # исходные статус и содержимое для счетчиков не устареют
+    version = bump_notes_version(user_id)
+    
+    # Заметки пользователя, затронутые обновлениями и удалениями, - одним запросом
+    # bool - подкласс int: JSON true/false не должны превращаться в id 1 и 0
+    target_ids = {op.get('id') for op in operations
+                  if isinstance(op, dict) and op.get('op') in ('update', 'delete') and type(op.get('id')) is int}
+    existing = {}
+    if target_ids:
+        for note in Note.query.filter(Note.id.in_(target_ids), Note.user_id == user_id).populate_existing():
+            existing[note.id] = serialize_note(note)
+    # Исходные статус и содержимое для пересчета счетчиков
+    original = {note_id: (note['status'], note['content']) for note_id, note in existing.items()}
+    
+    results = []
+    creates = []      # (индекс результата, строка для INSERT)
+    updates = {}      # id -> строка для UPDATE (несколько обновлений одной заметки объединяются)
+    deletes = set()
+    
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict) or op.get('op') not in ('create', 'update', 'delete'):
+            results.append({'index': index, 'status': 'error', 'error': 'Unknown operation'})
+            continue
+        
+        kind = op['op']
+        result = {'index': index, 'op': kind}
+        
+        if kind == 'create':
+            fields, error, _ = validate_note_data(op)
+            if error:
+                result.update(status='error', error=error)
+            else:
+                row = dict(fields, user_id=user_id, created_at=now, updated_at=now)
+                creates.append((len(results), row))
+                result['status'] = 'ok'
+            results.append(result)
+            continue
+        
+        note_id = op.get('id')
+        result['id'] = note_id
+        if type(note_id) is not int or note_id not in existing or note_id in deletes:
+            result.update(status='error', error=get_text('note_not_found'))
+            results.append(result)
+            continue
+        
+        if kind == 'delete':
+            deletes.add(note_id)
+            updates.pop(note_id, None)
+            result['status'] = 'ok'
+        else:
+            fields, error, _ = validate_note_data(op, partial=True)
+            if error:
+                result.update(status='error', error=error)
+            else:
+                updates.setdefault(note_id, {'id': note_id}).update(fields, updated_at=now)
+                existing[note_id].update(fields, updated_at=now)
+                result['status'] = 'ok'
+        results.append(result)
+    
+    failed = sum(1 for result in results if result['status'] == 'error')
+    if atomic and failed:
+        db.session.rollback()
+        log_action("NOTES_BATCH_FAILED", current_user.id, f"Atomic batch rejected: {failed} invalid operations")
+        return jsonify({'results': results, 'applied': 0, 'failed': failed}), 400
+    
+    if creates or updates or deletes:
+        for _, row in creates:
+            row['sync_version'] = version
+        for row in updates.values():
+            row['sync_version'] = version
+        
+        # Массовые INSERT/UPDATE/DELETE вместо операции на каждую заметку
+        if creates:
+            db.session.bulk_insert_mappings(Note, [row for _, row in creates], return_defaults=True)
+        if updates:
+            db.session.bulk_update_mappings(Note, list(updates.values()))
+        removed = []
+        if deletes:
+            removed = db.session.execute(
+                delete(Note)
+                .where(Note.id.in_(deletes), Note.user_id == user_id)
+                .returning(Note.id, Note.status, Note.content)
+                .execution_options(synchronize_session=False)
+            ).all()
+            record_deleted_notes(user_id, sorted(row.id for row in removed), version)
+        
+        stats = NoteStatsDelta()
+        for _, row in creates:
+            stats.add(row['status'], row['content'])
+        for note_id in updates:
+            stats.change(*original[note_id], existing[note_id]['status'], existing[note_id]['content'])
+        for row in removed:
+            stats.remove(row.status, row.content)
+        apply_note_stats(user_id, stats)
+        db.session.commit()
+        invalidate_notes_cache(user_id)
+    else:
+        db.session.rollback()  # ничего не изменилось - версия не увеличивается
+    
+    # Итоговые данные заметок для ответа
+    for position, row in creates:
+        results[position]['id'] = row['id']
+        results[position]['note'] = {
+            'id': row['id'],
+            'title': row['title'],
+            'content': row['content'],
+            'status': row['status'],
+            'created_at': now,
+            'updated_at': now
+        }
+    for result in results:
+        if result.get('op') == 'update' and result['status'] == 'ok' and result['id'] not in deletes:
+            result['note'] = existing[result['id']]
+    
+    log_action("NOTES_BATCH", current_user.id,
+               f"Created: {len(creates)}, updated: {len(updates)}, deleted: {len(deletes)}, failed: {failed}")
+    
+    return json_response({'results': results, 'applied': len(results) - failed, 'failed': failed})
 
 @bp.route('/api/notes/<int:note_id>', methods=['DELETE'])
 @login_required
@@ -456,15 +946,31 @@ def update_note(note_id):
 def delete_note(note_id):
     """Удаление заметки"""
     Note = current_app.Note
-    note = Note.query.filter_by(id=note_id, user_id=current_user.id).first()
+    user_id = current_user.id
     
-    if not note:
-        log_action("NOTE_DELETE_FAILED", current_user.id, f"Note not found: {note_id}")
+    # Версия берется до удаления (блокировка строки пользователя), а счетчики и
+    # надгробие пишутся по строке, которую DELETE действительно удалил
+    version = bump_notes_version(user_id)
+    deleted = db.session.execute(
+        delete(Note)
+        .where(Note.id == note_id, Note.user_id == user_id)
+        .returning(Note.title, Note.status, Note.content)
+        .execution_options(synchronize_session=False)
+    ).first()
+    
+    if deleted is None:
+        db.session.rollback()
+        log_action("NOTE_DELETE_FAILED", user_id, f"Note not found: {note_id}")
         return jsonify({'error': get_text('note_not_found')}), 404
     
-    title = note.title
-    db.session.delete(note)
+    title = deleted.title
+    record_deleted_notes(user_id, [note_id], version)
+    
+    stats = NoteStatsDelta()
+    stats.remove(deleted.status, deleted.content)
+    apply_note_stats(user_id, stats)
     db.session.commit()
+    invalidate_notes_cache(user_id)
     
     log_action("NOTE_DELETED", current_user.id, f"Deleted note: {title}")
     
@@ -475,19 +981,133 @@ def delete_note(note_id):
 @login_required
 @admin_limit('logs')
 def download_logs():
-    """Скачивание логов (только для админов)"""
+    """Скачивание логов со всеми ротированными копиями (только для админов).
+
+    Параметры: since, until (ISO 8601, местное время), level (минимальный
+    уровень), action (через запятую), gzip=0 - без сжатия.
+    """
     if current_user.role != 'admin':
         log_action("UNAUTHORIZED_ACCESS", current_user.id, "Attempted to access logs")
         flash(get_text('access_denied'), 'error')
         return redirect(url_for('main.home'))
     
-    log_file = 'logs/app.log'
-    if os.path.exists(log_file):
-        log_action("LOGS_DOWNLOADED", current_user.id, "Downloaded application logs")
-        return send_file(log_file, as_attachment=True, download_name='app.log')
-    else:
+    try:
+        query = LogQuery.from_args(request.args)
+    except InvalidLogFilter as e:
+        return jsonify({'error': 'Invalid log filter', 'message': str(e)}), 400
+    compressed = request.args.get('gzip', '1') not in ('0', 'false')
+    
+    response = log_download_response(current_app.config.get('LOG_FILE', DEFAULT_LOG_FILE), query, compressed)
+    if response is None:
         flash('Файл логов не найден', 'error')
         return redirect(url_for('main.home'))
+    
+    log_action("LOGS_DOWNLOADED", current_user.id,
+               f"Downloaded application logs: {query.describe()}, range: {request.headers.get('Range')}")
+    return response
+
+@bp.route('/api/logs/search')
+@login_required
+@admin_limit('log_search')
+def search_logs_api():
+    """Поиск действий в логах по пользователю, действию, IP и времени (только для админов)"""
+    if current_user.role != 'admin':
+        log_action("UNAUTHORIZED_ACCESS", current_user.id, "Attempted to search logs")
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        query = LogSearchQuery.from_args(request.args)
+    except InvalidLogSearch as e:
+        return jsonify({'error': 'Invalid log search', 'message': str(e)}), 400
+    
+    entries, next_cursor, index_state = search_logs(query)
+    log_action("LOGS_SEARCHED", current_user.id, f"Search: {dict(request.args)}, found: {len(entries)}")
+    
+    return jsonify({
+        'entries': entries,
+        'next_cursor': next_cursor,
+        'index': index_state
+    })
+
+@bp.route('/admin/notes/export')
+@login_required
+@admin_limit('export')
+def admin_export_notes():
+    """Выгрузка заметок всех пользователей (только для админов)"""
+    if current_user.role != 'admin':
+        log_action("UNAUTHORIZED_ACCESS", current_user.id, "Attempted to export all notes")
+        flash(get_text('access_denied'), 'error')
+        return redirect(url_for('main.home'))
+    
+    fmt = request.args.get('format', 'ndjson')
+    after_id = parse_after_id(request.args.get('after_id'))
+    if fmt not in EXPORT_FORMATS or after_id is None:
+        return jsonify({'error': 'Invalid export parameters'}), 400
+    
+    log_action("ADMIN_NOTES_EXPORTED", current_user.id, f"Format: {fmt}, after id: {after_id}")
+    
+    # Данные всех пользователей меняются постоянно, поэтому докачка - только через after_id
+    filename = f"notes-all-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return export_response(
+        fmt,
+        lambda: all_notes_rows(ADMIN_EXPORT_FIELDS, after_id),
+        ADMIN_EXPORT_FIELDS,
+        filename
+    )
+
+@bp.route('/admin/notes/import', methods=['POST'])
+@login_required
+@admin_limit('import')
+def admin_import_notes():
+    """Массовый импорт заметок из NDJSON в теле запроса (только для админов).
+    
+    Для продолжения прерванного импорта передается ?resume=<id>, а тело
+    запроса начинается с byte_offset из состояния задания.
+    """
+    if current_user.role != 'admin':
+        log_action("UNAUTHORIZED_ACCESS", current_user.id, "Attempted to import notes")
+        return jsonify({'error': 'Access denied'}), 403
+    
+    user_id = request.args.get('user_id', type=int)
+    resume_id = request.args.get('resume', type=int)
+    batch_size = min(max(request.args.get('batch_size', DEFAULT_IMPORT_BATCH_SIZE, type=int), 1), 50000)
+    sanitize = request.args.get('sanitize', '1') not in ('0', 'false')
+    
+    if resume_id:
+        job = get_import_job(resume_id)
+        if job is None:
+            return jsonify({'error': 'Import not found'}), 404
+    else:
+        job = create_import_job(f"upload by user {current_user.id}", user_id)
+    
+    try:
+        summary = run_import(job, request.stream, batch_size=batch_size, sanitize=sanitize)
+    except NoteImportError as e:
+        log_action("NOTES_IMPORT_FAILED", current_user.id, f"Import {job.id}: {e}")
+        return jsonify(dict(import_job_to_dict(job), error=str(e))), 409
+    except Exception as e:
+        log_action("NOTES_IMPORT_FAILED", current_user.id, f"Import {job.id}: {e}")
+        return jsonify(dict(import_job_to_dict(job), error='Import failed, resume from byte_offset')), 500
+    
+    for affected_user_id in summary['user_ids']:
+        invalidate_notes_cache(affected_user_id)
+    
+    log_action("NOTES_IMPORTED", current_user.id,
+               f"Import {job.id}: {summary['imported_now']} rows, {summary['rejected_now']} rejected, "
+               f"{summary['rows_per_second']} rows/s")
+    return jsonify(summary), 200
+
+@bp.route('/admin/notes/import/<int:import_id>', methods=['GET'])
+@login_required
+def admin_import_status(import_id):
+    """Состояние импорта (только для админов)"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    job = get_import_job(import_id)
+    if job is None:
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(import_job_to_dict(job))
 
 @bp.route('/admin/rate-limits')
 @login_required
@@ -500,7 +1120,24 @@ def rate_limit_info():
         return redirect(url_for('main.home'))
     
     log_action("RATE_LIMIT_INFO_VIEWED", current_user.id, "Viewed rate limiting information")
-    return render_template('rate_limit_info.html')
+    return render_template('rate_limit_info.html',
+                           endpoint_limits=endpoint_rate_limits(),
+                           top_windows=top_rate_limit_windows(),
+                           key_table=rate_limit_key_info())
+
+@bp.route('/api/rate-limits')
+@login_required
+@admin_limit('logs')
+def get_rate_limit_state():
+    """Текущее состояние лимитов: для этого клиента по эндпоинтам и самые загруженные окна"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify({
+        'endpoints': endpoint_rate_limits(),
+        'top_windows': top_rate_limit_windows(),
+        'key_table': rate_limit_key_info()
+    })
 
 @bp.route('/api/log-error', methods=['POST'])
 def log_client_error():
@@ -570,7 +1207,21 @@ def get_performance_stats():
             'uptime': uptime_str,
             'requests_per_sec': '12.5',
             'avg_response_time': '45.2мс',
-            'error_rate': '0.8%'
+            'error_rate': '0.8%',
+            # Счетчики кэша списка заметок (в пределах процесса)
+            'notes_cache': get_notes_cache().info(),
+            # Пул хеширования паролей: очередь, отказы, задержки
+            'password_hashing': get_password_hasher().info(),
+            # Кэш пользователя для user_loader
+            'user_cache': get_user_cache().info(),
+            # Bearer-токены: активный ключ и размер списка отзыва
+            'api_tokens': token_info(),
+            # Таблица ключей rate limiting: размер и вытеснения
+            'rate_limit_keys': rate_limit_key_info(),
+            # Очередь записи логов: глубина, отброшенные записи, размер пачек
+            'logging': log_pipeline_info(current_app),
+            # Выборка частых действий: доли и счетчики всех/записанных
+            'action_sampling': action_log_info(current_app)
         }
         
         return jsonify(stats)
@@ -0,0 +1,168 @@
+# Полнотекстовый поиск по заметкам
+# PostgreSQL: tsvector-колонка с GIN-индексом (русская и английская морфология)
+# SQLite: виртуальная таблица FTS5 (стеммер Porter + упрощенный русский стеммер запроса)
+import re
+from flask import current_app
+from sqlalchemy import Float, cast, column, func, inspect, literal_column, table
+
+# Максимальное количество слов поискового запроса
+MAX_SEARCH_TERMS = 8
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_CYRILLIC_RE = re.compile(r'[а-яё]')
+
+_RU_VOWELS = 'аеиоуыэюя'
+
+# Окончания русских слов (прилагательные, причастия, глаголы, существительные),
+# отсортированные по длине, чтобы сначала отрезалось самое длинное
+_RU_ENDINGS = sorted({
+    'ившись', 'ывшись', 'вшись', 'ивши', 'ывши', 'вши', 'ив', 'ыв',
+    'ейшее', 'ейший', 'ейшая', 'ейшей', 'ейше',
+    'ыми', 'ими', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий',
+    'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+    'ейте', 'уйте', 'ите', 'йте', 'ила', 'ыла', 'ена', 'ило', 'ыло', 'ено',
+    'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ешь', 'ете', 'ет',
+    'ют', 'ут', 'ла', 'на', 'ли', 'ло', 'но', 'ть', 'ны', 'ил', 'ыл', 'ен', 'ям',
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ях', 'ах', 'ам', 'ев', 'ов',
+    'ье', 'еи', 'ии', 'ию', 'ью', 'ия', 'ья', 'ьи',
+    'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я',
+}, key=len, reverse=True)
+
+
+def stem_russian(word):
+    """Упрощенный стеммер русского языка: отрезает окончание после первой гласной"""
+    for index, char in enumerate(word):
+        if char in _RU_VOWELS:
+            break
+    else:
+        return word
+
+    prefix, rv = word[:index + 1], word[index + 1:]
+    # Возвратные глаголы: "сохранялись" -> "сохранял"
+    for reflexive in ('ся', 'сь'):
+        if rv.endswith(reflexive) and len(rv) > len(reflexive) + 1:
+            rv = rv[:-len(reflexive)]
+            break
+    for ending in _RU_ENDINGS:
+        if rv.endswith(ending) and len(rv) > len(ending):
+            rv = rv[:-len(ending)]
+            break
+    return prefix + rv
+
+
+def tokenize_search(search):
+    """Разбиение поискового запроса на слова (только буквы и цифры)"""
+    return _WORD_RE.findall(search.lower())[:MAX_SEARCH_TERMS]
+
+
+class NoteSearch:
+    """Базовый интерфейс поиска: фильтр по запросу и выражение релевантности"""
+
+    name = 'base'
+
+    def apply(self, query, Note, search):
+        """Ограничение запроса заметками, подходящими под поиск"""
+        raise NotImplementedError
+
+    def rank(self, Note, search):
+        """Выражение релевантности (больше - лучше) или None"""
+        return None
+
+
+class LikeNoteSearch(NoteSearch):
+    """Поиск подстроки через ILIKE (когда полнотекстовый индекс не создан)"""
+
+    name = 'like'
+
+    def apply(self, query, Note, search):
+        return query.filter(
+            Note.title.ilike(f'%{search}%') | Note.content.ilike(f'%{search}%')
+        )
+
+
+class PostgresNoteSearch(NoteSearch):
+    """tsvector + GIN: слова запроса ищутся с префиксом в русской и английской конфигурациях"""
+
+    name = 'postgresql'
+
+    search_vector = literal_column('notes.search_vector')
+
+    def _tsquery(self, search):
+        terms = tokenize_search(search)
+        if not terms:
+            return None
+
+        tsquery = None
+        for term in terms:
+            # Каждое слово может быть как русским, так и английским
+            term_query = func.to_tsquery('russian', f'{term}:*').op('||')(
+                func.to_tsquery('english', f'{term}:*')
+            )
+            tsquery = term_query if tsquery is None else tsquery.op('&&')(term_query)
+        return tsquery
+
+    def apply(self, query, Note, search):
+        tsquery = self._tsquery(search)
+        if tsquery is None:
+            return query
+        return query.filter(self.search_vector.op('@@')(tsquery))
+
+    def rank(self, Note, search):
+        tsquery = self._tsquery(search)
+        if tsquery is None:
+            return None
+        # real -> double precision, чтобы значение из курсора сравнивалось точно
+        return cast(func.ts_rank_cd(self.search_vector, tsquery), Float)
+
+
+class SqliteNoteSearch(NoteSearch):
+    """FTS5: английские слова стеммит токенизатор porter, русские - stem_russian"""
+
+    name = 'sqlite'
+
+    fts_table = table('notes_fts', column('rowid'))
+
+    def _match_expression(self, search):
+        terms = []
+        for term in tokenize_search(search):
+            if _CYRILLIC_RE.search(term):
+                term = stem_russian(term)
+            terms.append(f'"{term}"*')
+        return ' AND '.join(terms)
+
+    def apply(self, query, Note, search):
+        match = self._match_expression(search)
+        if not match:
+            return query
+        return query.join(self.fts_table, self.fts_table.c.rowid == Note.id).filter(
+            literal_column('notes_fts').op('MATCH')(match)
+        )
+
+    def rank(self, Note, search):
+        if not self._match_expression(search):
+            return None
+        # bm25 тем меньше, чем документ релевантнее
+        return -func.bm25(literal_column('notes_fts'))
+
+
+def detect_note_search(engine):
+    """Выбор реализации поиска по СУБД и наличию объектов из миграции 4"""
+    inspector = inspect(engine)
+    if engine.dialect.name == 'postgresql':
+        columns = {col['name'] for col in inspector.get_columns('notes')}
+        if 'search_vector' in columns:
+            return PostgresNoteSearch()
+    elif engine.dialect.name == 'sqlite':
+        if 'notes_fts' in inspector.get_table_names():
+            return SqliteNoteSearch()
+    return LikeNoteSearch()
+
+
+def get_note_search():
+    """Реализация поиска для текущего приложения (определяется один раз)"""
+    search = current_app.extensions.get('note_search')
+    if search is None:
+        from app import db
+        search = detect_note_search(db.engine)
+        current_app.extensions['note_search'] = search
+    return search
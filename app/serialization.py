@@ -0,0 +1,65 @@
+# Сериализация заметок в JSON
+# Каждая заметка кодируется один раз; полученные байты идут и в тело ответа,
+# и в ETag. Если установлен orjson, используется он (в несколько раз быстрее json)
+import hashlib
+import json
+from datetime import date, datetime
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+# Поля заметки, доступные в ответах API (порядок - порядок колонок в SELECT)
+NOTE_FIELDS = ['id', 'title', 'content', 'status', 'created_at', 'updated_at']
+
+JSON_MIMETYPE = 'application/json'
+
+
+def _default(value):
+    """Типы, которые стандартный json не умеет кодировать"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_dumps(data):
+    """JSON в байтах через стандартный json"""
+    return json.dumps(data, default=_default, sort_keys=True, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_dumps(data):
+    """JSON в байтах через orjson (datetime кодируется без isoformat)"""
+    return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+
+# Самый быстрый доступный кодировщик
+dumps = _orjson_dumps if orjson is not None else _json_dumps
+
+
+def serialize_note(note, fields=NOTE_FIELDS):
+    """Заметка (модель или строка проекции) в словарь для API.
+
+    Даты остаются объектами datetime и преобразуются в строку только при
+    кодировании в JSON.
+    """
+    return {field: getattr(note, field) for field in fields}
+
+
+def content_etag(body):
+    """ETag по уже закодированному телу ответа"""
+    return hashlib.md5(body).hexdigest()
+
+
+def json_body_response(body, status=200, etag=None):
+    """JSON-ответ из уже закодированного тела"""
+    response = Response(body, status=status, mimetype=JSON_MIMETYPE)
+    response.headers['ETag'] = etag or content_etag(body)
+    return response
+
+
+def json_response(data, status=200, etag=None):
+    """JSON-ответ: данные кодируются один раз, ETag (если не передан) считается по тем же байтам"""
+    return json_body_response(dumps(data), status=status, etag=etag)
@@ -0,0 +1,196 @@
+# Структурированные логи действий: один JSON-объект на строку
+# log_action не форматирует строку в потоке запроса: поля действия копятся в g
+# и записываются в конце запроса вместе со статусом ответа и длительностью:
+#   {"time": ..., "level": "INFO", "action": "NOTE_CREATED", "user": 42,
+#    "ip": "...", "endpoint": "main.create_note", "status": 201,
+#    "duration_ms": 12.3, "details": "..."}
+# В текстовом формате (LOG_FORMAT=text) строка прежняя: "ACTION: ... | USER: ... | IP: ... | ...".
+#
+# Частые действия пишутся выборочно: LOG_SAMPLE_RATES="NOTES_VIEWED=0.1,NOTES_CACHE_HIT=0"
+# (доля записываемых, 0 - только подсчет). Запись из выборки содержит
+# sample_rate, а раз в LOG_SAMPLING_SUMMARY_INTERVAL секунд пишется сводка
+# LOG_SAMPLING_SUMMARY с числом всех и записанных действий. Действия аудита
+# (входы, токены, изменения данных, отказы доступа, ошибки *_FAILED)
+# записываются всегда, какая бы доля для них ни была указана.
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from flask import current_app, g, request
+from app.rate_limiter import get_client_ip
+
+# Частые действия и доля записываемых по умолчанию
+DEFAULT_SAMPLE_RATES = {
+    'NOTES_VIEWED': 0.1,
+    'NOTES_CACHED': 0.1,
+    'NOTES_CACHE_HIT': 0.01,
+    'NOTES_SYNCED': 0.1,
+}
+DEFAULT_SUMMARY_INTERVAL = 60
+SUMMARY_ACTION = 'LOG_SAMPLING_SUMMARY'
+
+AUDIT_ACTIONS = frozenset({
+    'LOGIN_SUCCESS', 'LOGOUT', 'REGISTER_SUCCESS', 'UNAUTHORIZED_ACCESS',
+    'TOKEN_ISSUED', 'TOKEN_REFRESHED', 'TOKEN_REFRESH_REUSED', 'TOKEN_REVOKED',
+    'PROFILE_UPDATED', 'AVATAR_UPLOADED', 'AVATAR_DELETED',
+    'NOTE_CREATED', 'NOTE_UPDATED', 'NOTE_DELETED', 'NOTES_BATCH', 'NOTES_IMPORTED',
+    'NOTES_EXPORTED', 'ADMIN_NOTES_EXPORTED', 'LOGS_DOWNLOADED', 'LOGS_SEARCHED',
+})
+
+
+def is_audit_action(action):
+    """Действие, которое записывается всегда"""
+    return action in AUDIT_ACTIONS or action.endswith('_FAILED')
+
+
+def parse_sample_rates(raw_rates):
+    """Доли выборки из строки "ACTION=rate,...", поверх значений по умолчанию"""
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for item in (raw_rates or '').split(','):
+        action, _, rate = item.strip().partition('=')
+        if not action or not rate:
+            continue
+        try:
+            rates[action.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            logging.getLogger(__name__).warning("Invalid sample rate for %s: %s", action, rate)
+    for action in [action for action in rates if is_audit_action(action)]:
+        logging.getLogger(__name__).warning("Action %s is audited and is never sampled", action)
+        del rates[action]
+    return rates
+
+
+class ActionSampler:
+    """Выборка частых действий и счетчики всех/записанных действий"""
+
+    def __init__(self, rates, summary_interval=DEFAULT_SUMMARY_INTERVAL):
+        self.rates = rates
+        self.summary_interval = summary_interval
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._logged = {}
+        self._summary_at = time.monotonic()
+
+    def sample(self, action):
+        """Доля выборки, если действие нужно записать, иначе None"""
+        rate = self.rates.get(action, 1.0)
+        keep = rate >= 1.0 or random.random() < rate
+        with self._lock:
+            self._seen[action] = self._seen.get(action, 0) + 1
+            if keep:
+                self._logged[action] = self._logged.get(action, 0) + 1
+        return rate if keep else None
+
+    def take_summary(self):
+        """Счетчики выборочных действий за прошедший интервал (None, если интервал не истек)"""
+        now = time.monotonic()
+        if now - self._summary_at < self.summary_interval:
+            return None
+        with self._lock:
+            if now - self._summary_at < self.summary_interval:
+                return None
+            counts = {action: {'seen': seen, 'logged': self._logged.get(action, 0)}
+                      for action, seen in self._seen.items() if action in self.rates}
+            self._seen = {}
+            self._logged = {}
+            self._summary_at = now
+        return counts or None
+
+    def info(self):
+        with self._lock:
+            return {
+                'rates': self.rates,
+                'seen': dict(self._seen),
+                'logged': dict(self._logged),
+            }
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - один JSON-объект в строке"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            data.update(fields)
+        else:
+            data['message'] = record.getMessage()
+            data['source'] = f"{record.pathname}:{record.lineno}"
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _emit_action(fields):
+    current_app.logger.info("ACTION: %s | USER: %s | IP: %s | %s",
+                            fields['action'], fields['user'], fields['ip'], fields['details'],
+                            extra={'fields': fields})
+
+
+def record_action(action, user_id, details=""):
+    """Действие пользователя: запишется в конце запроса (или не запишется по выборке)"""
+    sampler = current_app.extensions.get('action_sampler')
+    sample_rate = sampler.sample(action) if sampler else 1.0
+    if sample_rate is None:
+        return
+    fields = {
+        'action': action,
+        'user': user_id,
+        'ip': get_client_ip(),
+        'endpoint': request.endpoint,
+        'details': details,
+    }
+    if sample_rate < 1.0:
+        fields['sample_rate'] = sample_rate
+    g.setdefault('pending_actions', []).append(fields)
+
+
+def _remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+def _flush_actions(exc=None):
+    pending = g.pop('pending_actions', None)
+    sampler = current_app.extensions.get('action_sampler')
+    if pending:
+        started = g.get('request_started')
+        duration = round((time.perf_counter() - started) * 1000, 2) if started else None
+        status = g.get('response_status', 500 if exc else None)
+        for fields in pending:
+            fields['status'] = status
+            fields['duration_ms'] = duration
+            _emit_action(fields)
+    summary = sampler.take_summary() if sampler else None
+    if summary:
+        _emit_action({'action': SUMMARY_ACTION, 'user': None, 'ip': None, 'endpoint': None,
+                      'details': json.dumps(summary, sort_keys=True), 'counts': summary})
+
+
+def init_action_log(app):
+    """Выборка частых действий и запись действий в конце запроса"""
+    app.config.setdefault('LOG_SAMPLE_RATES', os.getenv('LOG_SAMPLE_RATES', ''))
+    app.config.setdefault('LOG_SAMPLING_SUMMARY_INTERVAL',
+                          float(os.getenv('LOG_SAMPLING_SUMMARY_INTERVAL', DEFAULT_SUMMARY_INTERVAL)))
+
+    app.extensions['action_sampler'] = ActionSampler(parse_sample_rates(app.config['LOG_SAMPLE_RATES']),
+                                                     app.config['LOG_SAMPLING_SUMMARY_INTERVAL'])
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    app.after_request(_remember_status)
+    app.teardown_request(_flush_actions)
+
+
+def action_log_info(app):
+    """Счетчики выборки действий для мониторинга"""
+    sampler = app.extensions.get('action_sampler')
+    return sampler.info() if sampler else None
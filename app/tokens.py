@@ -0,0 +1,284 @@
+# Bearer-токены для /api/notes* (JWT, HS256)
+# Проверка токена - только вычисления: HMAC с заранее подготовленным ключом,
+# разбор полезной нагрузки и поиск jti в списке отзыва в памяти. Пользователь
+# собирается из токена без запроса к БД.
+#
+# Access-токен живет ACCESS_TOKEN_TTL, refresh-токен - REFRESH_TOKEN_TTL;
+# обновление выдает новую пару и отзывает использованный refresh-токен.
+#
+# Ключи: API_TOKEN_KEYS="kid2:secret2,kid1:secret1" - первым ключом
+# подписываются новые токены, остальные принимаются при проверке. Для ротации
+# новый ключ добавляется первым, старый удаляется после REFRESH_TOKEN_TTL.
+# Без API_TOKEN_KEYS ключ выводится из SECRET_KEY.
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, g, jsonify, request
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.user_cache import user_from_snapshot
+
+ACCESS_TOKEN_TTL = 15 * 60
+REFRESH_TOKEN_TTL = 30 * 24 * 3600
+# Как часто процесс подгружает из БД токены, отозванные другими процессами
+REVOCATION_SYNC_INTERVAL = 5
+# Записи за столько последних секунд перечитываются при каждой синхронизации:
+# транзакция отзыва может зафиксироваться позже записей, уже прочитанных после нее
+REVOCATION_SYNC_MARGIN = 60
+# Пути, на которых принимается bearer-токен
+TOKEN_PATH_PREFIX = '/api/notes'
+
+
+class InvalidToken(ValueError):
+    """Токен не разобран, подпись неверна, срок истек или токен отозван"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(segment):
+    try:
+        return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+    except (ValueError, TypeError):
+        raise InvalidToken("Malformed token")
+
+
+def parse_token_keys(raw_keys, secret_key):
+    """Ключи из строки "kid:secret,...": (ключи, kid для подписи)"""
+    keys = {}
+    for item in (raw_keys or '').split(','):
+        kid, _, secret = item.strip().partition(':')
+        if kid and secret:
+            keys[kid] = secret.encode()
+    if not keys:
+        keys['default'] = hmac.new(secret_key.encode(), b'api-tokens', hashlib.sha256).digest()
+    return keys, next(iter(keys))
+
+
+class TokenSigner:
+    """Подпись и проверка токенов HS256 набором ключей"""
+
+    def __init__(self, keys, active_kid):
+        self.active_kid = active_kid
+        # Подготовленные HMAC: для каждого токена копируется готовое состояние ключа
+        self._macs = {kid: hmac.new(secret, digestmod=hashlib.sha256) for kid, secret in keys.items()}
+        # Заголовки известных ключей: токен с другим заголовком отклоняется без разбора JSON
+        self._headers = {
+            kid: _b64encode(json.dumps({'alg': 'HS256', 'typ': 'JWT', 'kid': kid}, separators=(',', ':')).encode())
+            for kid in keys
+        }
+        self._header_kids = {header: kid for kid, header in self._headers.items()}
+
+    def _signature(self, kid, signing_input):
+        mac = self._macs[kid].copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def sign(self, claims):
+        """Токен с полезной нагрузкой claims"""
+        header = self._headers[self.active_kid]
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        signing_input = f"{header}.{payload}".encode('ascii')
+        return f"{header}.{payload}.{_b64encode(self._signature(self.active_kid, signing_input))}"
+
+    def verify(self, token, now=None):
+        """Полезная нагрузка проверенного токена (подпись и срок действия)"""
+        try:
+            header, payload, signature = token.split('.')
+        except (AttributeError, ValueError):
+            raise InvalidToken("Malformed token")
+        kid = self._header_kids.get(header)
+        if kid is None:
+            raise InvalidToken("Unknown signing key")
+        signing_input = f"{header}.{payload}".encode('ascii', 'replace')
+        if not hmac.compare_digest(self._signature(kid, signing_input), _b64decode(signature)):
+            raise InvalidToken("Invalid signature")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise InvalidToken("Malformed token")
+        if not isinstance(claims, dict) or not isinstance(claims.get('exp'), int):
+            raise InvalidToken("Malformed token")
+        if claims['exp'] <= (now or time.time()):
+            raise InvalidToken("Token expired")
+        return claims
+
+
+class RevocationList:
+    """Отозванные jti в памяти процесса (проверка за O(1)).
+
+    Таблица revoked_tokens общая для всех процессов: новые записи
+    подгружаются не чаще раза в REVOCATION_SYNC_INTERVAL секунд. Они
+    выбираются по revoked_at с запасом REVOCATION_SYNC_MARGIN, а не по id:
+    id (SERIAL) выдаются при вставке, а видны строки после фиксации, и
+    запись с меньшим id может появиться позже записи с большим.
+    """
+
+    def __init__(self, sync_interval=REVOCATION_SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._revoked = {}  # jti -> срок действия токена (unix time)
+        self._last_revoked_at = None  # самое позднее прочитанное revoked_at
+        self._synced_at = None
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        RevokedToken = current_app.RevokedToken
+        query = db.session.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+        if self._last_revoked_at is not None:
+            # Повторно прочитанные записи просто перезаписываются в словаре
+            query = query.filter(
+                RevokedToken.revoked_at >= self._last_revoked_at - timedelta(seconds=REVOCATION_SYNC_MARGIN)
+            )
+        rows = query.all()
+        wall_now = time.time()
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._revoked[jti] = calendar.timegm(expires_at.timetuple()) if expires_at else 0
+                if revoked_at and (self._last_revoked_at is None or revoked_at > self._last_revoked_at):
+                    self._last_revoked_at = revoked_at
+            # Истекшие токены отклоняются по сроку, хранить их не нужно
+            for jti in [jti for jti, exp in self._revoked.items() if exp <= wall_now]:
+                del self._revoked[jti]
+            self._synced_at = now
+
+    def is_revoked(self, jti):
+        self._sync()
+        return jti in self._revoked
+
+    def revoke(self, jti, user_id, expires_at):
+        """Отзыв токена (фиксируется в БД и сразу виден этому процессу).
+
+        Возвращает False, если токен уже был отозван: так повторное
+        использование refresh-токена обнаруживается без задержки синхронизации.
+        """
+        RevokedToken = current_app.RevokedToken
+        # Попутно удаляются записи о токенах, которые уже истекли сами
+        RevokedToken.query.filter(RevokedToken.expires_at < datetime.utcnow()).delete()
+        db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=datetime.utcfromtimestamp(expires_at)))
+        try:
+            db.session.commit()
+            revoked = True
+        except IntegrityError:
+            db.session.rollback()  # уже отозван
+            revoked = False
+        with self._lock:
+            self._revoked[jti] = expires_at
+        return revoked
+
+    def size(self):
+        with self._lock:
+            return len(self._revoked)
+
+
+def init_tokens(app):
+    """Ключи и список отзыва из настроек окружения"""
+    app.config.setdefault('API_TOKEN_KEYS', os.getenv('API_TOKEN_KEYS'))
+    app.config.setdefault('ACCESS_TOKEN_TTL', int(os.getenv('ACCESS_TOKEN_TTL', ACCESS_TOKEN_TTL)))
+    app.config.setdefault('REFRESH_TOKEN_TTL', int(os.getenv('REFRESH_TOKEN_TTL', REFRESH_TOKEN_TTL)))
+
+    keys, active_kid = parse_token_keys(app.config['API_TOKEN_KEYS'], app.config['SECRET_KEY'])
+    app.extensions['token_signer'] = TokenSigner(keys, active_kid)
+    app.extensions['token_revocations'] = RevocationList()
+
+
+def _signer():
+    return current_app.extensions['token_signer']
+
+
+def _revocations():
+    return current_app.extensions['token_revocations']
+
+
+def issue_tokens(user):
+    """Пара access + refresh для пользователя"""
+    now = int(time.time())
+    access_ttl = current_app.config['ACCESS_TOKEN_TTL']
+    refresh_ttl = current_app.config['REFRESH_TOKEN_TTL']
+    signer = _signer()
+    access = signer.sign({'sub': str(user.id), 'typ': 'access', 'iat': now, 'exp': now + access_ttl,
+                          'jti': secrets.token_urlsafe(12)})
+    refresh = signer.sign({'sub': str(user.id), 'typ': 'refresh', 'iat': now, 'exp': now + refresh_ttl,
+                           'jti': secrets.token_urlsafe(12)})
+    return {
+        'access_token': access,
+        'refresh_token': refresh,
+        'token_type': 'Bearer',
+        'expires_in': access_ttl,
+    }
+
+
+def verify_token(token, token_type):
+    """Проверенная полезная нагрузка токена нужного типа"""
+    claims = _signer().verify(token)
+    if claims.get('typ') != token_type:
+        raise InvalidToken("Wrong token type")
+    sub = claims.get('sub')
+    if not isinstance(sub, str) or not sub.isdigit() or not isinstance(claims.get('jti'), str):
+        raise InvalidToken("Malformed token")
+    claims['user_id'] = int(sub)
+    if _revocations().is_revoked(claims.get('jti')):
+        raise InvalidToken("Token revoked")
+    return claims
+
+
+def revoke_token(claims):
+    """Отзыв проверенного токена (False - уже был отозван)"""
+    return _revocations().revoke(claims['jti'], claims['user_id'], claims['exp'])
+
+
+def bearer_token():
+    """Токен из заголовка Authorization или None"""
+    auth = request.headers.get('Authorization', '')
+    scheme, _, token = auth.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return token.strip()
+
+
+def load_user_from_token(req):
+    """request_loader Flask-Login: пользователь из access-токена без запроса к БД"""
+    if not req.path.startswith(TOKEN_PATH_PREFIX):
+        return None
+    token = bearer_token()
+    if token is None:
+        return None
+    g.bearer_auth_attempted = True
+    try:
+        claims = verify_token(token, 'access')
+    except InvalidToken as e:
+        g.bearer_auth_error = str(e)
+        return None
+    # Остальные поля пользователя загрузятся из БД, только если к ним обратятся
+    return user_from_snapshot({'id': claims['user_id']})
+
+
+def bearer_unauthorized_response():
+    """Ответ 401 для запроса с bearer-токеном (None - обычный вход через форму)"""
+    if not g.get('bearer_auth_attempted'):
+        return None
+    error = g.get('bearer_auth_error', 'Invalid token')
+    response = jsonify({'error': 'Unauthorized', 'message': error})
+    response.status_code = 401
+    response.headers['WWW-Authenticate'] = f'Bearer error="invalid_token", error_description="{error}"'
+    return response
+
+
+def token_info():
+    """Параметры токенов для мониторинга"""
+    return {
+        'active_kid': _signer().active_kid,
+        'access_ttl': current_app.config['ACCESS_TOKEN_TTL'],
+        'refresh_ttl': current_app.config['REFRESH_TOKEN_TTL'],
+        'revoked_in_memory': _revocations().size(),
+    }
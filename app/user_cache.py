@@ -0,0 +1,119 @@
+# Кэш пользователя для user_loader
+# Flask-Login загружает пользователя на каждый запрос с current_user, в том
+# числе на каждый опрос /api/notes. Снимок строки users хранится в кэше
+# (те же реализации, что у кэша списка заметок: memory или общий sqlite)
+# и, по желанию, в сессии; из снимка объект подключается к сессии SQLAlchemy
+# без запроса к БД. profile и delete_avatar сбрасывают снимок сразу,
+# остальные изменения строки видны не позже чем через USER_CACHE_TTL секунд.
+import json
+import os
+import time
+from flask import current_app, session
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+from app.cache import create_notes_cache, default_cache_path
+
+DEFAULT_USER_CACHE_TTL = 30
+DEFAULT_USER_CACHE_MAX_ENTRIES = 10000
+# Ключ записи пользователя в кэше и снимка в сессии
+USER_CACHE_KEY = 'identity'
+SESSION_SNAPSHOT_KEY = '_user_snapshot'
+
+# Поля снимка. Хеш пароля не кэшируется (и не попадает в cookie сессии),
+# notes_version меняется при каждой записи заметок; они читаются из БД
+# при первом обращении.
+SNAPSHOT_FIELDS = ['id', 'first_name', 'last_name', 'age', 'avatar_url', 'about', 'role', 'email']
+
+
+def user_snapshot(user):
+    """Снимок полей пользователя"""
+    return {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+
+
+def user_from_snapshot(snapshot):
+    """Пользователь из снимка, подключенный к сессии без запроса к БД"""
+    user = current_app.User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def _read_session_snapshot(user_id):
+    data = session.get(SESSION_SNAPSHOT_KEY)
+    if not isinstance(data, dict) or data.get('id') != user_id:
+        return None
+    if data.get('cached_at', 0) + current_app.config['USER_CACHE_TTL'] < time.time():
+        return None
+    return {field: data.get(field) for field in SNAPSHOT_FIELDS}
+
+
+def _write_session_snapshot(entry):
+    session[SESSION_SNAPSHOT_KEY] = entry
+
+
+def load_cached_user(user_id):
+    """Пользователь по id: снимок из сессии, из кэша или запрос к БД"""
+    use_session = current_app.config['USER_SESSION_SNAPSHOT']
+    if use_session:
+        snapshot = _read_session_snapshot(user_id)
+        if snapshot is not None:
+            return user_from_snapshot(snapshot)
+
+    cache = get_user_cache()
+    cached = cache.get(user_id, USER_CACHE_KEY)
+    if cached is None:
+        user = db.session.get(current_app.User, user_id)
+        if user is None:
+            return None
+        # Время снимка хранится с ним: снимок в сессии не живет дольше кэша
+        entry = dict(user_snapshot(user), cached_at=time.time())
+        cache.set(user_id, USER_CACHE_KEY, json.dumps(entry).encode())
+        if use_session:
+            _write_session_snapshot(entry)
+        return user
+
+    entry = json.loads(cached)
+    if use_session:
+        _write_session_snapshot(entry)
+    return user_from_snapshot({field: entry.get(field) for field in SNAPSHOT_FIELDS})
+
+
+def refresh_user(user):
+    """Перечитывание строки перед изменением: снимок мог устареть на TTL"""
+    db.session.refresh(user)
+    return user
+
+
+def invalidate_user_cache(user_id):
+    """Сброс снимка после изменения строки пользователя"""
+    get_user_cache().invalidate_user(user_id)
+    snapshot = session.get(SESSION_SNAPSHOT_KEY)
+    if isinstance(snapshot, dict) and snapshot.get('id') == user_id:
+        session.pop(SESSION_SNAPSHOT_KEY)
+
+
+def init_user_cache(app):
+    """Кэш пользователей из настроек окружения"""
+    app.config.setdefault('USER_CACHE_BACKEND', os.getenv('USER_CACHE_BACKEND', 'memory'))
+    app.config.setdefault('USER_CACHE_TTL', int(os.getenv('USER_CACHE_TTL', DEFAULT_USER_CACHE_TTL)))
+    app.config.setdefault('USER_CACHE_MAX_ENTRIES',
+                          int(os.getenv('USER_CACHE_MAX_ENTRIES', DEFAULT_USER_CACHE_MAX_ENTRIES)))
+    app.config.setdefault('USER_CACHE_PATH', os.getenv('USER_CACHE_PATH'))
+    app.config.setdefault('USER_SESSION_SNAPSHOT', os.getenv('USER_SESSION_SNAPSHOT', '0') == '1')
+
+    backend = app.config['USER_CACHE_BACKEND']
+    path = app.config['USER_CACHE_PATH']
+    if backend == 'sqlite' and not path:
+        # Отдельный файл: сброс кэша заметок не затрагивает пользователей
+        path = default_cache_path(app, 'user_cache')
+
+    app.extensions['user_cache'] = create_notes_cache(
+        backend,
+        ttl=app.config['USER_CACHE_TTL'],
+        max_entries=app.config['USER_CACHE_MAX_ENTRIES'],
+        path=path
+    )
+
+
+def get_user_cache():
+    """Кэш пользователей текущего приложения"""
+    return current_app.extensions['user_cache']
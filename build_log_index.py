@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Построение индекса поиска по логам (app/log_search.py) без ограничения объема
+Поиск дополняет индекс не больше чем на LOG_INDEX_SYNC_BYTES за запрос; этот
+скрипт индексирует все накопленные логи сразу, например после включения
+поиска на сервере с большими логами
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from app.log_pipeline import DEFAULT_LOG_FILE
+from app.log_search import LogIndex, default_log_index_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Построение индекса поиска по логам')
+    parser.add_argument('--log-file', default=os.getenv('LOG_FILE', DEFAULT_LOG_FILE),
+                        help='Файл лога (по умолчанию LOG_FILE)')
+    parser.add_argument('--index', default=os.getenv('LOG_INDEX_PATH'),
+                        help='Файл индекса (по умолчанию LOG_INDEX_PATH или log_index.sqlite рядом с логами)')
+
+    args = parser.parse_args()
+
+    index_path = args.index or default_log_index_path(args.log_file)
+    print(f"📂 Логи: {args.log_file}")
+    print(f"🗂️  Индекс: {index_path}")
+
+    try:
+        index = LogIndex(args.log_file, index_path, sync_bytes=sys.maxsize)
+        start = time.perf_counter()
+        state = index.sync()
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        print(f"❌ Ошибка при индексации: {e}")
+        sys.exit(1)
+
+    info = index.info()
+    print(f"\n✅ Проиндексировано {state['indexed_bytes'] / 1024 / 1024:.1f} МБ логов за {elapsed:.1f} с")
+    print(f"   файлов: {info['files']}, записей: {info['entries']}, "
+          f"размер индекса: {info['file_bytes'] / 1024 / 1024:.1f} МБ")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Предварительное сжатие статики (запускается при сборке)
+Для каждого CSS/JS/SVG файла в static/ создает рядом .gz и .br версии,
+которые app/compression.py отдает вместо сжатия на лету
+"""
+
+import argparse
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, 'static')
+
+# Какие файлы сжимать (uploads - пользовательские файлы, их не трогаем)
+EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+SKIP_DIRS = {'uploads'}
+
+
+def iter_static_files(static_dir):
+    """Файлы статики, которые имеет смысл сжимать"""
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [name for name in dirs if name not in SKIP_DIRS]
+        for name in sorted(files):
+            if name.endswith(EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def write_if_changed(path, data, source_mtime, force=False):
+    """Запись сжатого файла, если он устарел или отсутствует"""
+    if not force and os.path.exists(path) and os.path.getmtime(path) >= source_mtime:
+        return False
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Предварительное сжатие статики (.gz и .br)')
+    parser.add_argument('--static-dir', default=STATIC_DIR, help='Папка со статикой')
+    parser.add_argument('--force', action='store_true', help='Пересоздать все сжатые файлы')
+    parser.add_argument('--clean', action='store_true', help='Удалить сжатые файлы')
+
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("⚠️  Модуль brotli не установлен - создаются только .gz файлы")
+
+    total_original = total_gzip = total_brotli = 0
+    for path in iter_static_files(args.static_dir):
+        relative = os.path.relpath(path, args.static_dir)
+
+        if args.clean:
+            for extension in ('.gz', '.br'):
+                if os.path.exists(path + extension):
+                    os.remove(path + extension)
+            print(f"🗑️  {relative}")
+            continue
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        source_mtime = os.path.getmtime(path)
+
+        # mtime=0 - одинаковые файлы при каждой сборке
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        write_if_changed(path + '.gz', gzipped, source_mtime, args.force)
+        line = f"📦 {relative}: {len(data)} -> gzip {len(gzipped)}"
+        total_original += len(data)
+        total_gzip += len(gzipped)
+
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            write_if_changed(path + '.br', compressed, source_mtime, args.force)
+            line += f", br {len(compressed)}"
+            total_brotli += len(compressed)
+        print(line)
+
+    if not args.clean and total_original:
+        print(f"\n✅ Всего: {total_original} байт -> gzip {total_gzip} ({total_gzip / total_original:.0%})"
+              + (f", br {total_brotli} ({total_brotli / total_original:.0%})" if total_brotli else ""))
+
+
+if __name__ == '__main__':
+    main()
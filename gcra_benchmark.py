@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк стратегий rate limiting: фиксированное окно Flask-Limiter против GCRA
+Для хранилищ memory:// и общего SQLite (app/rate_limit_storage.py) измеряет:
+  - проверок в секунду;
+  - байт на отслеживаемый ключ (память процесса или размер файла SQLite);
+  - сколько запросов пропускает лимит "N per second" за 0.2 с на границе окна
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+import app.rate_limit_storage  # noqa: F401 - регистрирует схему sqlite://
+from app.gcra import GCRA_STRATEGY
+
+
+def make_limiter(strategy, backend):
+    """Стратегия поверх нового хранилища"""
+    if backend == 'memory':
+        uri = 'memory://'
+    else:
+        uri = f"sqlite://{os.path.join(tempfile.mkdtemp(), 'ratelimit.sqlite')}"
+    storage = storage_from_string(uri)
+    return STRATEGIES[strategy](storage), storage
+
+
+def measure_throughput(strategy, backend, checks, keys):
+    """Проверок в секунду на keys разных ключах"""
+    limiter, _ = make_limiter(strategy, backend)
+    item = parse('1000000 per minute')
+    start = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(item, f"user:{i % keys}")
+    return checks / (time.perf_counter() - start)
+
+
+def measure_key_size(strategy, backend, keys):
+    """Байт на ключ: прирост памяти процесса или размера файла SQLite"""
+    limiter, storage = make_limiter(strategy, backend)
+    item = parse('100 per hour')
+    if backend == 'memory':
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(keys):
+            limiter.hit(item, f"user:{i}")
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return used / keys
+    conn = storage._connect()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    before = os.path.getsize(storage.path)
+    for i in range(keys):
+        limiter.hit(item, f"user:{i}")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return (os.path.getsize(storage.path) - before) / keys
+
+
+def measure_edge_burst(strategy, backend, limit):
+    """Пропущено запросов за 0.2 с вокруг границы окна лимита "limit per second"."""
+    limiter, _ = make_limiter(strategy, backend)
+    item = parse(f'{limit} per second')
+    start = time.time()
+    limiter.hit(item, 'edge')  # открывает окно
+    time.sleep(max(0.0, start + 0.9 - time.time()))
+    allowed = sum(1 for _ in range(limit) if limiter.hit(item, 'edge'))
+    time.sleep(max(0.0, start + 1.05 - time.time()))
+    allowed += sum(1 for _ in range(limit) if limiter.hit(item, 'edge'))
+    return allowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк стратегий rate limiting: фиксированное окно и GCRA')
+    parser.add_argument('--checks', type=int, default=50000, help='Проверок для замера пропускной способности')
+    parser.add_argument('--keys', type=int, default=10000, help='Разных ключей')
+    parser.add_argument('--edge-limit', type=int, default=10, help='Лимит в секунду для теста границы окна')
+
+    args = parser.parse_args()
+
+    variants = [
+        ('fixed-window', 'memory'),
+        ('fixed-window', 'sqlite'),
+        (GCRA_STRATEGY, 'memory'),
+        (GCRA_STRATEGY, 'sqlite'),
+    ]
+
+    print(f"⚡ ПРОВЕРОК В СЕКУНДУ ({args.checks} проверок, {args.keys} ключей)")
+    print("=" * 50)
+    for strategy, backend in variants:
+        rate = measure_throughput(strategy, backend, args.checks, args.keys)
+        print(f"   {strategy} / {backend}: {rate:,.0f}")
+
+    print(f"\n💾 БАЙТ НА КЛЮЧ ({args.keys} ключей)")
+    print("=" * 50)
+    for strategy, backend in variants:
+        size = measure_key_size(strategy, backend, args.keys)
+        print(f"   {strategy} / {backend}: {size:.0f}")
+
+    print(f"\n🚧 ГРАНИЦА ОКНА: лимит {args.edge_limit}/с, пропущено за 0.2 с (без первого запроса)")
+    print("=" * 50)
+    for strategy, backend in variants:
+        allowed = measure_edge_burst(strategy, backend, args.edge_limit)
+        print(f"   {strategy} / {backend}: {allowed}")
+
+
+if __name__ == '__main__':
+    main()
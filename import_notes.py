@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Массовый импорт заметок из NDJSON (например, выгрузки /api/notes/export)
+Строки проверяются и загружаются пачками: COPY в PostgreSQL, executemany в SQLite.
+Прогресс сохраняется в базе после каждой пачки - прерванный импорт
+продолжается флагом --resume
+"""
+
+import argparse
+import gzip
+import sys
+
+from app import create_app
+from app.importer import (DEFAULT_IMPORT_BATCH_SIZE, NoteImportError, create_import_job, get_import_job,
+                          import_job_to_dict, run_import, skip_bytes)
+
+
+def open_source(path):
+    """Файл (в том числе .gz) или stdin в двоичном режиме"""
+    if path == '-':
+        return sys.stdin.buffer
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def print_progress(job, rows_per_second):
+    """Прогресс после каждой пачки"""
+    print(f"   📦 Строка {job.line_number}: импортировано {job.rows_imported}, "
+          f"отклонено {job.rows_rejected}, {rows_per_second:.0f} строк/с", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовый импорт заметок из NDJSON')
+    parser.add_argument('source', nargs='?', help='Файл NDJSON (.gz поддерживается, - для stdin)')
+    parser.add_argument('--user-id', type=int, help='Владелец всех заметок (иначе берется user_id из строк)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_IMPORT_BATCH_SIZE, help='Строк в одной транзакции')
+    parser.add_argument('--resume', type=int, metavar='IMPORT_ID', help='Продолжить прерванный импорт')
+    parser.add_argument('--status', type=int, metavar='IMPORT_ID', help='Показать состояние импорта')
+    parser.add_argument('--no-sanitize', action='store_true',
+                        help='Не экранировать HTML (для выгрузок этого же приложения, они уже очищены)')
+
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            if args.status:
+                job = get_import_job(args.status)
+                if job is None:
+                    raise NoteImportError(f"Import {args.status} not found")
+                for key, value in import_job_to_dict(job).items():
+                    print(f"   {key}: {value}")
+                return
+
+            if not args.source:
+                parser.error('source is required')
+
+            stream = open_source(args.source)
+            if args.resume:
+                job = get_import_job(args.resume)
+                if job is None:
+                    raise NoteImportError(f"Import {args.resume} not found")
+                print(f"🔁 Продолжение импорта #{job.id} с байта {job.byte_offset} (строка {job.line_number})")
+                if stream.seekable():
+                    stream.seek(job.byte_offset)
+                else:
+                    skip_bytes(stream, job.byte_offset)
+            else:
+                job = create_import_job(args.source, args.user_id)
+                print(f"🚀 Импорт #{job.id}: {args.source}")
+
+            summary = run_import(job, stream, batch_size=args.batch_size, sanitize=not args.no_sanitize,
+                                 progress=print_progress)
+
+            print("\n📊 РЕЗУЛЬТАТЫ")
+            print("=" * 50)
+            print(f"✅ Импортировано: {summary['imported_now']} (всего по заданию {summary['rows_imported']})")
+            print(f"⚠️  Отклонено: {summary['rejected_now']}")
+            for error in summary['errors']:
+                print(f"   строка {error['line']}: {error['error']}")
+            print(f"⏱️  Время: {summary['seconds']:.2f} с, {summary['rows_per_second']} строк/с")
+
+        except NoteImportError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"❌ Ошибка импорта: {e}")
+            if args.resume or args.source:
+                print("💡 Импорт можно продолжить с флагом --resume")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк индексов таблиц notes/users
+Заполняет пустую базу тестовыми данными, показывает планы запросов /api/notes
+и их время выполнения до и после миграции с индексами
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, bindparam, create_engine, inspect, text
+
+from app.migrations import run_migrations
+
+# Миграция, добавляющая индексы
+INDEX_MIGRATION = 3
+
+# Формы запросов, которые выполняет get_notes и вход по email
+QUERIES = {
+    'notes_by_status_created': (
+        "SELECT id, title, content, status, created_at, updated_at FROM notes "
+        "WHERE user_id = :user_id AND status = 'active' "
+        "ORDER BY created_at DESC, id DESC LIMIT 50"
+    ),
+    'notes_by_created': (
+        "SELECT id, title, content, status, created_at, updated_at FROM notes "
+        "WHERE user_id = :user_id ORDER BY created_at DESC, id DESC LIMIT 50"
+    ),
+    'notes_by_updated': (
+        "SELECT id, title, content, status, created_at, updated_at FROM notes "
+        "WHERE user_id = :user_id ORDER BY updated_at DESC, id DESC LIMIT 50"
+    ),
+    'notes_by_title': (
+        "SELECT id, title, content, status, created_at, updated_at FROM notes "
+        "WHERE user_id = :user_id ORDER BY title ASC, id ASC LIMIT 50"
+    ),
+    'user_by_email': (
+        "SELECT id FROM users WHERE lower(email) = lower(:email)"
+    ),
+}
+
+
+def seed(engine, users, notes, heavy_share):
+    """Заполнение базы: один "тяжелый" пользователь и равномерный остаток"""
+    print(f"🌱 Заполнение: {users} пользователей, {notes} заметок...")
+    statuses = ['active', 'completed', 'archived']
+    start = datetime(2024, 1, 1)
+    heavy_notes = int(notes * heavy_share)
+
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (first_name, last_name, age, avatar_url, role, email, password_hash) "
+                 "VALUES (:first_name, '', 0, '', 'user', :email, '')"),
+            [{'first_name': f'Bench {i}', 'email': f'bench{i}@example.com'} for i in range(1, users + 1)]
+        )
+
+    batch = []
+    for i in range(notes):
+        user_id = 1 if i < heavy_notes else random.randint(2, users)
+        created = start + timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+        batch.append({
+            'title': f'Заметка {random.randint(0, 10 ** 6)}',
+            'content': 'lorem ipsum ' * random.randint(5, 50),
+            'user_id': user_id,
+            'status': random.choice(statuses),
+            'created_at': created,
+            'updated_at': created + timedelta(seconds=random.randint(0, 3600)),
+        })
+        if len(batch) == 10000 or i == notes - 1:
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO notes (title, content, user_id, status, created_at, updated_at) "
+                         "VALUES (:title, :content, :user_id, :status, :created_at, :updated_at)").bindparams(
+                        bindparam('created_at', type_=DateTime), bindparam('updated_at', type_=DateTime)),
+                    batch
+                )
+            batch = []
+
+
+def analyze(engine):
+    """Обновление статистики планировщика"""
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def explain(engine, sql, params):
+    """План запроса в формате СУБД"""
+    if engine.dialect.name == 'postgresql':
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    else:
+        prefix = "EXPLAIN QUERY PLAN "
+    with engine.connect() as conn:
+        rows = conn.execute(text(prefix + sql), params).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+def measure(engine, sql, params, runs):
+    """Медиана и P95 времени выполнения запроса в мс"""
+    durations = []
+    with engine.connect() as conn:
+        for _ in range(runs):
+            start = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return statistics.median(durations), durations[int(len(durations) * 0.95) - 1]
+
+
+def run_queries(engine, runs, title):
+    """Планы и время всех запросов"""
+    print(f"\n📊 {title}")
+    print("=" * 50)
+    params = {'user_id': 1, 'email': 'BENCH1@example.com'}
+    results = {}
+    for name, sql in QUERIES.items():
+        print(f"\n🔍 {name}")
+        for line in explain(engine, sql, params):
+            print(f"   {line}")
+        median, p95 = measure(engine, sql, params, runs)
+        results[name] = median
+        print(f"   ⏱️  Медиана: {median:.3f} мс, P95: {p95:.3f} мс")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк индексов notes/users')
+    parser.add_argument('--url', help='URL пустой базы данных (по умолчанию временная SQLite)')
+    parser.add_argument('--users', type=int, default=200, help='Количество пользователей')
+    parser.add_argument('--notes', type=int, default=200000, help='Количество заметок')
+    parser.add_argument('--heavy-share', type=float, default=0.1,
+                        help='Доля заметок у самого активного пользователя')
+    parser.add_argument('--runs', type=int, default=50, help='Повторов каждого запроса')
+
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'index_benchmark.db')}"
+    engine = create_engine(url)
+
+    if 'notes' in inspect(engine).get_table_names():
+        print("❌ База уже содержит таблицу notes - бенчмарк запускается только на пустой базе")
+        sys.exit(1)
+
+    print(f"📡 База данных: {engine.url.render_as_string(hide_password=True)}")
+    random.seed(42)
+
+    run_migrations(engine, target=INDEX_MIGRATION - 1)
+    seed(engine, args.users, args.notes, args.heavy_share)
+    analyze(engine)
+    before = run_queries(engine, args.runs, "БЕЗ ИНДЕКСОВ")
+
+    run_migrations(engine, target=INDEX_MIGRATION)
+    analyze(engine)
+    after = run_queries(engine, args.runs, "С ИНДЕКСАМИ")
+
+    print("\n📈 ИТОГ (медиана, мс)")
+    print("=" * 50)
+    for name in QUERIES:
+        speedup = before[name] / after[name] if after[name] > 0 else 0
+        print(f"   {name:<26} {before[name]:>9.3f} -> {after[name]:>8.3f}  (x{speedup:.1f})")
+
+
+if __name__ == '__main__':
+    main()
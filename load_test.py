@@ -73,6 +73,9 @@ class LoadTester:
                 'duration_ms': duration,
                 'success': response.status_code < 400,
                 'response_size': len(response.content),
+                # Размер на проводе (сжатого тела, если сервер сжал ответ)
+                'wire_size': int(response.headers.get('Content-Length', len(response.content))),
+                'content_encoding': response.headers.get('Content-Encoding', 'identity'),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -85,6 +88,7 @@ class LoadTester:
                 'duration_ms': 10000,  # 10 секунд таймаут
                 'success': False,
                 'response_size': 0,
+                'wire_size': 0,
                 'error': 'Timeout',
                 'timestamp': datetime.now().isoformat()
             }
@@ -97,6 +101,7 @@ class LoadTester:
                 'duration_ms': 0,
                 'success': False,
                 'response_size': 0,
+                'wire_size': 0,
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
             }
@@ -310,6 +315,126 @@ class LoadTester:
             print(f"      Rate Limited: {len(rate_limited)}")
             print(f"      Ошибок: {len(results) - len(successful) - len(rate_limited)}")
 
+    def login(self, email, password):
+        """Вход в приложение (для защищенных эндпоинтов)"""
+        response = self.session.post(f"{self.base_url}/login", json={'email': email, 'password': password}, timeout=10)
+        return response.status_code == 200
+
+    def test_compression(self, urls, requests_per_url=20):
+        """Сравнивает трафик и время ответа без сжатия, с gzip и с brotli"""
+        print("🗜️  ТЕСТИРОВАНИЕ СЖАТИЯ ОТВЕТОВ")
+        print("=" * 50)
+
+        modes = [
+            ('Без сжатия', 'identity'),
+            ('gzip', 'gzip'),
+            ('brotli', 'br, gzip'),
+        ]
+
+        for url in urls:
+            print(f"\n🔍 URL: {url}")
+            baseline = None
+            for name, accept_encoding in modes:
+                headers = {'Accept-Encoding': accept_encoding}
+                results = [self.make_request(f"compression_{url}", url, 'GET', headers=headers)
+                           for _ in range(requests_per_url)]
+                successful = [r for r in results if r['success']]
+                if not successful:
+                    print(f"   ❌ {name}: нет успешных ответов")
+                    continue
+
+                wire_size = statistics.mean(r['wire_size'] for r in successful)
+                durations = [r['duration_ms'] for r in successful]
+                encoding = successful[-1]['content_encoding']
+                if baseline is None:
+                    baseline = wire_size
+
+                print(f"   📦 {name} ({encoding}): {wire_size / 1024:.1f} КБ "
+                      f"({wire_size / baseline:.0%} от исходного), "
+                      f"среднее {statistics.mean(durations):.1f} мс, "
+                      f"медиана {statistics.median(durations):.1f} мс")
+
+    def _probe_latencies(self, url, duration, stop_event=None):
+        """Последовательные запросы к url в течение duration секунд"""
+        durations = []
+        errors = 0
+        deadline = time.time() + duration
+        while time.time() < deadline and not (stop_event and stop_event.is_set()):
+            result = self.make_request(f"probe_{url}", url, 'GET')
+            if result['success']:
+                durations.append(result['duration_ms'])
+            else:
+                errors += 1
+        return durations, errors
+
+    def _print_latencies(self, name, durations, errors):
+        if not durations:
+            print(f"   ❌ {name}: нет успешных ответов (ошибок: {errors})")
+            return
+        ordered = sorted(durations)
+        p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+        print(f"   📊 {name}: {len(durations)} запросов, медиана {statistics.median(ordered):.1f} мс, "
+              f"p95 {p95:.1f} мс, максимум {ordered[-1]:.1f} мс, ошибок {errors}")
+
+    def test_login_storm(self, email, password, storm_users=20, duration=10, probe_url='/api/notes'):
+        """Задержка probe_url до и во время потока входов (хеширование паролей).
+
+        Каждый поток входа повторяет вход без пауз, после 503 ждет Retry-After.
+        Лимит на /login (5 в минуту) нужно отключить на тестовом сервере,
+        иначе поток входов получит 429 без хеширования.
+        """
+        print("🔐 ТЕСТИРОВАНИЕ ПОТОКА ВХОДОВ")
+        print("=" * 50)
+        print(f"   Проверочный URL: {probe_url}, потоков входа: {storm_users}, длительность: {duration} с")
+
+        baseline, baseline_errors = self._probe_latencies(probe_url, duration)
+        self._print_latencies("Без нагрузки", baseline, baseline_errors)
+
+        stop_event = threading.Event()
+        statuses = {}
+        login_durations = []
+        lock = threading.Lock()
+
+        def storm_worker():
+            session = requests.Session()
+            while not stop_event.is_set():
+                start = time.time()
+                try:
+                    response = session.post(f"{self.base_url}/login",
+                                            json={'email': email, 'password': password}, timeout=30)
+                    status = response.status_code
+                except requests.RequestException:
+                    status = 'error'
+                with lock:
+                    statuses[status] = statuses.get(status, 0) + 1
+                    login_durations.append((time.time() - start) * 1000)
+                # Как настоящий клиент: после 503 ждем Retry-After
+                if status == 503:
+                    stop_event.wait(float(response.headers.get('Retry-After', 1)))
+
+        threads = [threading.Thread(target=storm_worker, daemon=True) for _ in range(storm_users)]
+        for thread in threads:
+            thread.start()
+        try:
+            storm, storm_errors = self._probe_latencies(probe_url, duration)
+        finally:
+            stop_event.set()
+            for thread in threads:
+                thread.join(timeout=35)
+
+        self._print_latencies("Во время потока входов", storm, storm_errors)
+        if baseline and storm:
+            print(f"   📈 Медиана изменилась в {statistics.median(storm) / statistics.median(baseline):.2f} раза")
+
+        total = sum(statuses.values())
+        print(f"\n   🔑 Входов: {total} ({total / duration:.1f}/с), ответы: "
+              + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+        if login_durations:
+            print(f"   ⏱️  Время входа: медиана {statistics.median(login_durations):.1f} мс, "
+                  f"максимум {max(login_durations):.1f} мс")
+        if statuses.get(429):
+            print("   ⚠️  Часть входов отклонена rate limiting (429) - отключите лимит для теста")
+
 def main():
     parser = argparse.ArgumentParser(description='Нагрузочное тестирование QA Pet Project')
     parser.add_argument('--url', default='http://localhost:5000', help='Базовый URL приложения')
@@ -317,14 +442,35 @@ def main():
     parser.add_argument('--requests', type=int, default=10, help='Запросов на пользователя')
     parser.add_argument('--test', help='Запустить конкретный тест')
     parser.add_argument('--rate-limit', action='store_true', help='Тестировать rate limiting')
+    parser.add_argument('--compression', action='store_true', help='Сравнить трафик со сжатием и без')
+    parser.add_argument('--compression-urls', default='/api/notes,/static/js/error_handler.js,/static/css/themes.css',
+                        help='URL для теста сжатия через запятую')
+    parser.add_argument('--email', help='Email для входа перед тестом')
+    parser.add_argument('--password', help='Пароль для входа перед тестом')
+    parser.add_argument('--login-storm', action='store_true',
+                        help='Задержка --probe-url до и во время потока входов (нужны --email и --password)')
+    parser.add_argument('--storm-users', type=int, default=20, help='Потоков входа для --login-storm')
+    parser.add_argument('--duration', type=int, default=10, help='Длительность каждой фазы --login-storm, с')
+    parser.add_argument('--probe-url', default='/api/notes', help='Проверочный URL для --login-storm')
     
     args = parser.parse_args()
     
     tester = LoadTester(args.url)
     
     try:
+        if args.email and args.password and not tester.login(args.email, args.password):
+            print("⚠️  Не удалось войти, защищенные эндпоинты вернут ошибку")
+
         if args.rate_limit:
             tester.test_rate_limiting()
+        elif args.login_storm:
+            if not (args.email and args.password):
+                print("❌ Для --login-storm нужны --email и --password")
+                sys.exit(1)
+            tester.test_login_storm(args.email, args.password, args.storm_users, args.duration, args.probe_url)
+        elif args.compression:
+            urls = [url.strip() for url in args.compression_urls.split(',') if url.strip()]
+            tester.test_compression(urls, args.requests)
         elif args.test:
             results = tester.run_single_test(args.test, args.users, args.requests)
             tester.analyze_results(args.test, results)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи логов: синхронный RotatingFileHandler против очереди с фоновым потоком
+Создает временную SQLite-базу с одним пользователем и N заметками, запускает
+приложение в рабочем режиме (с записью логов в файл) и измеряет задержку
+GET /api/notes в нескольких потоках:
+  - синхронная запись текста, ротация каждые 10 КБ (прежняя настройка);
+  - синхронная запись текста, ротация каждые 10 МБ;
+  - очередь и фоновая запись пачками (app/log_pipeline.py);
+  - очередь, JSON-строки и выборка частых действий (app/structured_log.py)
+Кроме задержки печатает объем логов и процессорное время на запрос
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Логи и загрузки приложения пишутся во временную папку, а не в рабочую копию
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORKDIR = tempfile.mkdtemp()
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'logging_benchmark.db')}"
+os.environ.setdefault('HASHING_WORKERS', '0')
+os.environ.pop('FLASK_DEBUG', None)
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.log_pipeline import init_logging
+from app.structured_log import DEFAULT_SAMPLE_RATES, ActionSampler, parse_sample_rates
+from app.rate_limiter import limiter
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'benchmark'
+
+# Доли выборки, при которых записываются все действия
+NO_SAMPLING = ','.join(f'{action}=1' for action in DEFAULT_SAMPLE_RATES)
+
+MODES = [
+    ('Синхронно, текст, ротация 10 КБ',
+     {'LOG_QUEUE_ENABLED': False, 'LOG_MAX_BYTES': 10240, 'LOG_FORMAT': 'text', 'LOG_SAMPLE_RATES': NO_SAMPLING}),
+    ('Синхронно, текст, ротация 10 МБ',
+     {'LOG_QUEUE_ENABLED': False, 'LOG_MAX_BYTES': 10 * 1024 * 1024, 'LOG_FORMAT': 'text',
+      'LOG_SAMPLE_RATES': NO_SAMPLING}),
+    ('Очередь, текст',
+     {'LOG_QUEUE_ENABLED': True, 'LOG_MAX_BYTES': 10 * 1024 * 1024, 'LOG_FORMAT': 'text',
+      'LOG_SAMPLE_RATES': NO_SAMPLING}),
+    ('Очередь, JSON + выборка частых действий',
+     {'LOG_QUEUE_ENABLED': True, 'LOG_MAX_BYTES': 10 * 1024 * 1024, 'LOG_FORMAT': 'json',
+      'LOG_SAMPLE_RATES': ''}),
+]
+
+
+def seed(app, notes):
+    """Пользователь и N заметок"""
+    with app.app_context():
+        db.create_all()
+        user = app.User(email=EMAIL, first_name='Bench', last_name='', age=0, avatar_url='',
+                        role='user', password_hash=generate_password_hash(PASSWORD))
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([app.Note(title=f'Заметка {i}', content='lorem ipsum', user_id=user.id)
+                            for i in range(notes)])
+        db.session.commit()
+
+
+def configure_logging(app, mode_config, log_dir):
+    """Переключение записи логов приложения на режим mode_config в пустой каталог"""
+    for handler in list(app.logger.handlers):
+        app.logger.removeHandler(handler)
+        handler.close()
+    app.extensions.pop('log_pipeline', None)
+    app.config.update(mode_config)
+    app.config['LOG_FILE'] = os.path.join(log_dir, 'app.log')
+    init_logging(app)
+    app.extensions['action_sampler'] = ActionSampler(parse_sample_rates(app.config['LOG_SAMPLE_RATES']),
+                                                     app.config['LOG_SAMPLING_SUMMARY_INTERVAL'])
+
+
+def run_clients(app, threads, requests_per_thread):
+    """Задержки GET /api/notes в миллисекундах из нескольких потоков"""
+    timings = []
+    lock = threading.Lock()
+
+    def client_loop():
+        client = app.test_client()
+        client.post('/login', json={'email': EMAIL, 'password': PASSWORD})
+        local = []
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            client.get('/api/notes')
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            timings.extend(local)
+
+    workers = [threading.Thread(target=client_loop) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк записи логов приложения')
+    parser.add_argument('--notes', type=int, default=50, help='Количество заметок')
+    parser.add_argument('--threads', type=int, default=4, help='Потоков-клиентов')
+    parser.add_argument('--requests', type=int, default=500, help='Запросов на поток')
+
+    args = parser.parse_args()
+
+    print(f"📝 GET /api/notes: {args.threads} потоков по {args.requests} запросов")
+    print("=" * 50)
+    app = create_app()
+    limiter.enabled = False
+    seed(app, args.notes)
+
+    for name, mode_config in MODES:
+        log_dir = tempfile.mkdtemp(dir=WORKDIR)
+        configure_logging(app, mode_config, log_dir)
+        run_clients(app, 1, 20)  # прогрев
+
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        timings = run_clients(app, args.threads, args.requests)
+        elapsed = time.perf_counter() - started
+
+        pipeline = app.extensions.get('log_pipeline')
+        if pipeline:
+            pipeline.stop()
+        # Процессорное время вместе с фоновой записью логов
+        cpu_per_request = (time.process_time() - cpu_started) * 1000 / len(timings)
+
+        files = [f for f in os.listdir(log_dir) if f.startswith('app.log')]
+        log_bytes = sum(os.path.getsize(os.path.join(log_dir, f)) for f in files)
+        p95 = timings[int(len(timings) * 0.95)]
+        p99 = timings[int(len(timings) * 0.99)]
+        print(f"\n🔍 {name}")
+        print(f"   медиана {statistics.median(timings):.2f} мс, p95 {p95:.2f} мс, p99 {p99:.2f} мс, "
+              f"{len(timings) / elapsed:.0f} запросов/с")
+        print(f"   процессор {cpu_per_request:.2f} мс на запрос, лог {log_bytes / len(timings):.0f} байт на запрос, "
+              f"файлов логов: {len(files)}")
+        if pipeline:
+            info = pipeline.info()
+            print(f"   записано {info['written']} строк пачками по {info['avg_batch']} в среднем "
+                  f"(максимум {info['max_batch']}), отброшено {info['dropped']}")
+
+
+if __name__ == '__main__':
+    main()
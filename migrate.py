@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Применение миграций схемы базы данных
+Работает с PostgreSQL и SQLite (URL берется из DATABASE_URL)
+"""
+
+import argparse
+import sys
+from sqlalchemy import create_engine
+
+from app import get_database_url
+from app.migrations import run_migrations, get_migration_status
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Миграции схемы базы данных QA Pet Project')
+    parser.add_argument('--url', help='URL базы данных (по умолчанию DATABASE_URL)')
+    parser.add_argument('--status', action='store_true', help='Показать статус миграций')
+    parser.add_argument('--target', type=int, help='Применить миграции до указанной версии')
+
+    args = parser.parse_args()
+
+    engine = create_engine(args.url or get_database_url())
+    print(f"📡 База данных: {engine.url.render_as_string(hide_password=True)}")
+
+    try:
+        if args.status:
+            print("\n📋 Статус миграций:")
+            for version, name, applied in get_migration_status(engine):
+                mark = "✅" if applied else "⏳"
+                print(f"   {mark} {version:03d} {name}")
+            return
+
+        applied = run_migrations(engine, target=args.target)
+        if applied:
+            print(f"\n🎉 Применено миграций: {len(applied)}")
+        else:
+            print("\n✅ Схема актуальна, миграций для применения нет")
+
+    except Exception as e:
+        print(f"❌ Ошибка при миграции: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хранилищ rate limiting
+Измеряет время одной проверки лимита (fixed window) для memory://, общего
+SQLite (app/rate_limit_storage.py) и, если указан --redis-url, Redis, а затем
+проверяет, сколько запросов пропускают несколько процессов при общем лимите
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from limits import parse, strategies
+from limits.storage import storage_from_string
+
+import app.rate_limit_storage  # noqa: F401 - регистрирует схему sqlite://
+
+
+def measure_latency(uri, checks, keys):
+    """Медиана и p99 времени одной проверки в микросекундах"""
+    storage = storage_from_string(uri)
+    storage.reset()
+    limiter = strategies.FixedWindowRateLimiter(storage)
+    item = parse('1000000 per minute')
+    timings = []
+    for i in range(checks):
+        key = f"user:{i % keys}"
+        start = time.perf_counter()
+        limiter.hit(item, key)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def worker_hits(args):
+    """Попытки одного процесса-воркера: сколько прошло под лимитом"""
+    uri, limit, attempts = args
+    limiter = strategies.FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse(f'{limit} per minute')
+    return sum(1 for _ in range(attempts) if limiter.hit(item, 'shared-key'))
+
+
+def measure_sharing(uri, workers, limit, attempts):
+    """Сколько запросов пропустили все процессы вместе"""
+    storage_from_string(uri).reset()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        return sum(pool.map(worker_hits, [(uri, limit, attempts)] * workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк хранилищ rate limiting')
+    parser.add_argument('--checks', type=int, default=20000, help='Проверок для замера задержки')
+    parser.add_argument('--keys', type=int, default=1000, help='Разных ключей при замере задержки')
+    parser.add_argument('--workers', type=int, default=4, help='Процессов в тесте общего лимита')
+    parser.add_argument('--limit', type=int, default=100, help='Лимит в тесте общего лимита')
+    parser.add_argument('--redis-url', help='URL Redis (например redis://localhost:6379), если есть')
+
+    args = parser.parse_args()
+
+    sqlite_path = os.path.join(tempfile.mkdtemp(), 'ratelimit.sqlite')
+    backends = [('memory', 'memory://'), ('sqlite (WAL)', f'sqlite://{sqlite_path}')]
+    if args.redis_url:
+        backends.append(('redis', args.redis_url))
+
+    print("⏱️  ВРЕМЯ ОДНОЙ ПРОВЕРКИ")
+    print("=" * 50)
+    for name, uri in backends:
+        median, p99 = measure_latency(uri, args.checks, args.keys)
+        print(f"   {name}: медиана {median:.1f} мкс, p99 {p99:.1f} мкс")
+
+    print(f"\n🔒 ОБЩИЙ ЛИМИТ: {args.workers} процессов, лимит {args.limit}, "
+          f"по {args.limit} попыток на процесс")
+    print("=" * 50)
+    for name, uri in backends:
+        allowed = measure_sharing(uri, args.workers, args.limit, args.limit)
+        mark = "✅" if allowed == args.limit else "⚠️ "
+        print(f"   {mark} {name}: пропущено {allowed} (ожидается {args.limit})")
+
+
+if __name__ == '__main__':
+    main()
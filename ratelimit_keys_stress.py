@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Стресс-тест таблицы ключей rate limiting
+Имитирует сканер, который перебирает адреса: каждая проверка лимита - с нового
+ключа. Печатает число ключей, вытеснения и занятую память (для SQLite - размер
+файла) по ходу теста: с ограничением RATELIMIT_MAX_KEYS они перестают расти
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+import app.rate_limit_storage  # noqa: F401 - регистрирует схему sqlite://
+from app.gcra import GCRA_STRATEGY
+
+
+def scanner_ip(i):
+    """i-й адрес сканера"""
+    return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}:{i >> 24}"
+
+
+def run(name, limiter, keys, report_every, size_func):
+    """Прогон keys разных ключей с отчетом каждые report_every проверок"""
+    item = parse('50 per hour')
+    print(f"\n🔑 {name}")
+    print("=" * 50)
+    start = time.perf_counter()
+    for i in range(1, keys + 1):
+        limiter.hit(item, scanner_ip(i), 'main.home')
+        if i % report_every == 0:
+            info = limiter.info() if hasattr(limiter, 'info') else {}
+            print(f"   {i:>9,} проверок: ключей {info.get('keys', '?'):>8}, "
+                  f"вытеснено {info.get('evicted', '?'):>8}, {size_func() / 1024 / 1024:7.1f} МБ")
+    print(f"   ⏱️  {keys / (time.perf_counter() - start):,.0f} проверок/с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Стресс-тест таблицы ключей rate limiting')
+    parser.add_argument('--keys', type=int, default=1000000, help='Разных ключей')
+    parser.add_argument('--max-keys', type=int, default=100000, help='Ограничение таблицы ключей')
+    parser.add_argument('--report-every', type=int, default=100000, help='Печатать состояние каждые N проверок')
+    parser.add_argument('--skip-sqlite', action='store_true', help='Только таблица в памяти')
+    parser.add_argument('--unbounded', action='store_true',
+                        help='Для сравнения: фиксированное окно в memory:// без ограничения ключей')
+
+    args = parser.parse_args()
+
+    def traced_memory():
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.start()
+    limiter = STRATEGIES[GCRA_STRATEGY](storage_from_string('memory://'))
+    limiter.state.max_keys = args.max_keys
+    run(f"GCRA в памяти, не больше {args.max_keys:,} ключей", limiter, args.keys, args.report_every,
+        traced_memory)
+    del limiter
+    tracemalloc.stop()
+
+    if not args.skip_sqlite:
+        path = os.path.join(tempfile.mkdtemp(), 'ratelimit.sqlite')
+        storage = storage_from_string(f"sqlite://{path}", max_keys=args.max_keys)
+        run(f"GCRA в SQLite, не больше {args.max_keys:,} ключей", STRATEGIES[GCRA_STRATEGY](storage),
+            args.keys, args.report_every, lambda: os.path.getsize(path) + os.path.getsize(f"{path}-wal"))
+
+    if args.unbounded:
+        tracemalloc.start()
+        limiter = STRATEGIES['fixed-window'](storage_from_string('memory://'))
+        run("Фиксированное окно в memory:// (без ограничения)", limiter, args.keys, args.report_every,
+            traced_memory)
+        tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    main()
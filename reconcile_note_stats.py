@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Сверка и пересчет счетчиков заметок (таблица note_stats)
+Сравнивает счетчики с фактическим содержимым таблицы notes и при необходимости
+пересобирает их с нуля. Работает с PostgreSQL и SQLite (URL берется из DATABASE_URL)
+"""
+
+import argparse
+import sys
+from sqlalchemy import create_engine
+
+from app import get_database_url
+from app.note_stats import find_note_stats_drift, rebuild_note_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка и пересчет счетчиков заметок')
+    parser.add_argument('--url', help='URL базы данных (по умолчанию DATABASE_URL)')
+    parser.add_argument('--user-id', type=int, help='Только для указанного пользователя')
+    parser.add_argument('--check', action='store_true', help='Только показать расхождения, без пересчета')
+
+    args = parser.parse_args()
+
+    engine = create_engine(args.url or get_database_url())
+    print(f"📡 База данных: {engine.url.render_as_string(hide_password=True)}")
+
+    try:
+        with engine.begin() as conn:
+            drift = find_note_stats_drift(conn, args.user_id)
+
+            if drift:
+                print(f"\n⚠️  Расхождений: {len(drift)}")
+                for user_id, status, counted, actual in drift:
+                    print(f"   👤 {user_id} [{status}]: заметок {counted[0]} -> {actual[0]}, "
+                          f"символов {counted[1]} -> {actual[1]}")
+            else:
+                print("\n✅ Счетчики совпадают с таблицей notes")
+
+            if args.check:
+                sys.exit(1 if drift else 0)
+
+            # Пересчет выполняется всегда: заодно удаляются нулевые строки
+            rebuild_note_stats(conn, args.user_id)
+            print("🔄 Счетчики пересчитаны")
+
+    except SystemExit:
+        raise
+    except Exception as e:
+        print(f"❌ Ошибка при пересчете: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
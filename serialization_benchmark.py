@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк сериализации списка заметок
+Сравнивает прежний путь (словари с isoformat + jsonify + повторный json.dumps
+для ETag) с app/serialization.py на стандартном json и на orjson (если установлен)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, jsonify
+
+import app.serialization as serialization
+
+
+def make_notes(count, content_size):
+    """Заметки в виде строк выборки (атрибуты как у модели)"""
+    now = datetime.utcnow()
+    content = ('Текст заметки lorem ipsum ' * (content_size // 26 + 1))[:content_size]
+    return [
+        SimpleNamespace(id=i, title=f'Заметка {i}', content=content, status='active',
+                        created_at=now - timedelta(seconds=i), updated_at=now)
+        for i in range(count)
+    ]
+
+
+def legacy_path(notes):
+    """Прежняя реализация: словарь на заметку, jsonify и отдельная сериализация для ETag"""
+    notes_data = [{
+        'id': note.id,
+        'title': note.title,
+        'content': note.content,
+        'status': note.status,
+        'created_at': note.created_at.isoformat(),
+        'updated_at': note.updated_at.isoformat()
+    } for note in notes]
+    etag = hashlib.md5(json.dumps(notes_data, sort_keys=True).encode()).hexdigest()
+    response = jsonify(notes_data)
+    response.headers['ETag'] = etag
+    return response.get_data()
+
+
+def serializer_path(notes):
+    """Новая реализация: одна сериализация, ETag по тем же байтам"""
+    response = serialization.json_response([serialization.serialize_note(note) for note in notes])
+    return response.get_data()
+
+
+def measure(func, notes, repeat):
+    """Медиана времени из repeat запусков и размер результата"""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(func(notes))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Микробенчмарк сериализации заметок')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Количество заметок через запятую')
+    parser.add_argument('--content-size', type=int, default=200, help='Длина содержимого заметки')
+    parser.add_argument('--repeat', type=int, default=5, help='Повторов для каждого размера')
+
+    args = parser.parse_args()
+
+    variants = [('Прежний путь (jsonify + ETag)', legacy_path, None)]
+    variants.append(('Сериализатор (json)', serializer_path, serialization._json_dumps))
+    if serialization.orjson is not None:
+        variants.append(('Сериализатор (orjson)', serializer_path, serialization._orjson_dumps))
+    else:
+        print("⚠️  orjson не установлен - вариант с orjson пропущен")
+
+    app = Flask(__name__)
+    with app.app_context():
+        for count in [int(size) for size in args.sizes.split(',')]:
+            notes = make_notes(count, args.content_size)
+            print(f"\n📊 {count} заметок")
+            print("=" * 50)
+            baseline = None
+            for name, func, dumps in variants:
+                if dumps is not None:
+                    # Кодировщик, который json_response использует для тела ответа
+                    serialization.dumps = dumps
+                duration, size = measure(func, notes, args.repeat)
+                baseline = baseline or duration
+                print(f"   ⏱️  {name}: {duration * 1000:.1f} мс, {size / 1024:.0f} КБ, "
+                      f"ускорение x{baseline / duration:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти GET /api/notes: обычный ответ против потокового (?stream=1)
+Создает временную SQLite-базу с одним пользователем и N заметками и сравнивает
+пиковое потребление памяти (tracemalloc) и время ответа
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Логи и загрузки приложения пишутся во временную папку, а не в рабочую копию
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORKDIR = tempfile.mkdtemp()
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'streaming_benchmark.db')}"
+
+from sqlalchemy import DateTime, bindparam, text
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.rate_limiter import limiter
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'benchmark'
+
+
+def seed(app, notes, content_size):
+    """Пользователь и N заметок"""
+    print(f"🌱 Заполнение: {notes} заметок по {content_size} символов...")
+    with app.app_context():
+        db.create_all()
+        user = app.User(email=EMAIL, first_name='Bench', last_name='', age=0, avatar_url='',
+                        role='user', password_hash=generate_password_hash(PASSWORD))
+        db.session.add(user)
+        db.session.commit()
+
+        now = datetime.utcnow()
+        content = ('lorem ipsum ' * (content_size // 12 + 1))[:content_size]
+        batch = []
+        for i in range(notes):
+            batch.append({'title': f'Заметка {i}', 'content': content, 'user_id': user.id,
+                          'status': 'active', 'created_at': now, 'updated_at': now})
+            if len(batch) == 10000 or i == notes - 1:
+                db.session.execute(
+                    text("INSERT INTO notes (title, content, user_id, status, created_at, updated_at) "
+                         "VALUES (:title, :content, :user_id, :status, :created_at, :updated_at)").bindparams(
+                        bindparam('created_at', type_=DateTime), bindparam('updated_at', type_=DateTime)),
+                    batch
+                )
+                batch = []
+        db.session.commit()
+
+
+def measure(client, url):
+    """Пиковая память и время полного чтения ответа"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return response.status_code, size, peak, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк памяти потоковой выдачи заметок')
+    parser.add_argument('--notes', type=int, default=100000, help='Количество заметок')
+    parser.add_argument('--content-size', type=int, default=200, help='Длина содержимого заметки')
+
+    args = parser.parse_args()
+
+    app = create_app()
+    limiter.enabled = False
+    seed(app, args.notes, args.content_size)
+
+    client = app.test_client()
+    client.post('/login', json={'email': EMAIL, 'password': PASSWORD})
+
+    print("\n📊 РЕЗУЛЬТАТЫ")
+    print("=" * 50)
+    results = {}
+    for name, url in (('Обычный ответ', '/api/notes'), ('Потоковый ответ', '/api/notes?stream=1')):
+        status, size, peak, duration = measure(client, url)
+        results[name] = peak
+        print(f"🔍 {name} ({url})")
+        print(f"   Статус: {status}, размер ответа: {size / 1024 / 1024:.1f} МБ")
+        print(f"   📦 Пиковая память: {peak / 1024 / 1024:.1f} МБ")
+        print(f"   ⏱️  Время: {duration:.2f} с")
+
+    ratio = results['Обычный ответ'] / results['Потоковый ответ']
+    print(f"\n💡 Потоковый режим использует в {ratio:.1f} раза меньше памяти")
+
+
+if __name__ == '__main__':
+    main()
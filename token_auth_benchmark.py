@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк аутентификации запроса: cookie сессии Flask-Login против bearer-токена
+Создает временную SQLite-базу с одним пользователем и сравнивает:
+  - стоимость самой аутентификации (разбор cookie + загрузка пользователя из БД
+    против проверки подписи токена + пользователя из токена);
+  - время и число SQL-запросов GET /api/notes через тестовый клиент
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Логи и загрузки приложения пишутся во временную папку, а не в рабочую копию
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORKDIR = tempfile.mkdtemp()
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'token_auth_benchmark.db')}"
+os.environ.setdefault('HASHING_WORKERS', '0')
+
+from flask import request
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.cache import create_notes_cache
+from app.rate_limiter import limiter
+from app.tokens import verify_token
+from app.user_cache import user_from_snapshot
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'benchmark'
+
+
+def seed(app, notes):
+    """Пользователь и N заметок"""
+    with app.app_context():
+        db.create_all()
+        user = app.User(email=EMAIL, first_name='Bench', last_name='', age=0, avatar_url='',
+                        role='user', password_hash=generate_password_hash(PASSWORD))
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([app.Note(title=f'Заметка {i}', content='lorem ipsum', user_id=user.id)
+                            for i in range(notes)])
+        db.session.commit()
+
+
+def time_calls(func, repeat):
+    """Медиана времени вызова в микросекундах"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк аутентификации: сессия против bearer-токена')
+    parser.add_argument('--notes', type=int, default=100, help='Количество заметок')
+    parser.add_argument('--repeat', type=int, default=2000, help='Повторов')
+
+    args = parser.parse_args()
+
+    app = create_app()
+    limiter.enabled = False
+    # Без кэша пользователя: так выглядел путь через сессию до кэширования user_loader
+    app.extensions['user_cache'] = create_notes_cache('none')
+    seed(app, args.notes)
+
+    session_client = app.test_client()
+    session_client.post('/login', json={'email': EMAIL, 'password': PASSWORD})
+    cookie = session_client.get_cookie('session')
+    token = app.test_client().post('/api/auth/token', json={'email': EMAIL, 'password': PASSWORD}).get_json()
+    auth_header = {'Authorization': f"Bearer {token['access_token']}"}
+
+    print("🔐 СТОИМОСТЬ АУТЕНТИФИКАЦИИ (медиана)")
+    print("=" * 50)
+
+    with app.test_request_context('/api/notes', headers={'Cookie': f'session={cookie.value}'}):
+        def session_auth():
+            sess = app.session_interface.open_session(app, request)
+            db.session.get(app.User, int(sess['_user_id']))
+            db.session.remove()
+
+        print(f"   🍪 Сессия (cookie + запрос к БД): {time_calls(session_auth, args.repeat):.1f} мкс")
+
+    with app.test_request_context('/api/notes', headers=auth_header):
+        def token_auth():
+            claims = verify_token(token['access_token'], 'access')
+            user_from_snapshot({'id': claims['user_id']})
+            db.session.remove()
+
+        print(f"   🎫 Bearer-токен (подпись, без БД): {time_calls(token_auth, args.repeat):.1f} мкс")
+        verify_only = time_calls(lambda: verify_token(token['access_token'], 'access'), args.repeat)
+        print(f"      из них проверка токена: {verify_only:.1f} мкс")
+
+    counter = {'queries': 0}
+
+    def count_query(*_):
+        counter['queries'] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+
+    print("\n📊 GET /api/notes ЦЕЛИКОМ (медиана)")
+    print("=" * 50)
+    token_client = app.test_client(use_cookies=False)
+    variants = [
+        ('🍪 Сессия', lambda: session_client.get('/api/notes')),
+        ('🎫 Bearer-токен', lambda: token_client.get('/api/notes', headers=auth_header)),
+    ]
+    repeat = max(args.repeat // 10, 1)
+    for name, call in variants:
+        call()  # прогрев кэша списка
+        counter['queries'] = 0
+        median = time_calls(call, repeat) / 1000
+        print(f"   {name}: {median:.2f} мс, {counter['queries'] / repeat:.2f} запросов к БД")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк user_loader: запросы к БД на один авторизованный запрос
+Создает временную SQLite-базу с одним пользователем и N заметками и считает
+SQL-запросы и время ответа без кэша пользователя, с кэшем в памяти и со
+снимком пользователя в сессии
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Логи и загрузки приложения пишутся во временную папку, а не в рабочую копию
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORKDIR = tempfile.mkdtemp()
+sys.path.insert(0, ROOT)
+os.chdir(WORKDIR)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'user_loader_benchmark.db')}"
+os.environ.setdefault('HASHING_WORKERS', '0')
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.cache import create_notes_cache
+from app.rate_limiter import limiter
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'benchmark'
+
+MODES = [
+    ('Без кэша', 'none', False),
+    ('Кэш в памяти', 'memory', False),
+    ('Кэш в памяти + снимок в сессии', 'memory', True),
+]
+
+
+def seed(app, notes):
+    """Пользователь и N заметок"""
+    with app.app_context():
+        db.create_all()
+        user = app.User(email=EMAIL, first_name='Bench', last_name='', age=0, avatar_url='',
+                        role='user', password_hash=generate_password_hash(PASSWORD))
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([app.Note(title=f'Заметка {i}', content='lorem ipsum', user_id=user.id)
+                            for i in range(notes)])
+        db.session.commit()
+
+
+def measure(client, url, repeat, counter):
+    """Среднее число SQL-запросов и медиана времени на запрос"""
+    client.get(url)  # прогрев кэшей
+    counter['queries'] = 0
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code not in (200, 304):
+            raise RuntimeError(f"{url}: HTTP {response.status_code}")
+    return counter['queries'] / repeat, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк кэша пользователя в user_loader')
+    parser.add_argument('--notes', type=int, default=100, help='Количество заметок')
+    parser.add_argument('--repeat', type=int, default=200, help='Запросов на каждый URL')
+    parser.add_argument('--urls', default='/api/notes,/api/notes/stats,/api/notes/changes?since=0',
+                        help='URL через запятую')
+
+    args = parser.parse_args()
+    urls = [url.strip() for url in args.urls.split(',') if url.strip()]
+
+    app = create_app()
+    limiter.enabled = False
+    seed(app, args.notes)
+
+    counter = {'queries': 0}
+
+    def count_query(*_):
+        counter['queries'] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+
+    print("📊 SQL-ЗАПРОСЫ НА ОДИН ЗАПРОС")
+    print("=" * 50)
+    for name, backend, session_snapshot in MODES:
+        app.config['USER_SESSION_SNAPSHOT'] = session_snapshot
+        app.extensions['user_cache'] = create_notes_cache(backend, ttl=app.config['USER_CACHE_TTL'])
+
+        client = app.test_client()
+        client.post('/login', json={'email': EMAIL, 'password': PASSWORD})
+
+        print(f"\n🔍 {name}")
+        for url in urls:
+            queries, median = measure(client, url, args.repeat, counter)
+            print(f"   {url}: {queries:.2f} запросов к БД, медиана {median:.2f} мс")
+
+
+if __name__ == '__main__':
+    main()